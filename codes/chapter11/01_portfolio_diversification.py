@@ -11,6 +11,7 @@ Portfolio Diversification using Backtrader
 """
 
 import os
+import functools
 import backtrader as bt
 import yfinance as yf
 import pandas as pd
@@ -36,33 +37,43 @@ class SingleAssetStrategy(bt.Strategy):
             self.order = self.buy()
 
 
-class EqualWeightStrategy(bt.Strategy):
+class RebalancingStrategy(bt.Strategy):
     """
-    균등 비중 포트폴리오 전략
+    목표 비중 리밸런싱 전략의 기본 클래스
 
-    모든 자산에 동일한 비중으로 투자
-    분기별 리밸런싱
+    서브클래스는 target_weights()만 구현하면 됩니다.
+    리밸런싱 월의 첫 봉에서 목표 비중을 현재 포지션과 상계해 주문 바스켓을 만들고,
+    매도 주문을 먼저 제출한 뒤 매수 주문을 제출합니다 (매도 대금으로 매수해 증거금 부족 거절 방지).
+    처리 중인 주문은 주문 번호(ref)를 키로 하는 딕셔너리로 관리합니다.
     """
     params = (
         ('rebalance_months', [3, 6, 9, 12]),  # 분기별
+        ('min_trade_value', 100),  # 최소 거래 금액
         ('printlog', False),
     )
 
     def __init__(self):
         self.rebalance_flag = False
-        self.orders = []
+        self.pending = {}
 
     def prenext(self):
         # 모든 데이터가 준비될 때까지 대기
         pass
 
+    def is_ready(self):
+        """지표 계산 기간이 지났는지 (기본값: 항상 준비됨)"""
+        return True
+
     def next(self):
         # 주문 처리 중이면 대기
-        if any(self.orders):
+        if self.pending:
+            return
+
+        if not self.is_ready():
             return
 
         # 리밸런싱 확인
-        current_month = self.data.datetime.date(0).month
+        current_month = self.datetime.date(0).month
 
         if current_month in self.params.rebalance_months:
             if not self.rebalance_flag:
@@ -71,38 +82,68 @@ class EqualWeightStrategy(bt.Strategy):
         else:
             self.rebalance_flag = False
 
+    def target_weights(self):
+        """자산별 목표 비중 {이름: 비중} (비중이 없는 자산은 주문하지 않음)"""
+        raise NotImplementedError
+
     def rebalance_portfolio(self):
-        """균등 비중으로 리밸런싱"""
+        """목표 비중으로 리밸런싱"""
         if self.params.printlog:
-            print(f'{self.data.datetime.date(0)}: 리밸런싱 실행')
+            print(f'{self.datetime.date(0)}: 리밸런싱 실행')
+
+        self.rebalance_to_weights(self.target_weights())
+
+    def rebalance_orders(self, weights):
+        """목표 비중을 현재 포지션과 상계한 주문 바스켓
 
+        Returns:
+        --------
+        list
+            [(데이터, 수량), ...] - 매도 주문이 먼저, 같은 방향은 데이터 순서
+        """
         portfolio_value = self.broker.getvalue()
-        target_weight = 1.0 / len(self.datas)
 
+        basket = []
         for data in self.datas:
-            # 목표 가치 계산
-            target_value = portfolio_value * target_weight
-
-            # 현재 포지션
-            position_value = self.getposition(data).size * data.close[0]
+            if data._name not in weights:
+                continue
+            price = data.close[0]
+            diff = portfolio_value * weights[data._name] - self.getposition(data).size * price
+            if abs(diff) > self.params.min_trade_value:
+                shares = int(diff / price)
+                if shares != 0:
+                    basket.append((data, shares))
 
-            # 차이 계산
-            diff = target_value - position_value
+        return sorted(basket, key=lambda item: item[1] > 0)
 
-            # 매수/매도 주문
-            if abs(diff) > 100:  # 최소 거래 금액
-                shares = int(diff / data.close[0])
-                if shares != 0:
-                    order = self.order_target_size(data=data, target=self.getposition(data).size + shares)
-                    self.orders.append(order)
+    def rebalance_to_weights(self, weights):
+        """주문 바스켓을 한 번에 제출하고 처리 중인 주문으로 등록"""
+        for data, shares in self.rebalance_orders(weights):
+            if shares > 0:
+                order = self.buy(data=data, size=shares)
+            else:
+                order = self.sell(data=data, size=-shares)
+            self.pending[order.ref] = order
 
     def notify_order(self, order):
-        if order.status in [order.Completed, order.Canceled, order.Margin]:
-            if order in self.orders:
-                self.orders.remove(order)
+        if order.status in [order.Completed, order.Canceled, order.Margin, order.Rejected]:
+            self.pending.pop(order.ref, None)
+
+
+class EqualWeightStrategy(RebalancingStrategy):
+    """
+    균등 비중 포트폴리오 전략
+
+    모든 자산에 동일한 비중으로 투자
+    분기별 리밸런싱
+    """
+
+    def target_weights(self):
+        """균등 비중"""
+        return {data._name: 1.0 / len(self.datas) for data in self.datas}
 
 
-class InverseVolatilityStrategy(bt.Strategy):
+class InverseVolatilityStrategy(RebalancingStrategy):
     """
     역변동성 포트폴리오 전략
 
@@ -111,13 +152,10 @@ class InverseVolatilityStrategy(bt.Strategy):
     """
     params = (
         ('volatility_period', 60),  # 변동성 계산 기간
-        ('rebalance_months', [3, 6, 9, 12]),
-        ('printlog', False),
     )
 
     def __init__(self):
-        self.rebalance_flag = False
-        self.orders = []
+        super().__init__()
 
         # 각 데이터의 변동성 계산
         self.stds = {}
@@ -127,67 +165,82 @@ class InverseVolatilityStrategy(bt.Strategy):
                 period=self.params.volatility_period
             )
 
-    def next(self):
-        # 주문 처리 중이면 대기
-        if any(self.orders):
-            return
-
+    def is_ready(self):
         # 변동성 계산 기간 대기
-        if len(self) < self.params.volatility_period:
-            return
-
-        # 리밸런싱 확인
-        current_month = self.data.datetime.date(0).month
+        return len(self) >= self.params.volatility_period
 
-        if current_month in self.params.rebalance_months:
-            if not self.rebalance_flag:
-                self.rebalance_flag = True
-                self.rebalance_portfolio()
-        else:
-            self.rebalance_flag = False
-
-    def rebalance_portfolio(self):
-        """역변동성 비중으로 리밸런싱"""
-        if self.params.printlog:
-            print(f'{self.data.datetime.date(0)}: 역변동성 리밸런싱 실행')
+    def get_volatilities(self):
+        """자산별 현재 변동성 {이름: 변동성}"""
+        return {data._name: self.stds[data._name][0] for data in self.datas}
 
+    def target_weights(self):
+        """역변동성 비중"""
         # 각 자산의 변동성 수집
-        volatilities = {}
-        for data in self.datas:
-            vol = self.stds[data._name][0]
-            if vol > 0:
-                volatilities[data._name] = vol
+        volatilities = {name: vol for name, vol in self.get_volatilities().items() if vol > 0}
 
         if not volatilities:
-            return
+            return {}
 
         # 역변동성 계산
         inv_vols = {name: 1.0/vol for name, vol in volatilities.items()}
         total_inv_vol = sum(inv_vols.values())
 
         # 비중 계산
-        weights = {name: inv_vol/total_inv_vol for name, inv_vol in inv_vols.items()}
+        return {name: inv_vol/total_inv_vol for name, inv_vol in inv_vols.items()}
 
-        # 포트폴리오 가치
-        portfolio_value = self.broker.getvalue()
 
-        # 리밸런싱
-        for data in self.datas:
-            if data._name in weights:
-                target_value = portfolio_value * weights[data._name]
-                position_value = self.getposition(data).size * data.close[0]
-                diff = target_value - position_value
+class ListingData(bt.feed.DataBase):
+    """
+    상장일이 되어야 데이터를 불러오는 지연 로딩 피드
+
+    loader()는 상장일부터의 OHLCV DataFrame을 반환하는 함수입니다.
+    시뮬레이션 시각이 상장일에 도달하기 전에는 loader를 호출하지 않으므로
+    메모리에는 이미 상장된 종목의 데이터만 올라갑니다.
+    Cerebro(preload=False)와 함께 사용해야 합니다 (preload는 시작할 때 모든 피드를 읽음).
+    시각을 알려줄 피드가 있어야 하므로 가장 먼저 상장된 종목은 immediate=True로 바로 불러옵니다.
+    """
+    params = (
+        ('loader', None),
+        ('listing_date', None),
+        ('immediate', False),
+    )
 
-                if abs(diff) > 100:
-                    shares = int(diff / data.close[0])
-                    if shares != 0:
-                        order = self.order_target_size(data=data, target=self.getposition(data).size + shares)
-                        self.orders.append(order)
+    columns = ['Open', 'High', 'Low', 'Close', 'Volume']
 
-    def notify_order(self, order):
-        if order.status in [order.Completed, order.Canceled, order.Margin]:
-            if order in self.orders:
-                self.orders.remove(order)
+    def start(self):
+        super().start()
+        self._listing = bt.date2num(pd.Timestamp(self.p.listing_date).to_pydatetime())
+        self._values = None
+        self._idx = -1
+
+    def next(self, datamaster=None, ticks=True):
+        # 상장일 전에는 데이터를 불러오지 않고 봉이 없다고 응답
+        if self._values is None:
+            if not self.p.immediate and (datamaster is None or datamaster.lines.datetime[0] < self._listing):
+                return False
+            frame = self.p.loader()
+            self._dates = [bt.date2num(ts.to_pydatetime()) for ts in frame.index]
+            self._values = frame[self.columns].to_numpy(dtype=float)
+
+        return super().next(datamaster=datamaster, ticks=ticks)
+
+    def _load(self):
+        self._idx += 1
+        if self._idx >= len(self._values):
+            return False
+
+        (self.lines.open[0], self.lines.high[0], self.lines.low[0],
+         self.lines.close[0], self.lines.volume[0]) = self._values[self._idx]
+        self.lines.datetime[0] = self._dates[self._idx]
+        return True
+
+
+def download_ticker(ticker, start_date, end_date):
+    """종목 하나의 OHLCV 다운로드"""
+    data = yf.download(ticker, start=start_date, end=end_date, progress=False)
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.droplevel(1)
+    return data
 
 
 def run_single_asset(ticker='AAPL', start_date='2019-01-01', end_date='2024-01-01'):
@@ -218,26 +271,35 @@ def run_single_asset(ticker='AAPL', start_date='2019-01-01', end_date='2024-01-0
     return cerebro, results[0], initial_value, final_value, data
 
 
-def run_portfolio(tickers, start_date, end_date, strategy_class):
-    """포트폴리오 백테스트"""
-    # 데이터 다운로드
-    all_data = {}
-    for ticker in tickers:
-        data = yf.download(ticker, start=start_date, end=end_date, progress=False)
-        if isinstance(data.columns, pd.MultiIndex):
-            data.columns = data.columns.droplevel(1)
-        all_data[ticker] = data
+def run_portfolio(tickers, start_date, end_date, strategy_class, listings=None, loader=download_ticker,
+                  cash=10000.0):
+    """포트폴리오 백테스트
 
+    listings({종목: 상장일})를 주면 지연 로딩 모드로 실행합니다.
+    각 종목 데이터는 시뮬레이션이 상장일에 도달했을 때 loader로 불러오고 (ListingData),
+    preload 없이 봉 단위로 진행합니다. 이 모드에서 반환하는 all_data는 빈 딕셔너리입니다.
+    """
     # Cerebro 설정
-    cerebro = bt.Cerebro()
+    cerebro = bt.Cerebro(preload=listings is None)
     cerebro.addstrategy(strategy_class)
 
-    # 데이터 피드 추가
-    for ticker, data in all_data.items():
-        data_feed = bt.feeds.PandasData(dataname=data)
+    # 데이터 다운로드 및 피드 추가
+    all_data = {}
+    if listings is not None:
+        listing_dates = {ticker: max(pd.Timestamp(start_date), pd.Timestamp(listings[ticker])) for ticker in tickers}
+        first_listing = min(listing_dates.values())
+
+    for ticker in tickers:
+        if listings is None:
+            all_data[ticker] = loader(ticker, start_date, end_date)
+            data_feed = bt.feeds.PandasData(dataname=all_data[ticker])
+        else:
+            data_feed = ListingData(loader=functools.partial(loader, ticker, listing_dates[ticker], end_date),
+                                    listing_date=listing_dates[ticker],
+                                    immediate=listing_dates[ticker] == first_listing)
         cerebro.adddata(data_feed, name=ticker)
 
-    cerebro.broker.setcash(10000.0)
+    cerebro.broker.setcash(cash)
     cerebro.broker.setcommission(commission=0.001)
 
     cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe', riskfreerate=0.0, annualize=True)
@@ -0,0 +1,371 @@
+"""
+Chapter 11: 포트폴리오 구성과 분산투자
+Vectorized Rebalancing Engine
+
+01_portfolio_diversification.py의 EqualWeightStrategy와 InverseVolatilityStrategy는
+리밸런싱마다 self.datas를 돌며 자산별로 주문을 만듭니다.
+Backtrader는 데이터 피드마다 봉 처리 비용이 있어 자산이 수백 개가 되면 느려집니다.
+
+이 스크립트의 엔진은 (리밸런싱 날짜 × 자산) 목표 비중 행렬을 받아
+거래 수량, 회전율, 수수료, 자산 가치 곡선을 자산 축 배열 연산으로 계산합니다.
+- 두 전략은 비중 생성 함수(equal_weight_weights, inverse_volatility_weights)로 표현
+- 주문 규칙은 Cerebro와 같음: 종가 기준 목표 수량(정수 절사), 최소 거래 금액,
+  매도 먼저 제출, 다음 봉 시가 체결, 제출 시점 현금 확인과 체결 시점 현금 부족 거절
+- 같은 데이터로 Cerebro 결과(거래 내역, 최종 자산)와 비교
+"""
+
+import os
+import sys
+import math
+import time
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import yfinance as yf
+import backtrader as bt
+
+# 예제 스크립트 불러오기 도우미 (codes/chapter_loader.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chapter_loader import load_chapter_module
+
+# 한글 폰트 설정
+plt.rcParams['font.family'] = ['Nanum Gothic', 'Malgun Gothic', 'AppleGothic', 'Arial Unicode MS', 'DejaVu Sans']
+plt.rcParams['axes.unicode_minus'] = False
+
+
+def rebalance_dates(index, months=(3, 6, 9, 12), warmup=1):
+    """리밸런싱 날짜 (전략의 rebalance_flag 규칙과 같음)
+
+    리밸런싱 월에 들어선 첫 봉에서 한 번만 실행하고, 리밸런싱 월이 아닌 봉이 나와야 다시 실행합니다.
+    warmup은 전략의 next가 처음 호출되는 봉 수 (지표 기간)입니다.
+    """
+    eligible = np.isin(index.month, months)
+    previous = np.concatenate([[False], eligible[:-1]])
+    trigger = eligible & ~previous
+    # 워밍업이 리밸런싱 월 중간에 끝나면 그 봉에서 바로 실행
+    trigger[warmup - 1] = eligible[warmup - 1]
+    trigger[:warmup - 1] = False
+    return index[trigger]
+
+
+def equal_weight_weights(close, months=(3, 6, 9, 12)):
+    """균등 비중 (EqualWeightStrategy)"""
+    dates = rebalance_dates(close.index, months)
+    return pd.DataFrame(1.0 / close.shape[1], index=dates, columns=close.columns)
+
+
+def bt_stddev(values, period, end):
+    """backtrader StdDev와 같은 계산: sqrt(SMA(x²) - SMA(x)²), SMA는 math.fsum"""
+    window = values[end - period + 1:end + 1]
+    mean = math.fsum(window) / period
+    meansq = math.fsum(window * window) / period
+    return (meansq - mean ** 2) ** 0.5
+
+
+def inverse_volatility_weights(close, period=60, months=(3, 6, 9, 12)):
+    """역변동성 비중 (InverseVolatilityStrategy)
+
+    변동성은 리밸런싱 날짜에서만 계산합니다. 변동성이 0 이하인 자산은 NaN (주문하지 않음).
+    """
+    dates = rebalance_dates(close.index, months, warmup=period)
+    positions = close.index.get_indexer(dates)
+    values = close.values
+
+    vols = np.array([[bt_stddev(values[:, j], period, i) for j in range(values.shape[1])]
+                     for i in positions])
+    inv_vols = np.where(vols > 0, 1.0 / np.where(vols > 0, vols, 1.0), np.nan)
+    weights = inv_vols / np.nansum(inv_vols, axis=1, keepdims=True)
+    return pd.DataFrame(weights, index=dates, columns=close.columns)
+
+
+def _execute_orders(cash, sizes, prices, commission):
+    """체결 시점 처리: 제출 순서대로 체결하고 현금이 부족한 매수는 거절
+
+    모든 매수가 현금 안에서 체결되면 누적 합 한 번으로 끝나고,
+    부족한 경우에만 순서대로 다시 계산합니다 (거절된 주문은 현금을 쓰지 않음).
+    """
+    flows = -sizes * prices - np.abs(sizes) * prices * commission
+    running = cash + np.cumsum(flows)
+    if (running[sizes > 0] >= 0).all():
+        return sizes, running[-1] if len(running) else cash
+
+    executed = sizes.copy()
+    for k in range(len(sizes)):
+        if sizes[k] > 0 and cash + flows[k] < 0:
+            executed[k] = 0
+        else:
+            cash += flows[k]
+    return executed, cash
+
+
+def run_vectorized_portfolio(open_prices, close_prices, weights, cash=10000.0,
+                             commission=0.001, min_trade_value=100.0):
+    """목표 비중 행렬로 리밸런싱 포트폴리오 시뮬레이션
+
+    Parameters:
+    -----------
+    open_prices, close_prices : pd.DataFrame
+        (날짜 × 자산) 시가/종가 (같은 인덱스와 컬럼)
+    weights : pd.DataFrame
+        (리밸런싱 날짜 × 자산) 목표 비중 (NaN이면 그 자산은 주문하지 않음)
+    min_trade_value : float
+        목표 가치와 현재 가치의 차이가 이 금액보다 클 때만 주문
+
+    Returns:
+    --------
+    dict
+        equity(자산 가치 Series), trades(체결 내역 DataFrame), turnover(리밸런싱별 회전율),
+        commission(총 수수료), rejected(거절된 주문 수)
+    """
+    close = close_prices.values
+    opens = open_prices.values
+    n_days, n_assets = close.shape
+    asset_names = np.asarray(close_prices.columns)
+
+    initial_cash = cash
+    holdings = np.zeros(n_assets)
+    exec_days, exec_holdings, exec_cash = [], [], []
+    trades, turnover = [], {}
+    total_commission = 0.0
+    rejected = 0
+
+    for date, target in zip(weights.index, weights.values):
+        t = close_prices.index.get_loc(date)
+        if t + 1 >= n_days:
+            break  # 마지막 봉의 주문은 체결되지 않음
+
+        # 1. 목표 수량 (종가 기준 포트폴리오 가치, 정수 절사)
+        value = cash + holdings @ close[t]
+        diff = value * target - holdings * close[t]
+        sizes = np.where(np.abs(diff) > min_trade_value, np.trunc(diff / close[t]), 0.0)
+        sizes[np.isnan(sizes)] = 0.0
+        order_idx = np.flatnonzero(sizes)
+        # 제출 순서: 매도 먼저, 같은 방향은 자산 순서 (RebalancingStrategy.rebalance_orders)
+        order_idx = order_idx[np.argsort(sizes[order_idx] > 0, kind='stable')]
+        sizes = sizes[order_idx]
+
+        # 2. 제출 시점 확인: 종가로 가상 체결한 누적 현금이 음수가 되는 주문은 거절
+        #    (Backtrader는 거절된 주문의 금액도 누적 현금에서 뺀 채로 다음 주문을 확인함)
+        created = close[t, order_idx]
+        pseudo = cash + np.cumsum(-sizes * created - np.abs(sizes) * created * commission)
+        accepted = pseudo >= 0
+        rejected += int((~accepted).sum())
+        order_idx, sizes = order_idx[accepted], sizes[accepted]
+
+        # 3. 다음 봉 시가로 체결
+        prices = opens[t + 1, order_idx]
+        executed, cash = _execute_orders(cash, sizes, prices, commission)
+        rejected += int((executed != sizes).sum())
+        holdings[order_idx] += executed
+
+        fees = np.abs(executed) * prices * commission
+        total_commission += fees.sum()
+        done = executed != 0
+        trades.append(pd.DataFrame({
+            'date': close_prices.index[t + 1],
+            'asset': asset_names[order_idx[done]],
+            'size': executed[done],
+            'price': prices[done],
+            'value': -executed[done] * prices[done],
+            'commission': fees[done],
+        }))
+        turnover[close_prices.index[t + 1]] = np.abs(executed * prices).sum() / value
+
+        exec_days.append(t + 1)
+        exec_holdings.append(holdings.copy())
+        exec_cash.append(cash)
+
+    # 4. 체결 사이 구간은 보유 수량이 같으므로 체결 시점 상태를 날짜 축으로 펼침
+    segment = np.searchsorted(exec_days, np.arange(n_days), side='right') - 1
+    all_holdings = np.vstack([np.zeros(n_assets)] + exec_holdings)[segment + 1]
+    all_cash = np.concatenate([[initial_cash], exec_cash])[segment + 1]
+    equity = all_cash + (all_holdings * close).sum(axis=1)
+
+    return {
+        'equity': pd.Series(equity, index=close_prices.index, name='equity'),
+        'trades': pd.concat(trades, ignore_index=True) if trades else pd.DataFrame(),
+        'turnover': pd.Series(turnover, name='turnover'),
+        'commission': total_commission,
+        'rejected': rejected,
+    }
+
+
+class EquityRecorder(bt.Analyzer):
+    """봉마다 포트폴리오 가치를 기록하는 분석기 (Cerebro 결과 비교용)"""
+
+    def start(self):
+        self.values = {}
+
+    def next(self):
+        self.values[self.data.datetime.date(0)] = self.strategy.broker.getvalue()
+
+    def get_analysis(self):
+        return self.values
+
+
+def download_prices(tickers, start_date, end_date):
+    """종목별 OHLCV 다운로드 (공통 날짜만 사용)"""
+    all_data = {}
+    for ticker in tickers:
+        data = yf.download(ticker, start=start_date, end=end_date, progress=False)
+        if isinstance(data.columns, pd.MultiIndex):
+            data.columns = data.columns.droplevel(1)
+        if not data.empty:
+            all_data[ticker] = data
+
+    common = None
+    for data in all_data.values():
+        common = data.index if common is None else common.intersection(data.index)
+    return {ticker: data.loc[common] for ticker, data in all_data.items()}
+
+
+def synthetic_prices(n_assets, n_days=1260, seed=42):
+    """기하 브라운 운동으로 만든 가상 자산 OHLCV (자산마다 시드 고정)"""
+    index = pd.bdate_range('2019-01-02', periods=n_days)
+    all_data = {}
+    for i in range(n_assets):
+        rng = np.random.default_rng(seed + i)
+        close = 100 * np.exp(np.cumsum(rng.normal(0.0004, rng.uniform(0.01, 0.03), n_days)))
+        open_ = close * (1 + rng.normal(0, 0.005, n_days))
+        all_data[f'A{i:04d}'] = pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) * 1.005,
+            'Low': np.minimum(open_, close) * 0.995,
+            'Close': close,
+            'Volume': 1e6,
+        }, index=index)
+    return all_data
+
+
+def run_cerebro(all_data, strategy_class, cash=10000.0, commission=0.001):
+    """01_portfolio_diversification.py와 같은 설정의 Cerebro 실행"""
+    cerebro = bt.Cerebro()
+    cerebro.addstrategy(strategy_class)
+    for ticker, data in all_data.items():
+        cerebro.adddata(bt.feeds.PandasData(dataname=data), name=ticker)
+    cerebro.broker.setcash(cash)
+    cerebro.broker.setcommission(commission=commission)
+    cerebro.addanalyzer(bt.analyzers.Transactions, _name='transactions')
+    cerebro.addanalyzer(EquityRecorder, _name='equity')
+
+    t0 = time.perf_counter()
+    strategy = cerebro.run()[0]
+    elapsed = time.perf_counter() - t0
+
+    trades = [(pd.Timestamp(dt).normalize(), tx[3], tx[0], tx[1])
+              for dt, txs in strategy.analyzers.transactions.get_analysis().items() for tx in txs]
+    equity = pd.Series(strategy.analyzers.equity.get_analysis())
+    equity.index = pd.to_datetime(equity.index)
+    return {'equity': equity, 'trades': trades, 'elapsed': elapsed}
+
+
+def run_engine(all_data, weight_func, **kwargs):
+    """비중 생성 함수 → 벡터화 엔진 실행 (실행 시간 포함)"""
+    open_prices = pd.DataFrame({ticker: data['Open'] for ticker, data in all_data.items()})
+    close_prices = pd.DataFrame({ticker: data['Close'] for ticker, data in all_data.items()})
+
+    t0 = time.perf_counter()
+    weights = weight_func(close_prices)
+    result = run_vectorized_portfolio(open_prices, close_prices, weights, **kwargs)
+    result['elapsed'] = time.perf_counter() - t0
+    result['weights'] = weights
+    return result
+
+
+def compare_with_cerebro(engine, cerebro):
+    """거래 내역과 자산 가치 곡선 비교"""
+    engine_trades = sorted((pd.Timestamp(r.date), r.asset, r.size, r.price)
+                           for r in engine['trades'].itertuples(index=False))
+    same_trades = engine_trades == sorted(cerebro['trades'])
+    equity_diff = np.max(np.abs(engine['equity'].loc[cerebro['equity'].index].values
+                                - cerebro['equity'].values))
+    return same_trades, equity_diff
+
+
+def plot_engine_results(results, save_name='vectorized_rebalancing.png'):
+    """자산 가치 곡선과 리밸런싱 회전율"""
+    fig, axes = plt.subplots(1, 2, figsize=(15, 5))
+    fig.suptitle('Vectorized Rebalancing Engine', fontsize=14, fontweight='bold')
+
+    for name, result in results.items():
+        axes[0].plot(result['equity'].index, result['equity'].values, label=name, linewidth=1.5)
+        axes[1].plot(result['turnover'].index, result['turnover'].values * 100, marker='o', label=name)
+
+    axes[0].set_title('Portfolio Value', fontsize=11, fontweight='bold')
+    axes[0].set_ylabel('Value ($)')
+    axes[0].legend(loc='best')
+    axes[0].grid(True, alpha=0.3)
+
+    axes[1].set_title('Turnover per Rebalance', fontsize=11, fontweight='bold')
+    axes[1].set_ylabel('Turnover (%)')
+    axes[1].legend(loc='best')
+    axes[1].grid(True, alpha=0.3)
+
+    plt.tight_layout()
+
+    # 저장
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    images_dir = os.path.join(script_dir, 'images')
+    os.makedirs(images_dir, exist_ok=True)
+    save_path = os.path.join(images_dir, save_name)
+    plt.savefig(save_path, dpi=150, bbox_inches='tight')
+    print(f"\n차트 저장 완료: {save_path}")
+
+
+def main():
+    """메인 실행 함수"""
+    print("=" * 60)
+    print("Chapter 11: Vectorized Rebalancing Engine")
+    print("=" * 60)
+
+    portfolio = load_chapter_module('chapter11', '01_portfolio_diversification.py')
+    strategies = {
+        '균등 비중': (portfolio.EqualWeightStrategy, equal_weight_weights),
+        '역변동성': (portfolio.InverseVolatilityStrategy, inverse_volatility_weights),
+    }
+
+    # 1. 01과 같은 4개 종목: Cerebro와 결과 비교
+    tickers = ['AAPL', 'MSFT', 'GOOGL', 'AMZN']
+    all_data = download_prices(tickers, '2019-01-01', '2024-01-01')
+    if len(all_data) != len(tickers):
+        print("데이터 다운로드 실패")
+        return
+
+    print(f"\n{'='*60}")
+    print(f"=== Cerebro vs 벡터화 엔진 ({', '.join(tickers)}) ===")
+    print(f"{'='*60}")
+    results = {}
+    for name, (strategy_class, weight_func) in strategies.items():
+        cerebro = run_cerebro(all_data, strategy_class)
+        engine = run_engine(all_data, weight_func)
+        same_trades, equity_diff = compare_with_cerebro(engine, cerebro)
+        results[name] = engine
+
+        print(f"\n[{name}]")
+        print(f"최종 자산: Cerebro ${cerebro['equity'].iloc[-1]:,.2f}, 엔진 ${engine['equity'].iloc[-1]:,.2f}")
+        print(f"거래 {len(engine['trades'])}건, 거래 내역 일치: {same_trades}, 자산 곡선 최대 오차: {equity_diff:.2e}")
+        print(f"평균 회전율: {engine['turnover'].mean():.2%}, 총 수수료: ${engine['commission']:,.2f}, "
+              f"거절된 주문: {engine['rejected']}")
+
+    plot_engine_results(results)
+
+    # 2. 자산 수에 따른 실행 시간
+    print(f"\n{'='*60}")
+    print("=== 자산 수에 따른 실행 시간 (역변동성, 5년) ===")
+    print(f"{'='*60}")
+    print(f"{'자산 수':>8} {'Cerebro':>12} {'엔진':>10} {'거래 일치':>10}")
+    for n_assets in [10, 50, 500]:
+        universe = synthetic_prices(n_assets)
+        engine = run_engine(universe, inverse_volatility_weights)
+        if n_assets <= 50:
+            cerebro = run_cerebro(universe, portfolio.InverseVolatilityStrategy)
+            same_trades, _ = compare_with_cerebro(engine, cerebro)
+            print(f"{n_assets:>8} {cerebro['elapsed']:>11.2f}초 {engine['elapsed']:>9.3f}초 {str(same_trades):>10}")
+        else:
+            print(f"{n_assets:>8} {'-':>12} {engine['elapsed']:>9.3f}초 {'-':>10}")
+
+    print("\n분석 완료!")
+
+
+if __name__ == '__main__':
+    main()
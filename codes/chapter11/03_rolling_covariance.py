@@ -0,0 +1,307 @@
+"""
+Chapter 11: 포트폴리오 구성과 분산투자
+Rolling Covariance Engine
+
+01_portfolio_diversification.py의 InverseVolatilityStrategy는 자산마다
+bt.indicators.StdDev를 하나씩 만들어 봉마다 윈도우 전체를 다시 계산합니다.
+이 스크립트의 RollingCovariance는 윈도우 합(Σx, Σx², Σxxᵀ)을 갱신해
+변동성은 봉당 O(N)에, N×N 공분산 행렬은 조회할 때 O(kN²)에 유지합니다.
+- 봉마다 Σx, Σx²만 갱신하고, Σxxᵀ는 조회할 때 쌓인 봉 k개를 행렬 곱으로 한 번에 반영
+  (새 관측은 더하고 윈도우에서 빠진 관측은 빼므로 비용은 윈도우 길이와 무관)
+- 첫 관측을 기준값으로 빼서 계산해 큰 값끼리의 상쇄 오차를 줄이고,
+  윈도우 길이마다 버퍼로 합을 다시 계산해 누적 오차를 없앰
+- 어느 리밸런싱 날짜에서든 변동성과 상관관계를 바로 조회
+
+봉마다 전체 공분산 행렬을 조회하면 새 봉과 빠지는 봉을 함께 반영하느라 2N² 곱셈이 들어서,
+윈도우 60 정도에서는 np.cov로 다시 계산하는 것보다 빠르지 않습니다 (아래 벤치마크 참고).
+이득이 나는 경우는 변동성만 추적할 때, 윈도우가 길 때(252봉 등),
+그리고 리밸런싱 날짜처럼 가끔만 행렬을 조회해 여러 봉을 한 번의 행렬 곱으로 반영할 때입니다.
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# 예제 스크립트 불러오기 도우미 (codes/chapter_loader.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chapter_loader import load_chapter_module
+
+
+class RollingCovariance:
+    """윈도우 합으로 갱신하는 롤링 공분산
+
+    Parameters:
+    -----------
+    n_assets : int
+        자산 수
+    window : int
+        윈도우 길이 (봉 수)
+    ddof : int
+        자유도 보정 (1: 표본 공분산, 0: 모공분산 - backtrader StdDev와 같음)
+    full : bool
+        False이면 대각 성분(분산)만 유지 (봉당 O(N))
+    recompute_every : int
+        이 봉 수마다 버퍼로 합을 다시 계산 (기본값: window)
+    """
+
+    def __init__(self, n_assets, window, ddof=1, full=True, recompute_every=None):
+        self.window = window
+        self.ddof = ddof
+        self.full = full
+        self.recompute_every = recompute_every or window
+        self.buffer = np.zeros((window, n_assets))
+        self.sum = np.zeros(n_assets)
+        self.sumsq = np.zeros(n_assets)
+        self.cross = np.zeros((n_assets, n_assets)) if full else None
+        self.shift = None
+        self._pending = []
+        self.count = 0
+        self._pos = 0
+        self._since_recompute = 0
+
+    def update(self, x):
+        """새 관측 벡터(자산별 값) 하나 추가 (O(N), 공분산 행렬은 조회할 때 반영)"""
+        x = np.asarray(x, dtype=np.float64)
+        if self.shift is None:
+            self.shift = x.copy()
+        d = x - self.shift
+
+        old = self.buffer[self._pos].copy() if self.count == self.window else None
+        self.count = min(self.count + 1, self.window)
+        self.buffer[self._pos] = d
+        self._pos = (self._pos + 1) % self.window
+
+        self.sum += d
+        self.sumsq += d * d
+        if old is not None:
+            self.sum -= old
+            self.sumsq -= old * old
+        if self.full:
+            self._pending.append((d, old))
+
+        self._since_recompute += 1
+        if self._since_recompute >= self.recompute_every:
+            self._recompute()
+
+    def _sync(self):
+        """쌓인 관측을 Σxxᵀ에 반영
+
+        봉 k개가 쌓였으면 Σxxᵀ += D_newᵀ D_new - D_oldᵀ D_old 를 행렬 곱 한 번(O(kN²))으로 처리하고,
+        윈도우 길이 이상 쌓였으면 버퍼로 다시 계산합니다 (O(window·N²)).
+        """
+        if not self._pending:
+            return
+        if len(self._pending) >= self.window:
+            self._recompute()
+            return
+        # 새 관측(+1)과 빠진 관측(-1)을 쌓아 행렬 곱 한 번으로 처리
+        rows = [d for d, _ in self._pending] + [o for _, o in self._pending if o is not None]
+        signs = np.r_[np.ones(len(self._pending)), -np.ones(len(rows) - len(self._pending))]
+        rows = np.array(rows)
+        self.cross += rows.T @ (rows * signs[:, None])
+        self._pending = []
+
+    def _recompute(self):
+        """버퍼에 있는 관측으로 합을 다시 계산 (누적 반올림 오차 제거)"""
+        rows = self.buffer if self.count == self.window else self.buffer[:self.count]
+        self.sum = rows.sum(axis=0)
+        self.sumsq = (rows * rows).sum(axis=0)
+        if self.full:
+            self.cross = rows.T @ rows
+            self._pending = []
+        self._since_recompute = 0
+
+    @property
+    def ready(self):
+        return self.count == self.window
+
+    def variances(self):
+        """자산별 분산 (O(N))"""
+        n = self.count
+        return np.maximum(self.sumsq - self.sum ** 2 / n, 0.0) / (n - self.ddof)
+
+    def volatility(self):
+        """자산별 표준편차"""
+        return np.sqrt(self.variances())
+
+    def covariance(self):
+        """N×N 공분산 행렬"""
+        if not self.full:
+            raise ValueError("full=False이면 공분산 행렬을 유지하지 않습니다")
+        self._sync()
+        n = self.count
+        cov = np.multiply.outer(self.sum, self.sum / -n)
+        cov += self.cross
+        cov /= n - self.ddof
+        return cov
+
+    def correlation(self):
+        """N×N 상관관계 행렬"""
+        cov = self.covariance()
+        vol = np.sqrt(np.maximum(np.diag(cov), 0.0))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return cov / np.outer(vol, vol)
+
+
+def rolling_risk_snapshots(values, dates, window, ddof=1, full=True):
+    """(날짜 × 자산) 값을 한 봉씩 넣으며 요청한 날짜의 엔진 상태를 조회
+
+    Yields:
+    -------
+    tuple
+        (날짜, RollingCovariance) - 윈도우가 찬 날짜만
+    """
+    engine = RollingCovariance(values.shape[1], window, ddof=ddof, full=full)
+    wanted = set(values.index.get_indexer(dates))
+    for i, row in enumerate(values.values):
+        engine.update(row)
+        if i in wanted and engine.ready:
+            yield values.index[i], engine
+
+
+def rolling_inverse_volatility_weights(close, period=60, months=(3, 6, 9, 12)):
+    """역변동성 비중 (02의 inverse_volatility_weights를 롤링 엔진으로 계산)
+
+    InverseVolatilityStrategy와 같이 종가의 모표준편차(ddof=0)를 쓰며 대각 성분만 갱신합니다.
+    """
+    dates = rebalancing.rebalance_dates(close.index, months, warmup=period)
+    rows = {}
+    for date, engine in rolling_risk_snapshots(close, dates, period, ddof=0, full=False):
+        vols = engine.volatility()
+        inv_vols = np.where(vols > 0, 1.0 / np.where(vols > 0, vols, 1.0), np.nan)
+        rows[date] = inv_vols / np.nansum(inv_vols)
+    return pd.DataFrame.from_dict(rows, orient='index', columns=close.columns)
+
+
+portfolio = load_chapter_module('chapter11', '01_portfolio_diversification.py')
+rebalancing = load_chapter_module('chapter11', '02_vectorized_rebalancing.py')
+
+
+class RollingInverseVolatilityStrategy(portfolio.InverseVolatilityStrategy):
+    """자산별 StdDev 지표 대신 롤링 엔진 하나로 변동성을 갱신하는 역변동성 전략"""
+
+    def __init__(self):
+        portfolio.RebalancingStrategy.__init__(self)  # StdDev 지표는 만들지 않음
+        self.risk = RollingCovariance(len(self.datas), self.params.volatility_period, ddof=0, full=False)
+
+    def next(self):
+        self.risk.update([data.close[0] for data in self.datas])
+        super().next()
+
+    def get_volatilities(self):
+        return dict(zip([data._name for data in self.datas], self.risk.volatility()))
+
+
+def synthetic_returns(n_assets, n_days, seed=42):
+    """공통 요인이 있는 가상 일간 수익률 (자산 간 상관관계가 있도록)"""
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0.0003, 0.01, n_days)
+    betas = rng.uniform(0.5, 1.5, n_assets)
+    noise = rng.normal(0, 1, (n_days, n_assets)) * rng.uniform(0.005, 0.02, n_assets)
+    index = pd.bdate_range('2019-01-02', periods=n_days)
+    return pd.DataFrame(market[:, None] * betas + noise, index=index,
+                        columns=[f'A{i:04d}' for i in range(n_assets)])
+
+
+def main():
+    """메인 실행 함수"""
+    print("=" * 60)
+    print("Chapter 11: Rolling Covariance Engine")
+    print("=" * 60)
+
+    window = 60
+
+    # 1. 정확도: 1,000개 자산의 롤링 공분산 vs np.cov (처음부터 계산)
+    returns = synthetic_returns(1000, 1260)
+    check_dates = returns.index[[window - 1, 300, 777, 1259]]
+    max_cov_err = max_corr_err = 0.0
+    for date, engine in rolling_risk_snapshots(returns, check_dates, window):
+        i = returns.index.get_loc(date)
+        expected = np.cov(returns.values[i - window + 1:i + 1], rowvar=False)
+        max_cov_err = max(max_cov_err, np.abs(engine.covariance() - expected).max())
+        expected_corr = np.corrcoef(returns.values[i - window + 1:i + 1], rowvar=False)
+        max_corr_err = max(max_corr_err, np.abs(engine.correlation() - expected_corr).max())
+
+    print(f"\n{'='*60}")
+    print(f"=== 정확도 (1,000개 자산, 윈도우 {window}) ===")
+    print(f"{'='*60}")
+    print(f"공분산 최대 오차: {max_cov_err:.2e}")
+    print(f"상관관계 최대 오차: {max_corr_err:.2e}")
+
+    # 2. 매 봉 공분산이 필요할 때 (일간 리스크 모니터링): 증분 갱신 vs 매번 다시 계산
+    print(f"\n{'='*60}")
+    print("=== 봉당 공분산 계산 시간 (250봉 평균) ===")
+    print(f"{'='*60}")
+    print(f"{'자산 수':>8} {'윈도우':>6} {'np.cov 재계산':>14} {'증분 갱신':>12} {'변동성만':>10}")
+    n_bars = 250
+    for n_assets in [100, 500, 1000]:
+        for length in [60, 252]:
+            values = returns.values[:length + n_bars, :n_assets]
+
+            t0 = time.perf_counter()
+            for i in range(length, length + n_bars):
+                np.cov(values[i - length + 1:i + 1], rowvar=False)
+            recompute = (time.perf_counter() - t0) / n_bars
+
+            timings = []
+            for full in [True, False]:
+                engine = RollingCovariance(n_assets, length, full=full)
+                for row in values[:length]:
+                    engine.update(row)
+                t0 = time.perf_counter()
+                for row in values[length:]:
+                    engine.update(row)
+                    engine.covariance() if full else engine.volatility()
+                timings.append((time.perf_counter() - t0) / n_bars)
+
+            print(f"{n_assets:>8} {length:>6} {recompute * 1000:>12.2f}ms {timings[0] * 1000:>10.2f}ms "
+                  f"{timings[1] * 1000:>8.3f}ms")
+
+    # 3. 역변동성 비중: backtrader StdDev와 같은 값인지, 거래 결과가 같은지
+    all_data = rebalancing.download_prices(['AAPL', 'MSFT', 'GOOGL', 'AMZN'], '2019-01-01', '2024-01-01')
+    if len(all_data) != 4:
+        print("데이터 다운로드 실패")
+        return
+
+    close = pd.DataFrame({ticker: data['Close'] for ticker, data in all_data.items()})
+    exact = rebalancing.inverse_volatility_weights(close)
+    rolling = rolling_inverse_volatility_weights(close)
+
+    indicator_run = rebalancing.run_cerebro(all_data, portfolio.InverseVolatilityStrategy)
+    engine_run = rebalancing.run_cerebro(all_data, RollingInverseVolatilityStrategy)
+
+    print(f"\n{'='*60}")
+    print("=== 역변동성 전략 (AAPL, MSFT, GOOGL, AMZN) ===")
+    print(f"{'='*60}")
+    print(f"비중 최대 차이 (StdDev 지표 vs 롤링 엔진): {np.abs(exact.values - rolling.values).max():.2e}")
+    print(f"Cerebro 거래 내역 일치: {indicator_run['trades'] == engine_run['trades']}")
+    print(f"최종 자산: StdDev 지표 ${indicator_run['equity'].iloc[-1]:,.2f}, "
+          f"롤링 엔진 ${engine_run['equity'].iloc[-1]:,.2f}")
+
+    # 4. 1,000개 자산 리밸런싱 날짜의 변동성/상관관계 조회
+    prices = 100 * np.exp(returns.cumsum())
+    t0 = time.perf_counter()
+    weights = rolling_inverse_volatility_weights(prices)
+    weight_time = time.perf_counter() - t0
+
+    dates = rebalancing.rebalance_dates(returns.index, warmup=window)
+    t0 = time.perf_counter()
+    mean_corr = {date: (engine.correlation().sum() - len(returns.columns)) /
+                 (len(returns.columns) * (len(returns.columns) - 1))
+                 for date, engine in rolling_risk_snapshots(returns, dates, window)}
+    corr_time = time.perf_counter() - t0
+
+    print(f"\n{'='*60}")
+    print("=== 1,000개 자산, 5년 ===")
+    print(f"{'='*60}")
+    print(f"역변동성 비중 ({len(weights)}회 리밸런싱): {weight_time:.2f}초")
+    print(f"리밸런싱 날짜별 상관관계 행렬 ({len(mean_corr)}개): {corr_time:.2f}초")
+    print(f"평균 자산 간 상관계수: {np.mean(list(mean_corr.values())):.3f}")
+
+    print("\n분석 완료!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+Chapter 11: 포트폴리오 구성과 분산투자
+Universe Scaling Benchmark
+
+01_portfolio_diversification.py의 run_portfolio는 모든 종목을 먼저 내려받고
+피드를 한꺼번에 만든 뒤 Cerebro가 시작할 때 전부 preload합니다.
+이 스크립트는 종목 수(10/100/500/2,000개 가상 종목)에 따라 Cerebro의 실행 시간과
+메모리가 어떻게 늘어나는지 측정하고, 지연 로딩 모드(listings 인자)와 비교합니다.
+- 종목마다 상장일이 다른 가상 유니버스 (일부는 시작일, 나머지는 기간 중 상장)
+- 기존 방식: 모든 종목 데이터를 시작 전에 불러오고 preload
+- 지연 로딩: 상장일이 된 종목만 ListingData가 불러오고 preload 없이 진행
+  (ListingData는 numpy 배열에서 봉을 읽으므로 봉당 비용도 PandasData보다 작음)
+- 같은 유니버스에서 두 방식의 최종 자산이 같은지 확인하고,
+  시점별 상장 종목 수와 메모리를 함께 기록
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+# 예제 스크립트 불러오기 도우미 (codes/chapter_loader.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chapter_loader import load_chapter_module
+
+
+portfolio = load_chapter_module('chapter11', '01_portfolio_diversification.py')
+
+
+def synthetic_listings(n_assets, start_date, end_date, listed_at_start=0.2, seed=42):
+    """종목별 상장일 {종목: 상장일} (상장일 순서)
+
+    listed_at_start 비율의 종목은 시작일에 상장되어 있고, 나머지는 기간 중 임의의 영업일에 상장됩니다.
+    """
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range(start_date, end_date, inclusive='left')
+    n_start = max(1, int(n_assets * listed_at_start))
+    offsets = np.sort(np.r_[np.zeros(n_start, dtype=int),
+                            rng.integers(1, len(days), n_assets - n_start)])
+    return {f'A{i:04d}': days[offset] for i, offset in enumerate(offsets)}
+
+
+class SyntheticMarket:
+    """가상 종목 OHLCV를 만드는 loader (run_portfolio의 download_ticker 대신 사용)
+
+    종목마다 시드를 고정해 상장일부터 경로를 만들므로 언제 불러와도 같은 데이터를 반환합니다.
+    """
+
+    def __init__(self, listings, seed=42):
+        self.listings = listings
+        self.seed = seed
+        self.loads = 0
+
+    def __call__(self, ticker, start_date, end_date):
+        self.loads += 1
+        index = pd.bdate_range(self.listings[ticker], end_date, inclusive='left')
+        rng = np.random.default_rng(self.seed + int(ticker[1:]))
+        close = 100 * np.exp(np.cumsum(rng.normal(0.0004, rng.uniform(0.01, 0.03), len(index))))
+        open_ = close * (1 + rng.normal(0, 0.005, len(index)))
+        data = pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) * 1.005,
+            'Low': np.minimum(open_, close) * 0.995,
+            'Close': close,
+            'Volume': 1e6,
+        }, index=index)
+        return data.loc[pd.Timestamp(start_date):]
+
+
+class ListedEqualWeightStrategy(portfolio.EqualWeightStrategy):
+    """상장된 종목끼리 균등 비중 (아직 상장되지 않은 종목이 있어도 리밸런싱)"""
+
+    def prenext(self):
+        self.next()
+
+    def target_weights(self):
+        listed = [data for data in self.datas if len(data)]
+        return {data._name: 1.0 / len(listed) for data in listed}
+
+
+class BenchmarkStrategy(ListedEqualWeightStrategy):
+    """every봉마다 상장 종목 수와 tracemalloc 메모리를 기록하는 벤치마크 전략"""
+
+    params = (('every', 63),)
+
+    def __init__(self):
+        super().__init__()
+        self.memory = []
+
+    def next(self):
+        if len(self) % self.params.every == 1 and tracemalloc.is_tracing():
+            self.memory.append({
+                'date': self.datetime.date(0),
+                'listed': sum(1 for data in self.datas if len(data)),
+                'memory_mb': tracemalloc.get_traced_memory()[0] / 1024 ** 2,
+            })
+        super().next()
+
+
+def run_universe(n_assets, start_date, end_date, lazy, trace_memory=True):
+    """유니버스 하나를 기존 방식 또는 지연 로딩으로 실행
+
+    Returns:
+    --------
+    dict
+        elapsed(초), peak_mb(최대 메모리), final_value, loads(loader 호출 수), memory(시점별 기록)
+    """
+    listings = synthetic_listings(n_assets, start_date, end_date)
+    market = SyntheticMarket(listings)
+
+    if trace_memory:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    _, strategy, _, final_value, _ = portfolio.run_portfolio(
+        list(listings), start_date, end_date, BenchmarkStrategy,
+        listings=listings if lazy else None, loader=market, cash=10000.0 * n_assets)
+    elapsed = time.perf_counter() - t0
+    peak = 0
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        'elapsed': elapsed,
+        'peak_mb': peak / 1024 ** 2,
+        'final_value': final_value,
+        'loads': market.loads,
+        'memory': pd.DataFrame(strategy.memory),
+    }
+
+
+def main():
+    """메인 실행 함수"""
+    print("=" * 60)
+    print("Chapter 11: Universe Scaling Benchmark")
+    print("=" * 60)
+
+    start_date, end_date = '2019-01-01', '2020-01-01'
+
+    # 1. 종목 수에 따른 실행 시간과 메모리
+    print(f"\n{'='*60}")
+    print(f"=== 종목 수에 따른 Cerebro 실행 시간/메모리 ({start_date} ~ {end_date}, 균등 비중) ===")
+    print(f"{'='*60}")
+    print(f"{'종목 수':>8} {'방식':>8} {'실행 시간':>10} {'종목당':>10} {'최대 메모리':>12} {'최종 자산':>16}")
+
+    # tracemalloc은 할당마다 비용이 있으므로 실행 시간은 따로 측정하고,
+    # 메모리는 500개 종목까지만 측정 (종목 수에 비례해 늘어남)
+    results = {}
+    for n_assets in [10, 100, 500, 2000]:
+        for lazy in [False, True]:
+            result = run_universe(n_assets, start_date, end_date, lazy, trace_memory=False)
+            if n_assets <= 500:
+                traced = run_universe(n_assets, start_date, end_date, lazy)
+                result.update(peak_mb=traced['peak_mb'], memory=traced['memory'])
+            results[n_assets, lazy] = result
+            peak = f"{result['peak_mb']:>10.1f}MB" if n_assets <= 500 else f"{'-':>12}"
+            print(f"{n_assets:>8} {'지연 로딩' if lazy else '기존':>8} {result['elapsed']:>9.2f}초 "
+                  f"{result['elapsed'] / n_assets * 1000:>8.1f}ms {peak} ${result['final_value']:>14,.2f}")
+        same = np.isclose(results[n_assets, False]['final_value'], results[n_assets, True]['final_value'])
+        print(f"{'':>8} 최종 자산 일치: {same}")
+
+    # 2. 시점별 상장 종목 수와 메모리 (500개 종목)
+    print(f"\n{'='*60}")
+    print("=== 시점별 상장 종목 수와 메모리 (500개 종목) ===")
+    print(f"{'='*60}")
+    eager, lazy = results[500, False]['memory'], results[500, True]['memory']
+    timeline = pd.DataFrame({
+        '날짜': lazy['date'],
+        '상장 종목': lazy['listed'],
+        '기존 (MB)': eager['memory_mb'].round(1),
+        '지연 로딩 (MB)': lazy['memory_mb'].round(1),
+    })
+    print(timeline.to_string(index=False))
+
+    print("\n분석 완료!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,455 @@
+"""
+Chapter 11: 포트폴리오 구성과 분산투자
+Warm-Started Portfolio Optimizer
+
+01_portfolio_diversification.py의 InverseVolatilityStrategy는 자산별 변동성만 보고
+자산 간 상관관계는 무시합니다. 상관관계까지 반영하는 비중 최적화는 리밸런싱마다 풀기에
+비싸므로, 이 스크립트의 최적화기는 이전 리밸런싱의 해와 계산 결과를 재사용합니다.
+- 리스크 패리티: 자산별 위험 기여도가 같은 비중 (감쇠 뉴턴법, 이전 해에서 시작)
+- 최소 분산 / 최대 분산도: 롱 온리 이차계획 문제를 활성 집합(active set) 방법으로 풀이
+  (이전 해의 보유 자산 집합에서 시작, 집합이 바뀔 때 역행렬을 O(k²)로 갱신)
+- 공분산 변화가 작으면 이전 공분산의 역행렬을 전처리기로 재사용 (켤레 기울기법)하고,
+  변화가 크거나 수렴하지 않을 때만 다시 분해
+- 500개 자산에서 리밸런싱당 풀이 시간을 처음부터 푸는 경우와 비교
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# 예제 스크립트 불러오기 도우미 (codes/chapter_loader.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chapter_loader import load_chapter_module
+
+
+rolling = load_chapter_module('chapter11', '03_rolling_covariance.py')
+portfolio = rolling.portfolio
+rebalancing = rolling.rebalancing
+
+
+def shrink_covariance(cov, delta=0.1):
+    """대각 행렬 쪽으로 축소한 공분산 (윈도우가 자산 수보다 짧아도 양의 정부호)"""
+    shrunk = cov * (1 - delta)
+    shrunk[np.diag_indices_from(shrunk)] = np.diag(cov)
+    return shrunk
+
+
+def _pcg(A, b, M, x0, tol=1e-12, max_iter=25):
+    """전처리 켤레 기울기법으로 A x = b 풀이 (M: A⁻¹의 근사)
+
+    Returns:
+    --------
+    tuple
+        (x, 반복 횟수, 수렴 여부)
+    """
+    x = x0.copy()
+    r = b - A @ x
+    z = M @ r
+    p = z.copy()
+    rz = r @ z
+    b_norm = np.linalg.norm(b)
+    for k in range(max_iter):
+        if np.linalg.norm(r) <= tol * b_norm:
+            return x, k, True
+        Ap = A @ p
+        alpha = rz / (p @ Ap)
+        x += alpha * p
+        r -= alpha * Ap
+        z = M @ r
+        rz_new = r @ z
+        p = z + (rz_new / rz) * p
+        rz = rz_new
+    return x, max_iter, np.linalg.norm(r) <= tol * b_norm
+
+
+class BudgetQPSolver:
+    """롱 온리 이차계획: min yᵀΣy  s.t. aᵀy = 1, y ≥ 0 (a > 0)
+
+    최소 분산(a = 1)과 최대 분산도(a = 자산별 변동성)가 같은 형태입니다.
+    보유 자산 집합 F에서는 y_F ∝ Σ_FF⁻¹ a_F 이므로, 집합에 자산을 하나씩 넣고 빼며
+    KKT 조건(보유하지 않은 자산의 승수 (Σy)_i - λa_i ≥ 0)을 만족할 때까지 반복합니다.
+
+    Σ_FF⁻¹은 기준 공분산(ref_cov)으로 만든 역행렬을 집합이 바뀔 때마다 블록 공식으로 갱신하고,
+    현재 공분산의 선형 시스템은 이 역행렬을 전처리기로 쓰는 켤레 기울기법으로 풉니다.
+    기준 공분산과의 상대 변화가 refactor_tol 이하이면 역행렬을 그대로 재사용합니다.
+
+    Parameters:
+    -----------
+    warm_start : bool
+        이전 해와 역행렬을 재사용할지 여부 (False이면 매번 처음부터 풀이)
+    refactor_tol : float
+        기준 공분산 대비 상대 변화(프로베니우스 노름)가 이 값을 넘으면 역행렬을 다시 계산
+    """
+
+    def __init__(self, warm_start=True, refactor_tol=0.05, tol=1e-10, max_iter=1000):
+        self.warm_start = warm_start
+        self.refactor_tol = refactor_tol
+        self.tol = tol
+        self.max_iter = max_iter
+        self.y = None
+        self._support = None
+        self._inv = None
+        self._ref_cov = None
+        self.stats = {'iterations': 0, 'cg_iterations': 0, 'refactorizations': 0}
+
+    def _refactor(self, cov, support):
+        """기준 공분산을 현재 공분산으로 바꾸고 보유 자산 블록의 역행렬을 다시 계산 (O(k³))"""
+        self._ref_cov = cov.copy()
+        self._inv = np.linalg.inv(cov[np.ix_(support, support)])
+        self.stats['refactorizations'] += 1
+
+    def _add(self, support, j):
+        """자산 j를 집합에 추가하고 역행렬 갱신 (O(k²))"""
+        u = self._ref_cov[support, j]
+        Bu = self._inv @ u
+        s = self._ref_cov[j, j] - u @ Bu
+        k = len(support)
+        inv = np.empty((k + 1, k + 1))
+        inv[:k, :k] = self._inv + np.outer(Bu, Bu) / s
+        inv[:k, k] = inv[k, :k] = -Bu / s
+        inv[k, k] = 1.0 / s
+        self._inv = inv
+        support.append(j)
+
+    def _remove(self, support, position):
+        """집합의 position번째 자산을 빼고 역행렬 갱신 (O(k²))"""
+        keep = np.r_[0:position, position + 1:len(support)]
+        col = self._inv[keep, position]
+        self._inv = self._inv[np.ix_(keep, keep)] - np.outer(col, col) / self._inv[position, position]
+        del support[position]
+
+    def _solve_support(self, cov, a, support, z0):
+        """Σ_FF z = a_F 풀이 (역행렬 전처리 켤레 기울기법, 수렴하지 않으면 다시 분해)"""
+        A = cov[np.ix_(support, support)]
+        z, iterations, converged = _pcg(A, a[support], self._inv, z0)
+        self.stats['cg_iterations'] += iterations
+        if not converged:
+            self._refactor(cov, support)
+            z = self._inv @ a[support]
+        return z
+
+    def solve(self, cov, a):
+        """최적 y 반환 (aᵀy = 1, y ≥ 0)"""
+        cov = np.asarray(cov, dtype=np.float64)
+        n = len(cov)
+
+        if self.warm_start and self.y is not None and len(self.y) == n:
+            # 이전 해의 보유 자산 집합에서 시작 (새 a에 맞게 비율만 조정하면 실행 가능한 해)
+            support = list(self._support)
+            y = self.y / (a @ self.y)
+            drift = np.linalg.norm(cov - self._ref_cov) / np.linalg.norm(self._ref_cov)
+            if drift > self.refactor_tol:
+                self._refactor(cov, support)
+        else:
+            # 처음부터: 단일 자산 분산이 가장 작은 자산 하나에서 시작
+            j = int(np.argmin(np.diag(cov) / a ** 2))
+            support = [j]
+            y = np.zeros(n)
+            y[j] = 1.0 / a[j]
+            self._refactor(cov, support)
+
+        z = self._inv @ a[support]
+        for _ in range(self.max_iter):
+            self.stats['iterations'] += 1
+            z = self._solve_support(cov, a, support, z)
+            y_star = z / (a[support] @ z)
+
+            if (y_star > 0).all():
+                y = np.zeros(n)
+                y[support] = y_star
+                # 보유하지 않은 자산의 KKT 승수: μ = Σy - λa, λ = yᵀΣy (aᵀy = 1)
+                risk = cov[:, support] @ y_star
+                mu = risk - (y_star @ risk[support]) * a
+                mu[support] = 0.0
+                j = int(np.argmin(mu))
+                if mu[j] >= -self.tol * (y_star @ risk[support]):
+                    break
+                self._add(support, j)
+                z = np.r_[z, 0.0]
+            else:
+                # 현재 해에서 y_star 쪽으로 가다가 처음 0이 되는 자산을 집합에서 제거
+                current = y[support]
+                direction = y_star - current
+                blocking = np.flatnonzero(direction < 0)
+                ratios = current[blocking] / -direction[blocking]
+                position = int(blocking[np.argmin(ratios)])
+                y[support] = current + min(ratios.min(), 1.0) * direction
+                y[support[position]] = 0.0
+                z = np.delete(z, position)
+                self._remove(support, position)
+
+        self.y = y
+        self._support = support
+        return y
+
+
+class MinimumVarianceOptimizer:
+    """롱 온리 최소 분산 비중"""
+
+    name = '최소 분산'
+
+    def __init__(self, warm_start=True, refactor_tol=0.05):
+        self.qp = BudgetQPSolver(warm_start, refactor_tol)
+
+    @property
+    def stats(self):
+        return self.qp.stats
+
+    def solve(self, cov):
+        return self.qp.solve(cov, np.ones(len(cov)))
+
+
+class MaximumDiversificationOptimizer:
+    """롱 온리 최대 분산도 비중 (분산도 = wᵀσ / √(wᵀΣw))
+
+    min yᵀΣy s.t. σᵀy = 1, y ≥ 0 의 해를 합이 1이 되도록 나눈 비중입니다.
+    """
+
+    name = '최대 분산도'
+
+    def __init__(self, warm_start=True, refactor_tol=0.05):
+        self.qp = BudgetQPSolver(warm_start, refactor_tol)
+
+    @property
+    def stats(self):
+        return self.qp.stats
+
+    def solve(self, cov):
+        y = self.qp.solve(cov, np.sqrt(np.diag(cov)))
+        return y / y.sum()
+
+
+class RiskParityOptimizer:
+    """리스크 패리티 비중 (자산별 위험 기여도 w_i (Σw)_i 가 budgets에 비례)
+
+    f(y) = ½ yᵀΣy - Σ b_i log y_i 의 최소점을 감쇠 뉴턴법으로 구하고 w = y / Σy 로 나눕니다.
+    목적 함수가 자기 일치(self-concordant)이므로 스텝을 1/(1+뉴턴 감소량)으로 줄이면 y > 0이 유지됩니다.
+    웜 스타트는 이전 해를 새 공분산에 맞게 크기만 조정해서 시작하고,
+    뉴턴 시스템 (Σ + diag(b/y²)) d = g 는 기준 헤시안의 역행렬을 전처리기로 쓰는
+    켤레 기울기법으로 풉니다 (헤시안 변화가 refactor_tol을 넘거나 수렴하지 않으면 역행렬을 다시 계산).
+    N×N 역행렬은 선형 시스템 한 번보다 몇 배 비싸므로 BudgetQPSolver보다 큰 변화까지 재사용합니다.
+    """
+
+    name = '리스크 패리티'
+
+    def __init__(self, budgets=None, warm_start=True, refactor_tol=0.1, tol=1e-10, max_iter=100):
+        self.budgets = budgets
+        self.warm_start = warm_start
+        self.refactor_tol = refactor_tol
+        self.tol = tol
+        self.max_iter = max_iter
+        self.y = None
+        self._inv = None
+        self._ref_hessian = None
+        self.stats = {'iterations': 0, 'cg_iterations': 0, 'refactorizations': 0}
+
+    def _newton_step(self, hessian, gradient):
+        """뉴턴 방향 d = H⁻¹g (웜 스타트이면 기준 역행렬 재사용)"""
+        if not self.warm_start:
+            return np.linalg.solve(hessian, gradient)
+
+        if self._inv is not None and len(self._inv) == len(hessian):
+            drift = np.linalg.norm(hessian - self._ref_hessian) / np.linalg.norm(self._ref_hessian)
+            if drift <= self.refactor_tol:
+                step, iterations, converged = _pcg(hessian, gradient, self._inv, self._inv @ gradient)
+                self.stats['cg_iterations'] += iterations
+                if converged:
+                    return step
+
+        self._ref_hessian = hessian
+        self._inv = np.linalg.inv(hessian)
+        self.stats['refactorizations'] += 1
+        return self._inv @ gradient
+
+    def solve(self, cov):
+        cov = np.asarray(cov, dtype=np.float64)
+        n = len(cov)
+        b = np.full(n, 1.0 / n) if self.budgets is None else np.asarray(self.budgets) / np.sum(self.budgets)
+
+        if self.warm_start and self.y is not None and len(self.y) == n:
+            y = self.y.copy()
+        else:
+            y = 1.0 / np.sqrt(np.diag(cov))  # 역변동성 비중에서 시작
+        y *= np.sqrt(b.sum() / (y @ cov @ y))  # 최적해는 yᵀΣy = Σb
+
+        for _ in range(self.max_iter):
+            self.stats['iterations'] += 1
+            risk = cov @ y
+            if np.max(np.abs(y * risk - b)) <= self.tol * b.max():
+                break
+            gradient = risk - b / y
+            hessian = cov.copy()
+            hessian[np.diag_indices(n)] += b / y ** 2
+            step = self._newton_step(hessian, gradient)
+            decrement = np.sqrt(gradient @ step)
+            y -= step / (1.0 + decrement) if decrement > 0.25 else step
+
+        self.y = y
+        return y / y.sum()
+
+
+def risk_contributions(weights, cov):
+    """자산별 위험 기여도 비율 (합 = 1)"""
+    contributions = weights * (cov @ weights)
+    return contributions / contributions.sum()
+
+
+class OptimizedWeightStrategy(portfolio.RebalancingStrategy):
+    """수익률 롤링 공분산과 비중 최적화기로 리밸런싱하는 전략 (최적화기는 리밸런싱 사이에 유지)"""
+
+    params = (
+        ('lookback', 60),  # 공분산 계산 기간 (수익률 봉 수)
+        ('shrinkage', 0.1),
+        ('optimizer_class', None),
+    )
+
+    def __init__(self):
+        super().__init__()
+        self.risk = rolling.RollingCovariance(len(self.datas), self.params.lookback)
+        self.optimizer = self.params.optimizer_class()
+
+    def next(self):
+        if len(self) > 1:
+            self.risk.update([data.close[0] / data.close[-1] - 1 for data in self.datas])
+        super().next()
+
+    def is_ready(self):
+        return self.risk.ready
+
+    def target_weights(self):
+        weights = self.optimizer.solve(shrink_covariance(self.risk.covariance(), self.params.shrinkage))
+        return dict(zip([data._name for data in self.datas], weights))
+
+
+class RiskParityStrategy(OptimizedWeightStrategy):
+    """리스크 패리티 포트폴리오"""
+    params = (('optimizer_class', RiskParityOptimizer),)
+
+
+class MinimumVarianceStrategy(OptimizedWeightStrategy):
+    """최소 분산 포트폴리오"""
+    params = (('optimizer_class', MinimumVarianceOptimizer),)
+
+
+class MaximumDiversificationStrategy(OptimizedWeightStrategy):
+    """최대 분산도 포트폴리오"""
+    params = (('optimizer_class', MaximumDiversificationOptimizer),)
+
+
+def rebalance_covariances(returns, dates, window, shrinkage=0.1):
+    """리밸런싱 날짜별 축소 공분산 {날짜: 공분산}"""
+    return {date: shrink_covariance(engine.covariance(), shrinkage)
+            for date, engine in rolling.rolling_risk_snapshots(returns, dates, window)}
+
+
+def benchmark_optimizer(make_optimizer, covariances):
+    """리밸런싱 순서대로 풀이 시간 측정
+
+    Returns:
+    --------
+    tuple
+        (비중 DataFrame, 리밸런싱별 풀이 시간 배열, 최적화기 통계)
+    """
+    optimizer = make_optimizer()
+    weights, times = {}, []
+    for date, cov in covariances.items():
+        t0 = time.perf_counter()
+        weights[date] = optimizer.solve(cov)
+        times.append(time.perf_counter() - t0)
+    return pd.DataFrame.from_dict(weights, orient='index'), np.array(times), optimizer.stats
+
+
+def equity_summary(equity):
+    """총 수익률, 연환산 변동성, 최대 낙폭"""
+    returns = equity.pct_change().dropna()
+    drawdown = 1 - equity / equity.cummax()
+    return equity.iloc[-1] / equity.iloc[0] - 1, returns.std() * np.sqrt(252), drawdown.max()
+
+
+def main():
+    """메인 실행 함수"""
+    print("=" * 60)
+    print("Chapter 11: Warm-Started Portfolio Optimizer")
+    print("=" * 60)
+
+    # 1. 500개 자산, 월별/주별 리밸런싱: 처음부터 풀이 vs 웜 스타트
+    n_assets, window = 500, 252
+    returns = rolling.synthetic_returns(n_assets, 1260 + window)
+    index = returns.index[window - 1:]
+    frequencies = {
+        '월별': index.month,
+        '주별': index.isocalendar().week.values,
+    }
+    optimizers = [RiskParityOptimizer, MinimumVarianceOptimizer, MaximumDiversificationOptimizer]
+
+    for frequency, periods in frequencies.items():
+        dates = index[np.r_[True, periods[1:] != periods[:-1]]]  # 기간별 첫 봉
+        covariances = rebalance_covariances(returns, dates, window)
+
+        print(f"\n{'='*60}")
+        print(f"=== 리밸런싱당 풀이 시간 ({n_assets}개 자산, 윈도우 {window}, "
+              f"{frequency} 리밸런싱 {len(covariances)}회) ===")
+        print(f"{'='*60}")
+        print(f"{'방법':<10} {'처음부터':>10} {'웜 스타트':>10} {'배속':>6} {'비중 최대 차이':>14} "
+              f"{'반복(처음/웜)':>14} {'재분해':>6} {'보유 자산':>8}")
+
+        solved = {}
+        for optimizer_class in optimizers:
+            cold_weights, cold_times, cold_stats = benchmark_optimizer(
+                lambda: optimizer_class(warm_start=False), covariances)
+            warm_weights, warm_times, warm_stats = benchmark_optimizer(optimizer_class, covariances)
+            solved[optimizer_class.name] = warm_weights
+
+            # 첫 리밸런싱은 두 방식 모두 처음부터 풀이하므로 제외
+            cold, warm = cold_times[1:].mean(), warm_times[1:].mean()
+            print(f"{optimizer_class.name:<10} {cold * 1000:>8.2f}ms {warm * 1000:>8.2f}ms {cold / warm:>5.1f}x "
+                  f"{np.abs(cold_weights.values - warm_weights.values).max():>14.1e} "
+                  f"{cold_stats['iterations']:>6}/{warm_stats['iterations']:<7} "
+                  f"{warm_stats['refactorizations']:>6} {(warm_weights.values > 1e-12).sum(axis=1).mean():>8.0f}")
+
+    # 해 검증: 마지막 리밸런싱의 위험 기여도, 변동성, 분산도
+    last = list(covariances)[-1]
+    cov = covariances[last]
+    print(f"\n{'='*60}")
+    print(f"=== 마지막 리밸런싱 ({last.date()}) 비중 비교 ===")
+    print(f"{'='*60}")
+    contributions = risk_contributions(solved[RiskParityOptimizer.name].loc[last].values, cov)
+    print(f"리스크 패리티 위험 기여도 범위: {contributions.min():.6f} ~ {contributions.max():.6f} "
+          f"(목표 {1 / n_assets:.6f})")
+    inverse_vol = 1 / np.sqrt(np.diag(cov))
+    inverse_vol /= inverse_vol.sum()
+    for name, weights in solved.items():
+        w = weights.loc[last].values
+        ratio = (w @ np.sqrt(np.diag(cov))) / np.sqrt(w @ cov @ w)
+        print(f"{name:<10} 연환산 변동성 {np.sqrt(w @ cov @ w * 252):.2%}, 분산도 {ratio:.2f}")
+    ratio = (inverse_vol @ np.sqrt(np.diag(cov))) / np.sqrt(inverse_vol @ cov @ inverse_vol)
+    print(f"{'역변동성':<10} 연환산 변동성 {np.sqrt(inverse_vol @ cov @ inverse_vol * 252):.2%}, 분산도 {ratio:.2f}")
+
+    # 2. 01과 같은 4개 종목: Cerebro 백테스트
+    tickers = ['AAPL', 'MSFT', 'GOOGL', 'AMZN']
+    all_data = rebalancing.download_prices(tickers, '2019-01-01', '2024-01-01')
+    if len(all_data) != len(tickers):
+        print("데이터 다운로드 실패")
+        return
+
+    print(f"\n{'='*60}")
+    print(f"=== 분기별 리밸런싱 백테스트 ({', '.join(tickers)}) ===")
+    print(f"{'='*60}")
+    print(f"{'전략':<10} {'총 수익률':>10} {'변동성':>8} {'MDD':>8}")
+    strategies = {
+        '역변동성': portfolio.InverseVolatilityStrategy,
+        RiskParityOptimizer.name: RiskParityStrategy,
+        MinimumVarianceOptimizer.name: MinimumVarianceStrategy,
+        MaximumDiversificationOptimizer.name: MaximumDiversificationStrategy,
+    }
+    for name, strategy_class in strategies.items():
+        total_return, volatility, mdd = equity_summary(rebalancing.run_cerebro(all_data, strategy_class)['equity'])
+        print(f"{name:<10} {total_return:>10.2%} {volatility:>8.2%} {mdd:>8.2%}")
+
+    print("\n분석 완료!")
+
+
+if __name__ == '__main__':
+    main()
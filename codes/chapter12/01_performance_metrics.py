@@ -10,6 +10,7 @@ Performance Metrics and Risk Measurement
 """
 
 import os
+from functools import cached_property
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -23,7 +24,11 @@ plt.rcParams['axes.unicode_minus'] = False
 
 
 class PerformanceMetrics:
-    """성과 지표 계산 클래스"""
+    """성과 지표 계산 클래스
+
+    누적 수익률, 낙폭, 초과 수익률 같은 중간 시계열은 처음 필요할 때 한 번만
+    계산하고 객체가 살아있는 동안 재사용합니다 (returns는 생성 후 바뀌지 않는다고 가정).
+    """
 
     def __init__(self, returns, equity_curve, trades=None, rf_rate=0.02):
         """
@@ -44,16 +49,36 @@ class PerformanceMetrics:
         self.rf_rate = rf_rate
         self.daily_rf_rate = (1 + rf_rate) ** (1/252) - 1
 
+    @cached_property
+    def _cumulative(self):
+        """누적 수익률 곡선 (캐시)"""
+        return (1 + self.returns).cumprod()
+
+    @cached_property
+    def _drawdown(self):
+        """낙폭 시계열 (캐시)"""
+        running_max = self._cumulative.cummax()
+        return (self._cumulative - running_max) / running_max
+
+    @cached_property
+    def _excess_returns(self):
+        """무위험 수익률 대비 초과 수익률 (캐시)"""
+        return self.returns - self.daily_rf_rate
+
+    @cached_property
+    def _annualized_return(self):
+        """연환산 수익률 (캐시)"""
+        total_days = len(self.returns)
+        years = total_days / 252
+        return (1 + self.total_return()) ** (1/years) - 1
+
     def total_return(self):
         """총 수익률"""
         return (self.equity_curve.iloc[-1] / self.equity_curve.iloc[0]) - 1
 
     def annualized_return(self):
         """연환산 수익률"""
-        total_days = len(self.returns)
-        total_ret = self.total_return()
-        years = total_days / 252
-        return (1 + total_ret) ** (1/years) - 1
+        return self._annualized_return
 
     def cagr(self):
         """복합 연평균 성장률"""
@@ -68,19 +93,12 @@ class PerformanceMetrics:
 
     def maximum_drawdown(self):
         """최대 낙폭"""
-        cumulative = (1 + self.returns).cumprod()
-        running_max = cumulative.cummax()
-        drawdown = (cumulative - running_max) / running_max
-        return drawdown.min()
+        return self._drawdown.min()
 
     def drawdown_duration(self):
         """최대 낙폭 지속 기간 (일)"""
-        cumulative = (1 + self.returns).cumprod()
-        running_max = cumulative.cummax()
-        drawdown = (cumulative - running_max) / running_max
-
         # 낙폭 구간 찾기
-        is_drawdown = drawdown < 0
+        is_drawdown = self._drawdown < 0
         drawdown_periods = []
         start = None
 
@@ -98,14 +116,14 @@ class PerformanceMetrics:
 
     def sharpe_ratio(self):
         """샤프 비율"""
-        excess_returns = self.returns - self.daily_rf_rate
+        excess_returns = self._excess_returns
         if excess_returns.std() == 0:
             return 0
         return np.sqrt(252) * excess_returns.mean() / excess_returns.std()
 
     def sortino_ratio(self, mar=0):
         """소르티노 비율"""
-        excess_returns = self.returns - self.daily_rf_rate
+        excess_returns = self._excess_returns
         downside_returns = excess_returns[excess_returns < mar]
 
         if len(downside_returns) == 0 or downside_returns.std() == 0:
@@ -162,24 +180,47 @@ class PerformanceMetrics:
 
         return (win_rate * avg_win) - ((1 - win_rate) * avg_loss)
 
-    def get_all_metrics(self):
-        """모든 지표를 딕셔너리로 반환"""
-        return {
-            '총 수익률': f"{self.total_return():.2%}",
-            '연환산 수익률': f"{self.annualized_return():.2%}",
-            'CAGR': f"{self.cagr():.2%}",
-            '변동성 (연율)': f"{self.volatility():.2%}",
-            '최대 낙폭': f"{self.maximum_drawdown():.2%}",
-            '낙폭 지속 기간': f"{self.drawdown_duration()} 일",
-            'Sharpe Ratio': f"{self.sharpe_ratio():.2f}",
-            'Sortino Ratio': f"{self.sortino_ratio():.2f}",
-            'Calmar Ratio': f"{self.calmar_ratio():.2f}",
-            '승률': f"{self.win_rate():.2%}",
-            'Profit Factor': f"{self.profit_factor():.2f}",
-            '기댓값': f"{self.expectancy():.4f}",
+    def get_all_metrics(self, numeric=False):
+        """모든 지표를 딕셔너리로 반환
+
+        numeric=True이면 문자열 대신 숫자 값을 그대로 반환합니다.
+        """
+        values = {
+            '총 수익률': self.total_return(),
+            '연환산 수익률': self.annualized_return(),
+            'CAGR': self.cagr(),
+            '변동성 (연율)': self.volatility(),
+            '최대 낙폭': self.maximum_drawdown(),
+            '낙폭 지속 기간': self.drawdown_duration(),
+            'Sharpe Ratio': self.sharpe_ratio(),
+            'Sortino Ratio': self.sortino_ratio(),
+            'Calmar Ratio': self.calmar_ratio(),
+            '승률': self.win_rate(),
+            'Profit Factor': self.profit_factor(),
+            '기댓값': self.expectancy(),
             '총 거래 횟수': len(self.trades)
         }
 
+        if numeric:
+            return values
+
+        formats = {
+            '총 수익률': '{:.2%}',
+            '연환산 수익률': '{:.2%}',
+            'CAGR': '{:.2%}',
+            '변동성 (연율)': '{:.2%}',
+            '최대 낙폭': '{:.2%}',
+            '낙폭 지속 기간': '{} 일',
+            'Sharpe Ratio': '{:.2f}',
+            'Sortino Ratio': '{:.2f}',
+            'Calmar Ratio': '{:.2f}',
+            '승률': '{:.2%}',
+            'Profit Factor': '{:.2f}',
+            '기댓값': '{:.4f}',
+        }
+        return {key: formats[key].format(value) if key in formats else value
+                for key, value in values.items()}
+
 
 class SMAStrategy(bt.Strategy):
     """이동평균 크로스오버 전략 (성과 측정용)"""
@@ -284,10 +325,16 @@ def run_backtest_with_metrics(symbol='NVDA', start_date='2020-01-01', end_date='
     return metrics, equity_curve, data
 
 
-def plot_performance_dashboard(metrics, equity_curve, price_data, symbol):
-    """성과 대시보드 시각화"""
+def plot_performance_dashboard(metrics, equity_curve, price_data, symbol, rolling_metrics=None):
+    """성과 대시보드 시각화
 
-    fig, axes = plt.subplots(3, 2, figsize=(15, 12))
+    rolling_metrics : dict (선택)
+        {윈도우: DataFrame} 형태의 롤링 지표 (04_rolling_performance_metrics.py).
+        주어지면 롤링 Sharpe와 롤링 최대 낙폭 패널을 한 줄 추가합니다.
+    """
+
+    num_rows = 4 if rolling_metrics else 3
+    fig, axes = plt.subplots(num_rows, 2, figsize=(15, 4 * num_rows))
     fig.suptitle(f'{symbol} Strategy Performance Dashboard', fontsize=16, fontweight='bold')
 
     # 1. Equity Curve
@@ -312,7 +359,7 @@ def plot_performance_dashboard(metrics, equity_curve, price_data, symbol):
 
     # 3. Monthly Returns
     ax3 = axes[1, 0]
-    monthly_returns = returns.resample('M').apply(lambda x: (1 + x).prod() - 1)
+    monthly_returns = returns.resample('ME').apply(lambda x: (1 + x).prod() - 1)
     monthly_returns.plot(kind='bar', ax=ax3, color=['g' if x > 0 else 'r' for x in monthly_returns])
     ax3.set_title('Monthly Returns')
     ax3.set_ylabel('Return (%)')
@@ -379,6 +426,22 @@ def plot_performance_dashboard(metrics, equity_curve, price_data, symbol):
 
     ax6.set_title('Performance Metrics', fontweight='bold', pad=20)
 
+    # 7-8. Rolling Sharpe / Rolling Max Drawdown (선택)
+    if rolling_metrics:
+        ax7 = axes[3, 0]
+        ax8 = axes[3, 1]
+        for window, window_df in rolling_metrics.items():
+            window_df['Sharpe Ratio'].iloc[:, 0].plot(ax=ax7, label=f'{window}D', linewidth=1.5)
+            window_df['최대 낙폭'].iloc[:, 0].plot(ax=ax8, label=f'{window}D', linewidth=1.5)
+        ax7.axhline(y=0, color='black', linestyle='-', linewidth=0.5)
+        ax7.set_title('Rolling Sharpe Ratio')
+        ax7.legend()
+        ax7.grid(True, alpha=0.3)
+        ax8.set_title('Rolling Maximum Drawdown')
+        ax8.set_ylabel('Drawdown (%)')
+        ax8.legend()
+        ax8.grid(True, alpha=0.3)
+
     plt.tight_layout()
 
     # 이미지 저장
@@ -416,12 +479,15 @@ def main():
     for key, value in metrics_dict.items():
         print(f"{key:20s}: {value}")
 
+    # 해석에는 문자열 대신 숫자 값을 사용
+    numeric_metrics = metrics.get_all_metrics(numeric=True)
+
     # 지표 해석
     print("\n" + "=" * 60)
     print("지표 해석 (Interpretation)")
     print("=" * 60)
 
-    sharpe = metrics.sharpe_ratio()
+    sharpe = numeric_metrics['Sharpe Ratio']
     if sharpe > 2:
         sharpe_rating = "매우 좋음 (Excellent)"
     elif sharpe > 1:
@@ -433,7 +499,7 @@ def main():
 
     print(f"Sharpe Ratio {sharpe:.2f}: {sharpe_rating}")
 
-    profit_factor = metrics.profit_factor()
+    profit_factor = numeric_metrics['Profit Factor']
     if profit_factor > 2:
         pf_rating = "우수 (Excellent)"
     elif profit_factor > 1.5:
@@ -445,7 +511,7 @@ def main():
 
     print(f"Profit Factor {profit_factor:.2f}: {pf_rating}")
 
-    mdd = metrics.maximum_drawdown()
+    mdd = numeric_metrics['최대 낙폭']
     if mdd > -0.1:
         mdd_rating = "낮은 리스크 (Low Risk)"
     elif mdd > -0.2:
@@ -0,0 +1,278 @@
+"""
+Chapter 12: 성과 지표와 리스크 측정
+Batched Performance Metrics
+
+이 스크립트는 PerformanceMetrics(01_performance_metrics.py)의 모든 지표를
+여러 자산 곡선에 대해 한 번에 계산합니다.
+- 입력: (봉 × 전략) 2차원 자산 곡선 배열
+- 모든 지표를 열 방향 벡터 연산(column reduction)으로 계산
+- 낙폭 지속 기간은 Python 반복문 대신 run-length 계산으로 구함
+- 출력: 전략별 숫자 지표 DataFrame
+
+파라미터 최적화 결과 수만 개를 몇 초 안에 채점할 수 있습니다.
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+# 예제 스크립트 불러오기 도우미 (codes/chapter_loader.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chapter_loader import load_chapter_module
+
+
+METRIC_COLUMNS = [
+    '총 수익률', '연환산 수익률', 'CAGR', '변동성 (연율)', '최대 낙폭', '낙폭 지속 기간',
+    'Sharpe Ratio', 'Sortino Ratio', 'Calmar Ratio',
+    '승률', 'Profit Factor', '기댓값', '총 거래 횟수',
+]
+
+
+class BatchPerformanceMetrics:
+    """여러 자산 곡선의 성과 지표를 한 번에 계산하는 클래스"""
+
+    def __init__(self, equity_curves, trades=None, rf_rate=0.02, names=None, chunk_size=5000):
+        """
+        Parameters:
+        -----------
+        equity_curves : np.ndarray or pd.DataFrame
+            (봉 × 전략) 자산 곡선
+        trades : list of array-like
+            전략별 개별 거래 수익률 (선택, 길이가 달라도 됨)
+        rf_rate : float
+            무위험 수익률 (연율)
+        names : list
+            전략 이름 (DataFrame 입력 시 열 이름 사용)
+        chunk_size : int
+            한 번에 처리할 전략 개수 (메모리 제한용)
+        """
+        if isinstance(equity_curves, pd.DataFrame):
+            names = list(equity_curves.columns) if names is None else names
+            equity_curves = equity_curves.values
+
+        self.equity_curves = np.asarray(equity_curves, dtype=np.float64)
+        if self.equity_curves.ndim == 1:
+            self.equity_curves = self.equity_curves[:, None]
+
+        self.num_strategies = self.equity_curves.shape[1]
+        self.names = names if names is not None else list(range(self.num_strategies))
+        self.trades = self._pad_trades(trades, self.num_strategies)
+        self.rf_rate = rf_rate
+        self.daily_rf_rate = (1 + rf_rate) ** (1/252) - 1
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def _pad_trades(trades, num_strategies):
+        """길이가 다른 거래 목록을 NaN으로 채운 (전략 × 최대 거래 수) 행렬로 변환"""
+        if trades is None:
+            return np.full((num_strategies, 0), np.nan)
+        max_len = max((len(t) for t in trades), default=0)
+        padded = np.full((num_strategies, max_len), np.nan)
+        for i, t in enumerate(trades):
+            padded[i, :len(t)] = t
+        return padded
+
+    @staticmethod
+    def max_run_length(mask):
+        """열마다 True가 연속되는 최대 길이 (run-length)
+
+        각 시점에서 "마지막으로 False였던 위치"를 누적 최댓값으로 구하면
+        현재 연속 구간의 길이는 (현재 위치 - 그 위치)가 됩니다.
+        """
+        num_bars = mask.shape[0]
+        t = np.arange(num_bars)[:, None]
+        last_reset = np.where(mask, -1, t)
+        np.maximum.accumulate(last_reset, axis=0, out=last_reset)
+        run = np.where(mask, t - last_reset, 0)
+        return run.max(axis=0) if num_bars > 0 else np.zeros(mask.shape[1], dtype=int)
+
+    def _equity_metrics(self, equity):
+        """자산 곡선 청크 하나에 대한 지표 계산"""
+
+        returns = equity[1:] / equity[:-1] - 1
+        num_returns = returns.shape[0]
+
+        # 수익률 지표
+        total_return = equity[-1] / equity[0] - 1
+        years = num_returns / 252
+        with np.errstate(invalid='ignore', divide='ignore'):
+            annualized = (1 + total_return) ** (1 / years) - 1
+
+        # 변동성 (pandas std와 같은 ddof=1)
+        volatility = returns.std(axis=0, ddof=1) * np.sqrt(252)
+
+        # 낙폭 (PerformanceMetrics와 같이 수익률 누적곱 기준)
+        cumulative = np.cumprod(1 + returns, axis=0)
+        running_max = np.maximum.accumulate(cumulative, axis=0)
+        drawdown = (cumulative - running_max) / running_max
+        max_drawdown = drawdown.min(axis=0)
+        dd_duration = self.max_run_length(drawdown < 0)
+
+        # Sharpe
+        excess = returns - self.daily_rf_rate
+        excess_mean = excess.mean(axis=0)
+        excess_std = excess.std(axis=0, ddof=1)
+        sharpe = np.divide(np.sqrt(252) * excess_mean, excess_std,
+                           out=np.zeros_like(excess_mean), where=excess_std != 0)
+
+        # Sortino: 하방 수익률만의 표본 표준편차 (마스크 합으로 계산)
+        downside = excess < 0
+        n_down = downside.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            down_mean = np.where(downside, excess, 0.0).sum(axis=0) / n_down
+            down_dev = np.where(downside, excess - down_mean, 0.0)
+            down_std = np.sqrt((down_dev ** 2).sum(axis=0) / (n_down - 1))
+            sortino = np.sqrt(252) * excess_mean / down_std
+        sortino[(n_down == 0) | (down_std == 0)] = 0.0
+
+        # Calmar
+        mdd_abs = np.abs(max_drawdown)
+        calmar = np.divide(annualized, mdd_abs, out=np.zeros_like(mdd_abs), where=mdd_abs != 0)
+
+        return {
+            '총 수익률': total_return,
+            '연환산 수익률': annualized,
+            'CAGR': annualized,
+            '변동성 (연율)': volatility,
+            '최대 낙폭': max_drawdown,
+            '낙폭 지속 기간': dd_duration,
+            'Sharpe Ratio': sharpe,
+            'Sortino Ratio': sortino,
+            'Calmar Ratio': calmar,
+        }
+
+    def _trade_metrics(self):
+        """거래 통계 (NaN 패딩 행렬에 대한 행 방향 연산)"""
+
+        trades = self.trades
+        num_trades = np.sum(~np.isnan(trades), axis=1)
+        wins = np.where(trades > 0, trades, 0.0)
+        losses = np.where(trades < 0, trades, 0.0)
+        n_wins = np.sum(trades > 0, axis=1)
+        n_losses = np.sum(trades < 0, axis=1)
+
+        win_sum = wins.sum(axis=1)
+        loss_sum = np.abs(losses.sum(axis=1))
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            win_rate = np.where(num_trades > 0, n_wins / num_trades, 0.0)
+            profit_factor = np.where(loss_sum > 0, win_sum / loss_sum,
+                                     np.where(win_sum > 0, np.inf, 0.0))
+            avg_win = np.where(n_wins > 0, win_sum / n_wins, 0.0)
+            avg_loss = np.where(n_losses > 0, loss_sum / n_losses, 0.0)
+
+        expectancy = win_rate * avg_win - (1 - win_rate) * avg_loss
+        no_trades = num_trades == 0
+        profit_factor[no_trades] = 0.0
+        expectancy[no_trades] = 0.0
+
+        return {
+            '승률': win_rate,
+            'Profit Factor': profit_factor,
+            '기댓값': expectancy,
+            '총 거래 횟수': num_trades,
+        }
+
+    def get_all_metrics(self):
+        """모든 지표를 (전략 × 지표) 숫자 DataFrame으로 반환"""
+
+        chunks = []
+        for start in range(0, self.num_strategies, self.chunk_size):
+            equity = self.equity_curves[:, start:start + self.chunk_size]
+            chunks.append(pd.DataFrame(self._equity_metrics(equity)))
+
+        result = pd.concat(chunks, ignore_index=True)
+        for key, values in self._trade_metrics().items():
+            result[key] = values
+
+        result.index = pd.Index(self.names, name='strategy')
+        return result[METRIC_COLUMNS]
+
+
+def leveraged_equity_curves(prices, leverages, initial_cash=100000.0):
+    """가격 시계열에 레버리지를 달리 적용한 자산 곡선 (시연용 전략 묶음)"""
+    returns = np.diff(prices) / prices[:-1]
+    curves = np.cumprod(1 + returns[:, None] * leverages[None, :], axis=0)
+    curves = np.vstack([np.ones(len(leverages)), curves])
+    return curves * initial_cash
+
+
+def main():
+    """메인 함수"""
+
+    print("=" * 60)
+    print("Chapter 12: Batched Performance Metrics")
+    print("=" * 60)
+
+    symbol = 'NVDA'
+
+    # 데이터 다운로드
+    print(f"\n{symbol} 데이터 다운로드 중...")
+    data = yf.download(symbol, start='2020-01-01', end='2024-01-01', progress=False)
+
+    # yfinance multi-level columns handling
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+
+    if data.empty:
+        print("데이터 다운로드 실패")
+        return
+
+    # 1. 여러 전략 자산 곡선 (레버리지 0.25 ~ 2.0배)
+    prices = data['Close'].values.astype(float)
+    leverages = np.linspace(0.25, 2.0, 8)
+    curves = leveraged_equity_curves(prices, leverages)
+    names = [f'{lev:.2f}x' for lev in leverages]
+
+    batch = BatchPerformanceMetrics(curves, names=names)
+    metrics_df = batch.get_all_metrics()
+
+    print("\n" + "=" * 60)
+    print("전략별 성과 지표 (숫자)")
+    print("=" * 60)
+    print(metrics_df.drop(columns=['승률', 'Profit Factor', '기댓값', '총 거래 횟수'])
+          .to_string(float_format=lambda x: f"{x:.4f}"))
+
+    # 2. 기존 PerformanceMetrics와 결과 비교
+    reference = load_chapter_module('chapter12', '01_performance_metrics.py')
+    max_diff = 0.0
+    for i, name in enumerate(names):
+        equity = pd.Series(curves[:, i], index=data.index)
+        returns = equity.pct_change().dropna()
+        single = reference.PerformanceMetrics(returns, equity)
+        expected = [single.total_return(), single.annualized_return(), single.volatility(),
+                    single.maximum_drawdown(), single.drawdown_duration(),
+                    single.sharpe_ratio(), single.sortino_ratio(), single.calmar_ratio()]
+        actual = metrics_df.loc[name, ['총 수익률', '연환산 수익률', '변동성 (연율)', '최대 낙폭',
+                                       '낙폭 지속 기간', 'Sharpe Ratio', 'Sortino Ratio',
+                                       'Calmar Ratio']].values.astype(float)
+        max_diff = max(max_diff, np.max(np.abs(actual - np.array(expected, dtype=float))))
+    print(f"\nPerformanceMetrics 대비 최대 오차: {max_diff:.2e}")
+
+    # 3. 대규모 채점 (합성 자산 곡선 50,000개 × 756봉)
+    num_strategies, num_bars = 50000, 756
+    print(f"\n합성 자산 곡선 {num_strategies:,}개 × {num_bars}봉 채점 중...")
+    rng = np.random.default_rng(42)
+    synthetic_returns = rng.normal(0.0004, 0.015, size=(num_bars - 1, num_strategies))
+    synthetic_curves = np.vstack([np.ones(num_strategies),
+                                  np.cumprod(1 + synthetic_returns, axis=0)]) * 100000.0
+    del synthetic_returns
+
+    t0 = time.perf_counter()
+    synthetic_metrics = BatchPerformanceMetrics(synthetic_curves).get_all_metrics()
+    elapsed = time.perf_counter() - t0
+
+    print(f"  소요 시간: {elapsed:.1f}초 ({num_strategies / elapsed:,.0f} 전략/초)")
+    print("  Sharpe 상위 5개:")
+    print(synthetic_metrics.nlargest(5, 'Sharpe Ratio')[
+        ['총 수익률', '최대 낙폭', '낙폭 지속 기간', 'Sharpe Ratio']].to_string(
+        float_format=lambda x: f"{x:.4f}"))
+
+    print("\n분석 완료!")
+
+
+if __name__ == "__main__":
+    main()
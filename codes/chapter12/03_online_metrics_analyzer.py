@@ -0,0 +1,306 @@
+"""
+Chapter 12: 성과 지표와 리스크 측정
+Online Metrics Analyzer
+
+01_performance_metrics.py의 SMAStrategy는 매 봉마다 포트폴리오 가치를 리스트에
+쌓아두었다가 백테스트가 끝난 뒤 지표를 계산합니다.
+이 스크립트의 분석기는 봉이 들어올 때마다 O(1)로 지표를 갱신합니다:
+- Welford 알고리즘으로 초과 수익률의 평균/분산
+- 하방(음수) 초과 수익률의 분산 (Sortino)
+- 최고 자산, 현재/최대 낙폭, 낙폭 지속 기간
+
+전체 이력을 저장하지 않으므로(요청 시에만 저장) 매우 긴 분봉 백테스트나
+실시간 리플레이에서도 분석기 상태의 메모리가 실행 길이에 비례해 늘어나지 않습니다.
+(브로커의 주문/거래 기록처럼 분석기 밖에서 늘어나는 메모리는 별개입니다.)
+"""
+
+import os
+import sys
+import time
+import inspect
+import tracemalloc
+import numpy as np
+import pandas as pd
+import yfinance as yf
+import backtrader as bt
+
+# 예제 스크립트 불러오기 도우미 (codes/chapter_loader.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chapter_loader import load_chapter_module
+
+
+class RunningMoments:
+    """Welford 알고리즘으로 평균과 표본 분산을 누적 계산"""
+
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    @property
+    def std(self):
+        """표본 표준편차 (pandas std와 같은 ddof=1)"""
+        if self.count < 2:
+            return float('nan')
+        return (self.m2 / (self.count - 1)) ** 0.5
+
+
+class OnlineMetricsAnalyzer(bt.Analyzer):
+    """봉마다 O(1)로 성과 지표를 갱신하는 분석기
+
+    지표 정의는 PerformanceMetrics와 같습니다 (일별 수익률, 252일 연율화,
+    낙폭은 첫 수익률 이후의 누적 곡선 기준).
+    """
+
+    params = (
+        ('rf_rate', 0.02),
+        ('periods_per_year', 252),
+        ('keep_history', False),
+    )
+
+    def start(self):
+        self.daily_rf_rate = (1 + self.p.rf_rate) ** (1 / self.p.periods_per_year) - 1
+        self.excess = RunningMoments()
+        self.downside = RunningMoments()
+        self.returns = RunningMoments()
+
+        self.initial_value = None
+        self.last_value = None
+        self.peak = None
+        self.drawdown = 0.0
+        self.max_drawdown = 0.0
+        self.dd_length = 0
+        self.max_dd_length = 0
+
+        self.history = [] if self.p.keep_history else None
+
+    def next(self):
+        value = self.strategy.broker.getvalue()
+
+        if self.history is not None:
+            self.history.append((self.strategy.datetime.datetime(0), value))
+
+        if self.last_value is None:
+            self.initial_value = value
+            self.last_value = value
+            return
+
+        ret = value / self.last_value - 1
+        self.last_value = value
+
+        # 수익률 / 초과 수익률 모멘트
+        self.returns.update(ret)
+        excess = ret - self.daily_rf_rate
+        self.excess.update(excess)
+        if excess < 0:
+            self.downside.update(excess)
+
+        # 낙폭과 낙폭 지속 기간
+        if self.peak is None or value > self.peak:
+            self.peak = value
+        self.drawdown = value / self.peak - 1
+        if self.drawdown < self.max_drawdown:
+            self.max_drawdown = self.drawdown
+
+        if self.drawdown < 0:
+            self.dd_length += 1
+            if self.dd_length > self.max_dd_length:
+                self.max_dd_length = self.dd_length
+        else:
+            self.dd_length = 0
+
+    def total_return(self):
+        if self.initial_value is None:
+            return 0.0
+        return self.last_value / self.initial_value - 1
+
+    def annualized_return(self):
+        if self.returns.count == 0:
+            return 0.0
+        years = self.returns.count / self.p.periods_per_year
+        return (1 + self.total_return()) ** (1 / years) - 1
+
+    def volatility(self):
+        return self.returns.std * np.sqrt(self.p.periods_per_year)
+
+    def sharpe_ratio(self):
+        std = self.excess.std
+        if not std or np.isnan(std):
+            return 0
+        return np.sqrt(self.p.periods_per_year) * self.excess.mean / std
+
+    def sortino_ratio(self):
+        std = self.downside.std
+        if self.downside.count == 0 or std == 0:
+            return 0
+        return np.sqrt(self.p.periods_per_year) * self.excess.mean / std
+
+    def calmar_ratio(self):
+        mdd = abs(self.max_drawdown)
+        if mdd == 0:
+            return 0
+        return self.annualized_return() / mdd
+
+    def get_analysis(self):
+        return {
+            '총 수익률': self.total_return(),
+            '연환산 수익률': self.annualized_return(),
+            'CAGR': self.annualized_return(),
+            '변동성 (연율)': self.volatility(),
+            '최대 낙폭': self.max_drawdown,
+            '현재 낙폭': self.drawdown,
+            '낙폭 지속 기간': self.max_dd_length,
+            'Sharpe Ratio': self.sharpe_ratio(),
+            'Sortino Ratio': self.sortino_ratio(),
+            'Calmar Ratio': self.calmar_ratio(),
+            '관측 봉 수': self.returns.count,
+        }
+
+    def equity_curve(self):
+        """keep_history=True일 때 기록한 자산 곡선"""
+        if self.history is None:
+            raise ValueError("keep_history=True로 분석기를 추가해야 자산 곡선을 얻을 수 있습니다.")
+        dates, values = zip(*self.history) if self.history else ((), ())
+        return pd.Series(values, index=pd.DatetimeIndex(dates), name='equity')
+
+
+class SMAStrategy(bt.Strategy):
+    """이동평균 크로스오버 전략 (포트폴리오 가치를 직접 기록하지 않음)"""
+
+    params = (
+        ('fast_period', 50),
+        ('slow_period', 200),
+    )
+
+    def __init__(self):
+        self.fast_ma = bt.indicators.SMA(self.data.close, period=self.params.fast_period)
+        self.slow_ma = bt.indicators.SMA(self.data.close, period=self.params.slow_period)
+        self.crossover = bt.indicators.CrossOver(self.fast_ma, self.slow_ma)
+
+    def next(self):
+        if not self.position:
+            if self.crossover > 0:
+                self.buy()
+        else:
+            if self.crossover < 0:
+                self.close()
+
+
+def synthetic_intraday_data(num_bars, seed=42):
+    """긴 분봉 백테스트 시연용 합성 OHLCV 데이터"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, num_bars)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    index = pd.date_range('2023-01-02 09:30', periods=num_bars, freq='min')
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) * 1.0005,
+        'Low': np.minimum(open_, close) * 0.9995,
+        'Close': close,
+        'Volume': 1000,
+    }, index=index)
+
+
+def run_with_online_metrics(data, keep_history=False, exactbars=False, periods_per_year=252):
+    """온라인 지표 분석기를 붙여 백테스트 실행"""
+
+    cerebro = bt.Cerebro(exactbars=exactbars, stdstats=not exactbars)
+    cerebro.adddata(bt.feeds.PandasData(dataname=data))
+    cerebro.addstrategy(SMAStrategy)
+    cerebro.addanalyzer(OnlineMetricsAnalyzer, _name='online', keep_history=keep_history,
+                        periods_per_year=periods_per_year)
+    cerebro.broker.setcash(100000.0)
+    cerebro.broker.setcommission(commission=0.001)
+
+    strategies = cerebro.run()
+    return strategies[0].analyzers.online
+
+
+def analyzer_traced_memory(snapshot):
+    """tracemalloc 스냅샷에서 분석기 코드(RunningMoments, OnlineMetricsAnalyzer)가 할당해
+    아직 남아 있는 메모리 (바이트) - 브로커, 주문, 데이터 버퍼는 제외"""
+    filename = inspect.getsourcefile(OnlineMetricsAnalyzer)
+    ranges = []
+    for cls in (RunningMoments, OnlineMetricsAnalyzer):
+        lines, first = inspect.getsourcelines(cls)
+        ranges.append((first, first + len(lines)))
+
+    stats = snapshot.filter_traces([tracemalloc.Filter(True, filename)]).statistics('lineno')
+    return sum(stat.size for stat in stats
+               if any(lo <= stat.traceback[0].lineno < hi for lo, hi in ranges))
+
+
+def main():
+    """메인 함수"""
+
+    print("=" * 60)
+    print("Chapter 12: Online Metrics Analyzer")
+    print("=" * 60)
+
+    symbol = 'NVDA'
+
+    # 데이터 다운로드
+    print(f"\n{symbol} 데이터 다운로드 중...")
+    data = yf.download(symbol, start='2020-01-01', end='2024-01-01', progress=False)
+
+    # yfinance multi-level columns handling
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+
+    if data.empty:
+        print("데이터 다운로드 실패")
+        return
+
+    # 1. 일봉 백테스트 - 이력을 함께 저장해서 PerformanceMetrics와 비교
+    online = run_with_online_metrics(data, keep_history=True)
+    online_metrics = online.get_analysis()
+
+    equity_curve = online.equity_curve()
+    reference = load_chapter_module('chapter12', '01_performance_metrics.py')
+    batch_metrics = reference.PerformanceMetrics(
+        equity_curve.pct_change().dropna(), equity_curve).get_all_metrics(numeric=True)
+
+    print("\n" + "=" * 60)
+    print(f"{'지표':20s} {'Online':>12s} {'Batch':>12s}")
+    print("=" * 60)
+    for key in ['총 수익률', '연환산 수익률', '변동성 (연율)', '최대 낙폭', '낙폭 지속 기간',
+                'Sharpe Ratio', 'Sortino Ratio', 'Calmar Ratio']:
+        print(f"{key:20s} {online_metrics[key]:12.4f} {batch_metrics[key]:12.4f}")
+
+    # 2. 긴 분봉 백테스트 - 이력 없이 메모리 사용량 측정
+    print("\n" + "=" * 60)
+    print("긴 분봉 백테스트 메모리 비교")
+    print("=" * 60)
+    # tracemalloc은 실행 속도를 크게 늦추므로 봉 수를 작게 잡고 증가 추세만 비교
+    # 전체 최대 메모리에는 브로커의 주문/거래 기록도 포함되므로, 분석기 상태는 따로 측정
+    for num_bars in [5000, 20000]:
+        intraday = synthetic_intraday_data(num_bars)
+        for keep_history in [True, False]:
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            result = run_with_online_metrics(intraday, keep_history=keep_history, exactbars=True,
+                                             periods_per_year=252 * 390)
+            elapsed = time.perf_counter() - t0
+            _, peak = tracemalloc.get_traced_memory()
+            own = analyzer_traced_memory(tracemalloc.take_snapshot())
+            tracemalloc.stop()
+
+            label = '이력 저장' if keep_history else '이력 없음'
+            analysis = result.get_analysis()
+            print(f"{num_bars:>7,}봉 [{label}] 분석기 {own / 1e3:8.1f} KB, 전체 최대 {peak / 1e6:5.1f} MB, "
+                  f"{elapsed:5.1f}초, Sharpe {analysis['Sharpe Ratio']:.2f}, "
+                  f"MDD {analysis['최대 낙폭']:.2%}")
+
+    print("\n분석 완료!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Chapter 12: 성과 지표와 리스크 측정
+Rolling Performance Metrics
+
+이 스크립트는 63/126/252일 롤링 Sharpe, 변동성, 최대 낙폭을 여러 전략에 대해
+선형 시간으로 계산합니다. 지표 정의는 PerformanceMetrics와 같습니다.
+- 평균/표준편차: 누적합(cumulative sum) 커널
+- 최대 낙폭: 윈도우 크기 블록의 prefix/suffix 스캔 (Van Herk/Gil-Werman 방식)
+
+pandas rolling().apply로 낙폭을 구하면 윈도우마다 전체를 다시 계산하므로
+O(n × window)이지만, 여기서는 O(n)이며 모든 시계열을 한 번에 처리합니다.
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# 예제 스크립트 불러오기 도우미 (codes/chapter_loader.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chapter_loader import load_chapter_module
+
+
+class RollingPerformanceMetrics:
+    """여러 수익률 시계열의 롤링 성과 지표 계산 클래스"""
+
+    def __init__(self, returns, rf_rate=0.02, windows=(63, 126, 252)):
+        """
+        Parameters:
+        -----------
+        returns : pd.DataFrame or pd.Series
+            (봉 × 전략) 일별 수익률
+        rf_rate : float
+            무위험 수익률 (연율)
+        windows : tuple
+            롤링 윈도우 길이 (일)
+        """
+        if isinstance(returns, pd.Series):
+            returns = returns.to_frame()
+
+        self.returns = returns
+        self.values = returns.values.astype(np.float64)
+        self.rf_rate = rf_rate
+        self.daily_rf_rate = (1 + rf_rate) ** (1/252) - 1
+        self.windows = windows
+
+        # 로그 자산 곡선 (누적곱 대신 누적합으로 다루기 위해)
+        self._log_equity = np.cumsum(np.log1p(self.values), axis=0)
+
+    def _frame(self, values):
+        return pd.DataFrame(values, index=self.returns.index, columns=self.returns.columns)
+
+    @staticmethod
+    def _rolling_sum(values, window):
+        """누적합 차분으로 계산한 롤링 합 (워밍업 구간은 NaN)"""
+        csum = np.cumsum(values, axis=0)
+        out = np.full(values.shape, np.nan)
+        out[window - 1] = csum[window - 1]
+        out[window:] = csum[window:] - csum[:-window]
+        return out
+
+    def _rolling_mean_std(self, values, window):
+        """롤링 평균과 표본 표준편차 (ddof=1)
+
+        큰 값의 제곱합 차분에서 생기는 상쇄 오차를 줄이기 위해
+        전체 평균을 빼고 누적합을 계산합니다.
+        누적합 차분의 반올림 오차보다 작은 분산(수익률이 일정한 윈도우)은 0으로 둡니다.
+        """
+        center = values.mean(axis=0)
+        centered = values - center
+        s1 = self._rolling_sum(centered, window)
+        s2 = self._rolling_sum(centered ** 2, window)
+        mean = s1 / window
+        var = (s2 - s1 * mean) / (window - 1)
+        tolerance = 64 * np.finfo(np.float64).eps * np.cumsum(centered ** 2, axis=0) / (window - 1)
+        var = np.where(var > tolerance, var, 0.0)
+        return mean + center, np.sqrt(var)
+
+    def volatility(self, window):
+        """롤링 변동성 (연율)"""
+        _, std = self._rolling_mean_std(self.values, window)
+        return self._frame(std * np.sqrt(252))
+
+    def sharpe_ratio(self, window):
+        """롤링 Sharpe Ratio"""
+        mean, std = self._rolling_mean_std(self.values - self.daily_rf_rate, window)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sharpe = np.where(std > 0, np.sqrt(252) * mean / std, 0.0)
+        sharpe[np.isnan(mean)] = np.nan
+        return self._frame(sharpe)
+
+    @staticmethod
+    def _block_scans(log_equity, window):
+        """윈도우 크기 블록마다 prefix/suffix (최고값, 최저값, 최대 낙폭) 스캔
+
+        최대 낙폭(로그)은 결합 법칙을 만족합니다:
+            mdd(A + B) = max(mdd(A), mdd(B), max(A) - min(B))
+        블록 안에서 앞쪽 누적(prefix)과 뒤쪽 누적(suffix)을 미리 구해두면
+        임의의 윈도우는 "한 블록의 suffix + 다음 블록의 prefix"로 O(1)에 결합됩니다.
+        """
+        num_bars, num_series = log_equity.shape
+        num_blocks = -(-num_bars // window)
+        padded_len = num_blocks * window
+
+        # 마지막 블록을 마지막 값으로 채워 낙폭에 영향이 없도록 함
+        padded = np.empty((padded_len, num_series))
+        padded[:num_bars] = log_equity
+        padded[num_bars:] = log_equity[-1]
+        blocks = padded.reshape(num_blocks, window, num_series)
+
+        # prefix: 블록 시작부터 현재까지
+        pre_max = np.maximum.accumulate(blocks, axis=1)
+        pre_min = np.minimum.accumulate(blocks, axis=1)
+        pre_mdd = np.maximum.accumulate(pre_max - blocks, axis=1)
+
+        # suffix: 현재부터 블록 끝까지 (뒤집어서 누적)
+        rev = blocks[:, ::-1]
+        suf_max = np.maximum.accumulate(rev, axis=1)[:, ::-1]
+        suf_min = np.minimum.accumulate(rev, axis=1)[:, ::-1]
+        suf_mdd = np.maximum.accumulate((rev - np.minimum.accumulate(rev, axis=1)), axis=1)[:, ::-1]
+
+        def flat(a):
+            return a.reshape(padded_len, num_series)[:num_bars]
+
+        return (flat(pre_max), flat(pre_min), flat(pre_mdd),
+                flat(suf_max), flat(suf_min), flat(suf_mdd))
+
+    def max_drawdown(self, window):
+        """롤링 최대 낙폭 (윈도우 안의 누적 수익률 곡선 기준, 음수)"""
+
+        log_equity = self._log_equity
+        num_bars = log_equity.shape[0]
+        out = np.full(log_equity.shape, np.nan)
+        if num_bars < window:
+            return self._frame(out)
+
+        pre_max, pre_min, pre_mdd, suf_max, suf_min, suf_mdd = self._block_scans(log_equity, window)
+
+        end = np.arange(window - 1, num_bars)
+        start = end - window + 1
+        aligned = start % window == 0
+
+        # 윈도우가 블록과 정확히 일치하면 prefix 하나로 충분
+        out[end[aligned]] = pre_mdd[end[aligned]]
+
+        # 그렇지 않으면 앞 블록의 suffix와 뒤 블록의 prefix를 결합
+        s, e = start[~aligned], end[~aligned]
+        out[e] = np.maximum(np.maximum(suf_mdd[s], pre_mdd[e]), suf_max[s] - pre_min[e])
+
+        return self._frame(np.expm1(-out))
+
+    def get_window_metrics(self, window):
+        """한 윈도우의 지표를 (지표, 전략) MultiIndex 열 DataFrame으로 반환"""
+        return pd.concat({
+            'Sharpe Ratio': self.sharpe_ratio(window),
+            '변동성 (연율)': self.volatility(window),
+            '최대 낙폭': self.max_drawdown(window),
+        }, axis=1)
+
+    def get_all_metrics(self):
+        """모든 윈도우의 지표를 {윈도우: DataFrame} 딕셔너리로 반환"""
+        return {window: self.get_window_metrics(window) for window in self.windows}
+
+
+def rolling_max_drawdown_naive(returns, window):
+    """검증용: pandas rolling().apply로 계산한 롤링 최대 낙폭 (느림)"""
+    def window_mdd(x):
+        cumulative = np.cumprod(1 + x)
+        running_max = np.maximum.accumulate(cumulative)
+        return ((cumulative - running_max) / running_max).min()
+    return returns.rolling(window).apply(window_mdd, raw=True)
+
+
+def main():
+    """메인 함수"""
+
+    print("=" * 60)
+    print("Chapter 12: Rolling Performance Metrics")
+    print("=" * 60)
+
+    # 1. SMA 전략 백테스트 (01_performance_metrics.py)
+    reference = load_chapter_module('chapter12', '01_performance_metrics.py')
+    result = reference.run_backtest_with_metrics(
+        symbol='NVDA',
+        start_date='2018-01-01',
+        end_date='2024-01-01'
+    )
+    if result is None:
+        return
+    metrics, equity_curve, price_data = result
+
+    # 2. 전략과 Buy & Hold의 롤링 지표
+    returns = pd.DataFrame({
+        'Strategy': equity_curve.pct_change(),
+        'Buy & Hold': price_data['Close'].pct_change(),
+    }).dropna()
+
+    rolling = RollingPerformanceMetrics(returns)
+    all_metrics = rolling.get_all_metrics()
+
+    print("\n" + "=" * 60)
+    print("최근 롤링 지표")
+    print("=" * 60)
+    for window, window_df in all_metrics.items():
+        print(f"\n[{window}일]")
+        print(window_df.iloc[-1].unstack().to_string(float_format=lambda x: f"{x:.4f}"))
+
+    # 3. pandas rolling().apply와 비교
+    t0 = time.perf_counter()
+    naive = rolling_max_drawdown_naive(returns, 252)
+    naive_time = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    fast = rolling.max_drawdown(252)
+    fast_time = time.perf_counter() - t0
+    max_diff = np.nanmax(np.abs(naive.values - fast.values))
+    print(f"\n252일 롤링 MDD: rolling().apply {naive_time:.3f}초, "
+          f"블록 스캔 {fast_time:.4f}초, 최대 오차 {max_diff:.2e}")
+
+    # 4. 대규모 처리 (합성 수익률 2,000개 전략 × 2,520일)
+    rng = np.random.default_rng(42)
+    synthetic = pd.DataFrame(rng.normal(0.0004, 0.015, size=(2520, 2000)),
+                             index=pd.bdate_range('2014-01-01', periods=2520))
+    t0 = time.perf_counter()
+    RollingPerformanceMetrics(synthetic).get_all_metrics()
+    print(f"합성 2,000개 전략 × 2,520일 × 3개 윈도우: {time.perf_counter() - t0:.1f}초")
+
+    # 5. 대시보드에 롤링 지표 추가
+    reference.plot_performance_dashboard(metrics, equity_curve, price_data, 'NVDA',
+                                         rolling_metrics=all_metrics)
+
+    print("\n분석 완료!")
+
+
+if __name__ == "__main__":
+    main()
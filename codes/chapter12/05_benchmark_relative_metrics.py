@@ -0,0 +1,331 @@
+"""
+Chapter 12: 성과 지표와 리스크 측정
+Benchmark Relative Metrics
+
+chapter03/01의 compare_benchmark와 chapter04/01의 compare_with_benchmark는
+전략 하나의 SPY 대비 총 수익률만 비교합니다.
+이 스크립트는 여러 전략의 수익률을 하나의 벤치마크와 비교하여
+롤링 베타, 알파, 상관계수, 추적 오차(Tracking Error), 정보 비율(Information Ratio)을 계산합니다.
+- 공분산/분산: 윈도우 합(누적합 차분)으로 시계열당 O(n)에 갱신
+- 벤치마크: 실행마다 한 번만 다운로드하고, 정렬된 수익률과 윈도우 합을 모든 전략이 공유
+- 정렬: 벤치마크 날짜 기준으로 전략마다 따로 마스킹 (결측치를 0으로 채우지 않고,
+  시작일이 늦은 전략이 있어도 다른 전략의 이력을 자르지 않음)
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import yfinance as yf
+
+# 예제 스크립트 불러오기 도우미 (codes/chapter_loader.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chapter_loader import load_chapter_module
+
+plt.rcParams['font.family'] = ['Nanum Gothic', 'Malgun Gothic', 'AppleGothic', 'Arial Unicode MS', 'DejaVu Sans']
+plt.rcParams['axes.unicode_minus'] = False
+
+
+_BENCHMARK_CACHE = {}
+
+
+def load_benchmark_returns(symbol='SPY', start_date='2020-01-01', end_date='2024-01-01'):
+    """벤치마크 일별 수익률 (같은 심볼/기간은 실행 중 한 번만 다운로드)"""
+
+    key = (symbol, str(start_date), str(end_date))
+    if key not in _BENCHMARK_CACHE:
+        data = yf.download(symbol, start=start_date, end=end_date, progress=False)
+
+        # yfinance multi-level columns handling
+        if isinstance(data.columns, pd.MultiIndex):
+            data.columns = data.columns.get_level_values(0)
+
+        if data.empty:
+            return None
+        _BENCHMARK_CACHE[key] = data['Close'].pct_change().dropna().rename(symbol)
+
+    return _BENCHMARK_CACHE[key]
+
+
+def _rolling_sum(values, window):
+    """누적합 차분으로 계산한 롤링 합 (워밍업 구간은 NaN)"""
+    csum = np.cumsum(values, axis=0)
+    out = np.full(values.shape, np.nan)
+    out[window - 1] = csum[window - 1]
+    out[window:] = csum[window:] - csum[:-window]
+    return out
+
+
+class BenchmarkRelativeMetrics:
+    """여러 전략 수익률의 벤치마크 대비 (롤링) 지표 계산 클래스"""
+
+    def __init__(self, returns, benchmark, rf_rate=0.02, windows=(63, 126, 252)):
+        """
+        Parameters:
+        -----------
+        returns : pd.DataFrame or pd.Series
+            (봉 × 전략) 일별 수익률
+        benchmark : pd.Series
+            벤치마크 일별 수익률 (전략의 결측 봉은 그 전략의 계산에서만 제외)
+        rf_rate : float
+            무위험 수익률 (연율)
+        windows : tuple
+            롤링 윈도우 길이 (일)
+        """
+        if isinstance(returns, pd.Series):
+            returns = returns.to_frame()
+
+        # 벤치마크 날짜로 한 번만 정렬하고, 전략의 결측 봉은 전략별 마스크로 제외
+        # (빠진 봉을 0 수익률로 채우면 베타와 상관계수가 0 쪽으로 치우침)
+        common = returns.index.intersection(benchmark.dropna().index)
+        self.returns = returns.loc[common]
+        self.benchmark = benchmark.loc[common]
+
+        self.rf_rate = rf_rate
+        self.daily_rf_rate = (1 + rf_rate) ** (1/252) - 1
+        self.windows = windows
+
+        # 큰 값의 제곱합 차분에서 생기는 상쇄 오차를 줄이기 위해 전체 평균을 빼고 누적
+        values = self.returns.values.astype(np.float64)
+        bench = self.benchmark.values.astype(np.float64)
+        self._mask = ~np.isnan(values)
+        with np.errstate(invalid='ignore'):
+            self._center = np.nan_to_num(np.nanmean(np.where(self._mask, values, np.nan), axis=0))
+        self._bench_center = bench.mean()
+        self._values = np.where(self._mask, values - self._center, 0.0)
+        self._bench = (bench - self._bench_center)[:, None]
+
+        self._bench_sums = {}
+
+    def _frame(self, values):
+        return pd.DataFrame(values, index=self.returns.index, columns=self.returns.columns)
+
+    def _benchmark_sums(self, window):
+        """벤치마크의 윈도우 합 (모든 전략이 공유하므로 윈도우마다 한 번만 계산)"""
+        if window not in self._bench_sums:
+            self._bench_sums[window] = (_rolling_sum(self._bench, window),
+                                        _rolling_sum(self._bench ** 2, window))
+        return self._bench_sums[window]
+
+    def _moments(self, window):
+        """윈도우별 평균, 분산, 공분산 (ddof=1)
+
+        전략마다 수익률이 있는 봉만 마스크로 골라 x, y, xy, x², y²의 윈도우 합을 구합니다.
+        결측 봉이 없는 전략은 벤치마크의 윈도우 합을 그대로 공유하고,
+        결측 봉이 있는 전략만 마스킹한 벤치마크 합을 따로 계산합니다.
+        한 전략의 결측은 그 전략의 윈도우에만 영향을 줍니다.
+        """
+        mask = self._mask
+        sb, sbb = self._benchmark_sums(window)
+        sb = np.repeat(sb, mask.shape[1], axis=1)
+        sbb = np.repeat(sbb, mask.shape[1], axis=1)
+        count = np.full(mask.shape, np.nan)
+        count[window - 1:] = window
+
+        partial = ~mask.all(axis=0)
+        if partial.any():
+            masked_bench = np.where(mask[:, partial], self._bench, 0.0)
+            sb[:, partial] = _rolling_sum(masked_bench, window)
+            sbb[:, partial] = _rolling_sum(masked_bench ** 2, window)
+            count[:, partial] = _rolling_sum(mask[:, partial].astype(np.float64), window)
+
+        sr = _rolling_sum(self._values, window)
+        srr = _rolling_sum(self._values ** 2, window)
+        srb = _rolling_sum(self._values * self._bench, window)
+
+        # pandas rolling(window)과 같이 윈도우 안의 봉이 모두 있어야 값을 냄
+        count[count < window] = np.nan
+
+        mean_r = sr / count
+        mean_b = sb / count
+        var_r = np.clip((srr - sr * mean_r) / (count - 1), 0, None)
+        var_b = np.clip((sbb - sb * mean_b) / (count - 1), 0, None)
+        cov = (srb - sr * mean_b) / (count - 1)
+
+        return mean_r + self._center, mean_b + self._bench_center, var_r, var_b, cov
+
+    @staticmethod
+    def _ratios(mean_r, mean_b, var_r, var_b, cov, daily_rf_rate):
+        """모멘트로부터 베타, 알파, 상관계수, 추적 오차, 정보 비율 계산"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            beta = np.where(var_b > 0, cov / var_b, np.nan)
+            correlation = np.where((var_r > 0) & (var_b > 0), cov / np.sqrt(var_r * var_b), np.nan)
+            alpha = 252 * ((mean_r - daily_rf_rate) - beta * (mean_b - daily_rf_rate))
+
+            active_mean = mean_r - mean_b
+            active_var = np.clip(var_r + var_b - 2 * cov, 0, None)
+            tracking_error = np.sqrt(active_var * 252)
+            information_ratio = np.where(tracking_error > 0,
+                                         252 * active_mean / tracking_error, 0.0)
+
+        information_ratio = np.where(np.isnan(tracking_error), np.nan, information_ratio)
+        return {
+            '베타': beta,
+            '알파 (연율)': alpha,
+            '상관계수': correlation,
+            '추적 오차': tracking_error,
+            '정보 비율': information_ratio,
+        }
+
+    def get_window_metrics(self, window):
+        """한 윈도우의 지표를 (지표, 전략) MultiIndex 열 DataFrame으로 반환"""
+        ratios = self._ratios(*self._moments(window), self.daily_rf_rate)
+        return pd.concat({key: self._frame(value) for key, value in ratios.items()}, axis=1)
+
+    def get_all_metrics(self):
+        """모든 윈도우의 지표를 {윈도우: DataFrame} 딕셔너리로 반환"""
+        return {window: self.get_window_metrics(window) for window in self.windows}
+
+    def summary(self):
+        """전체 기간의 벤치마크 대비 지표 (전략 × 지표, 전략마다 수익률이 있는 날짜만 사용)"""
+        mask = self._mask
+        n = mask.sum(axis=0)
+        values = self._values
+        bench = np.where(mask, self._bench, 0.0)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_r = values.sum(axis=0) / n
+            mean_b = bench.sum(axis=0) / n
+            dev_r = np.where(mask, values - mean_r, 0.0)
+            dev_b = np.where(mask, bench - mean_b, 0.0)
+            var_r = (dev_r ** 2).sum(axis=0) / (n - 1)
+            var_b = (dev_b ** 2).sum(axis=0) / (n - 1)
+            cov = (dev_r * dev_b).sum(axis=0) / (n - 1)
+
+        ratios = self._ratios(mean_r + self._center, mean_b + self._bench_center,
+                              var_r, var_b, cov, self.daily_rf_rate)
+        summary = pd.DataFrame(ratios, index=self.returns.columns)
+
+        returns = self.returns.values
+        bench_returns = self.benchmark.values[:, None]
+        total = np.prod(np.where(mask, 1 + returns, 1.0), axis=0) - 1
+        bench_total = np.prod(np.where(mask, 1 + bench_returns, 1.0), axis=0) - 1
+        summary.insert(0, '초과 수익률', total - bench_total)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            summary['일일 승률'] = ((returns > bench_returns) & mask).sum(axis=0) / n
+        return summary
+
+
+def rolling_beta_naive(returns, benchmark, window):
+    """검증용: pandas rolling cov/var로 계산한 롤링 베타"""
+    return returns.apply(lambda col: col.rolling(window).cov(benchmark) / benchmark.rolling(window).var())
+
+
+def plot_benchmark_relative(all_metrics, window, benchmark_symbol):
+    """롤링 베타, 상관계수, 추적 오차, 정보 비율 시각화"""
+
+    metrics = all_metrics[window]
+    fig, axes = plt.subplots(2, 2, figsize=(16, 10))
+    fig.suptitle(f'{window}-Day Rolling Metrics vs {benchmark_symbol}', fontsize=16, fontweight='bold')
+
+    panels = [('베타', 'Rolling Beta'), ('상관계수', 'Rolling Correlation'),
+              ('추적 오차', 'Tracking Error (Annualized)'), ('정보 비율', 'Information Ratio')]
+    for ax, (key, title) in zip(axes.flat, panels):
+        metrics[key].plot(ax=ax, linewidth=1.5)
+        ax.set_title(title)
+        ax.grid(True, alpha=0.3)
+        ax.axhline(y=0, color='black', linestyle='-', linewidth=0.5)
+        if key == '베타':
+            ax.axhline(y=1, color='gray', linestyle='--', linewidth=1)
+
+    plt.tight_layout()
+
+    # 이미지 저장
+    images_dir = os.path.join(os.path.dirname(__file__), 'images')
+    os.makedirs(images_dir, exist_ok=True)
+    output_path = os.path.join(images_dir, 'benchmark_relative_metrics.png')
+    plt.savefig(output_path, dpi=300, bbox_inches='tight')
+    print(f"\n차트 저장됨: {output_path}")
+
+    plt.show()
+
+
+def main():
+    """메인 함수"""
+
+    print("=" * 60)
+    print("Chapter 12: Benchmark Relative Metrics")
+    print("=" * 60)
+
+    start_date, end_date = '2018-01-01', '2024-01-01'
+
+    # 1. SMA 전략 백테스트 (01_performance_metrics.py)
+    reference = load_chapter_module('chapter12', '01_performance_metrics.py')
+    result = reference.run_backtest_with_metrics(
+        symbol='NVDA',
+        start_date=start_date,
+        end_date=end_date
+    )
+    if result is None:
+        return
+    _, equity_curve, price_data = result
+
+    # 2. 벤치마크는 한 번만 다운로드 (두 번째 호출은 캐시 사용)
+    print("\nSPY 데이터 다운로드 중...")
+    benchmark = load_benchmark_returns('SPY', start_date, end_date)
+    if benchmark is None:
+        print("데이터 다운로드 실패")
+        return
+    cached = load_benchmark_returns('SPY', start_date, end_date) is benchmark
+    print(f"벤치마크 캐시 재사용 (두 번째 호출): {cached}")
+
+    # 시작일이 다른 전략도 함께 비교 (2021년부터 보유)
+    returns = pd.DataFrame({
+        'SMA Strategy': equity_curve.pct_change(),
+        'NVDA Buy & Hold': price_data['Close'].pct_change(),
+        'NVDA Buy & Hold (2021~)': price_data['Close'].loc['2021-01-01':].pct_change(),
+    }).iloc[1:]
+
+    relative = BenchmarkRelativeMetrics(returns, benchmark)
+    all_metrics = relative.get_all_metrics()
+
+    print("\n" + "=" * 60)
+    print("전체 기간 벤치마크 대비 지표 (vs SPY)")
+    print("=" * 60)
+    print(relative.summary().T.to_string(float_format=lambda x: f"{x:.4f}"))
+
+    print("\n" + "=" * 60)
+    print("최근 롤링 지표")
+    print("=" * 60)
+    for window, window_df in all_metrics.items():
+        print(f"\n[{window}일]")
+        print(window_df.iloc[-1].unstack().to_string(float_format=lambda x: f"{x:.4f}"))
+
+    # 3. pandas rolling cov/var와 비교
+    t0 = time.perf_counter()
+    naive = rolling_beta_naive(relative.returns, relative.benchmark, 252)
+    naive_time = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    fast = relative.get_window_metrics(252)['베타']
+    fast_time = time.perf_counter() - t0
+    max_diff = np.nanmax(np.abs(naive.values - fast.values))
+    print(f"\n252일 롤링 베타: pandas rolling {naive_time:.4f}초, "
+          f"윈도우 합 {fast_time:.4f}초, 최대 오차 {max_diff:.2e}")
+
+    # 4. 대규모 처리 (합성 수익률 2,000개 전략 × 같은 벤치마크)
+    rng = np.random.default_rng(42)
+    bench_values = relative.benchmark.values
+    betas = rng.uniform(0.5, 1.5, size=2000)
+    synthetic = pd.DataFrame(bench_values[:, None] * betas
+                             + rng.normal(0.0001, 0.01, size=(len(bench_values), 2000)),
+                             index=relative.benchmark.index)
+    # 전략마다 시작일을 다르게 (앞쪽 최대 1년은 결측)
+    starts = rng.integers(0, 252, size=2000)
+    synthetic = synthetic.mask(np.arange(len(bench_values))[:, None] < starts)
+    t0 = time.perf_counter()
+    synthetic_metrics = BenchmarkRelativeMetrics(synthetic, relative.benchmark).get_all_metrics()
+    elapsed = time.perf_counter() - t0
+    estimated = synthetic_metrics[252]['베타'].mean().values
+    print(f"합성 2,000개 전략 × {len(bench_values):,}일 × 3개 윈도우: {elapsed:.1f}초, "
+          f"베타 추정 평균 오차 {np.mean(np.abs(estimated - betas)):.4f}")
+
+    # 5. 시각화
+    plot_benchmark_relative(all_metrics, 126, 'SPY')
+
+    print("\n분석 완료!")
+
+
+if __name__ == "__main__":
+    main()
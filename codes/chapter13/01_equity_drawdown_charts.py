@@ -17,6 +17,53 @@ plt.rcParams['font.family'] = ['Nanum Gothic', 'Malgun Gothic', 'AppleGothic', '
 plt.rcParams['axes.unicode_minus'] = False
 
 
+class EquityRecorder(bt.Analyzer):
+    """봉마다 자산 가치, 현금, 포지션 수량을 미리 할당한 배열에 기록하는 분석기
+
+    배열 크기는 데이터 피드 길이로 정하고, 봉마다 구조화 배열에 한 번만 저장합니다.
+    (preload되지 않은 피드처럼 길이를 모르면 두 배씩 늘려갑니다.)
+    """
+
+    RECORD_DTYPE = np.dtype([
+        ('dt', 'f8'),
+        ('value', 'f8'),
+        ('cash', 'f8'),
+        ('position', 'f8'),
+    ])
+
+    def start(self):
+        capacity = max(self.strategy.data.buflen(), 1)
+        self._buffer = np.empty(capacity, dtype=self.RECORD_DTYPE)
+        self._size = 0
+        self._broker = self.strategy.broker
+        self._data = self.strategy.data
+
+    def next(self):
+        if self._size == len(self._buffer):
+            self._buffer = np.concatenate([self._buffer, np.empty_like(self._buffer)])
+        broker = self._broker
+        self._buffer[self._size] = (self._data.datetime[0], broker.getvalue(),
+                                    broker.getcash(), self.strategy.position.size)
+        self._size += 1
+
+    def get_analysis(self):
+        return {'records': self._buffer[:self._size]}
+
+    def frame(self):
+        """날짜 인덱스 DataFrame (value, cash, position)"""
+        records = self._buffer[:self._size]
+        index = pd.DatetimeIndex([bt.num2date(x) for x in records['dt']], name='Date')
+        return pd.DataFrame({
+            'value': records['value'],
+            'cash': records['cash'],
+            'position': records['position'],
+        }, index=index)
+
+    def equity_curve(self):
+        """날짜 인덱스 자산 곡선"""
+        return self.frame()['value']
+
+
 class SMAStrategy(bt.Strategy):
     """이동평균 크로스오버 전략"""
 
@@ -67,32 +114,26 @@ def plot_equity_and_drawdown(symbol='NVDA', start_date='2020-01-01', end_date='2
     data_feed = bt.feeds.PandasData(dataname=data)
     cerebro.adddata(data_feed)
     cerebro.addstrategy(SMAStrategy)
+    cerebro.addanalyzer(EquityRecorder, _name='equity')
     cerebro.broker.setcash(100000.0)
     cerebro.broker.setcommission(commission=0.001)
 
     # 백테스트 실행
     print("백테스트 실행 중...")
     initial_value = cerebro.broker.getvalue()
-    cerebro.run()
+    strategies = cerebro.run()
     final_value = cerebro.broker.getvalue()
 
     print(f'초기 자본: ${initial_value:,.2f}')
     print(f'최종 자본: ${final_value:,.2f}')
     print(f'총 수익률: {(final_value / initial_value - 1) * 100:.2f}%')
 
-    # 자산 곡선 생성 (간단한 방법)
-    # 일별 수익률로부터 재구성
+    # Buy & Hold 자산 곡선 (일별 수익률로부터 재구성)
     returns = data['Close'].pct_change().dropna()
     buy_hold_equity = (1 + returns).cumprod() * initial_value
 
-    # 전략 자산 곡선 (근사치)
-    # 실제로는 backtrader의 observer를 사용하거나 매 스텝마다 기록해야 합니다
-    # 여기서는 시연을 위해 간단한 모델 사용
-    strategy_returns = returns * 0.8  # 전략이 시장의 80% 변동성을 가진다고 가정
-    strategy_equity = (1 + strategy_returns).cumprod() * initial_value
-
-    # 최종값 조정
-    strategy_equity = strategy_equity * (final_value / strategy_equity.iloc[-1])
+    # 전략 자산 곡선 (EquityRecorder가 매 봉 기록한 실제 값)
+    strategy_equity = strategies[0].analyzers.equity.equity_curve()
 
     # Drawdown 계산
     strategy_dd, strategy_max = calculate_drawdown(strategy_equity)
@@ -6,6 +6,7 @@ Returns Distribution and Heatmap Analysis
 """
 
 import os
+import sys
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -13,10 +14,17 @@ import seaborn as sns
 import yfinance as yf
 from scipy import stats
 
+# 예제 스크립트 불러오기 도우미 (codes/chapter_loader.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chapter_loader import load_chapter_module
+
 plt.rcParams['font.family'] = ['Nanum Gothic', 'Malgun Gothic', 'AppleGothic', 'Arial Unicode MS', 'DejaVu Sans']
 plt.rcParams['axes.unicode_minus'] = False
 
 
+calendar_buckets = load_chapter_module('chapter13', '06_calendar_return_buckets.py')
+
+
 def analyze_returns_distribution(symbol='NVDA', start_date='2020-01-01', end_date='2024-01-01'):
     """수익률 분포 분석"""
 
@@ -41,16 +49,10 @@ def analyze_returns_distribution(symbol='NVDA', start_date='2020-01-01', end_dat
     skewness = stats.skew(returns)
     kurtosis = stats.kurtosis(returns)
 
-    # 월별 수익률
-    monthly_returns = returns.resample('M').apply(lambda x: (1 + x).prod() - 1)
-
-    # 연도와 월 분리
-    monthly_returns_pivot = monthly_returns.to_frame('return')
-    monthly_returns_pivot['year'] = monthly_returns_pivot.index.year
-    monthly_returns_pivot['month'] = monthly_returns_pivot.index.month
-
-    # 피벗 테이블 생성
-    heatmap_data = monthly_returns_pivot.pivot(index='year', columns='month', values='return')
+    # 월별 수익률과 연도 × 월 히트맵 (달력 구간 경계를 한 번 구해 복리 계산)
+    buckets = calendar_buckets.CalendarBuckets(returns.index)
+    monthly_returns = buckets.compound_frame(returns, 'M')
+    heatmap_data = buckets.monthly_heatmap_frame(returns)
 
     # 시각화
     fig = plt.figure(figsize=(16, 10))
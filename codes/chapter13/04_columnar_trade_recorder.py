@@ -0,0 +1,339 @@
+"""
+Chapter 13: 백테스트 결과 분석과 시각화
+Columnar Trade Recorder
+
+이 스크립트는 모든 체결(fill)과 종료된 거래(closed trade)를
+미리 할당한 NumPy 구조화 배열(structured array)에 기록하는 분석기를 구현합니다.
+- 부분 체결과 피라미딩(분할 매수)도 누락 없이 기록
+- 거래별 진입/청산 봉, 평균 가격, 최대 수량, 수수료, 손익, MAE/MFE
+- 기록된 배열은 복사 없이 pandas, 몬테카를로, 성과 지표 코드로 전달
+"""
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+import backtrader as bt
+
+
+FILL_DTYPE = np.dtype([
+    ('bar', 'i8'),            # 체결 봉 번호 (1부터 시작, len(data))
+    ('dt', 'f8'),             # backtrader 날짜 숫자 (bt.num2date로 변환)
+    ('data_id', 'i4'),        # 데이터 피드 인덱스
+    ('order_ref', 'i8'),      # 주문 번호
+    ('size', 'f8'),           # 체결 수량 (매수 +, 매도 -)
+    ('price', 'f8'),          # 체결 가격
+    ('commission', 'f8'),     # 수수료
+    ('pnl', 'f8'),            # 이 체결로 실현된 손익 (수수료 제외 전)
+    ('position', 'f8'),       # 체결 후 포지션 수량
+])
+
+TRADE_DTYPE = np.dtype([
+    ('data_id', 'i4'),
+    ('direction', 'i1'),      # 1: 롱, -1: 숏
+    ('entry_bar', 'i8'),
+    ('exit_bar', 'i8'),
+    ('entry_dt', 'f8'),
+    ('exit_dt', 'f8'),
+    ('entry_price', 'f8'),    # 진입 체결의 가중 평균 가격
+    ('exit_price', 'f8'),     # 청산 체결의 가중 평균 가격
+    ('size', 'f8'),           # 보유 중 최대 수량 (절대값)
+    ('commission', 'f8'),
+    ('pnl', 'f8'),            # 수수료 제외 전 손익
+    ('pnl_net', 'f8'),        # 수수료 차감 후 손익
+    ('pnl_pct', 'f8'),        # 진입 금액 대비 순손익 비율
+    ('mae', 'f8'),            # Maximum Adverse Excursion (진입가 대비, 음수)
+    ('mfe', 'f8'),            # Maximum Favorable Excursion (진입가 대비, 양수)
+    ('bars_held', 'i8'),
+    ('num_fills', 'i4'),
+])
+
+
+class GrowableRecordArray:
+    """용량이 부족하면 두 배로 늘어나는 구조화 배열 버퍼"""
+
+    def __init__(self, dtype, capacity=256):
+        self._buffer = np.zeros(capacity, dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, record):
+        """레코드(튜플) 한 개 추가 - 이벤트당 배열 저장 한 번"""
+        if self._size == len(self._buffer):
+            grown = np.zeros(len(self._buffer) * 2, dtype=self._buffer.dtype)
+            grown[:self._size] = self._buffer
+            self._buffer = grown
+        self._buffer[self._size] = record
+        self._size += 1
+
+    @property
+    def array(self):
+        """기록된 구간의 뷰 (복사 없음)"""
+        return self._buffer[:self._size]
+
+    def columns(self):
+        """필드별 1차원 뷰 딕셔너리"""
+        arr = self.array
+        return {name: arr[name] for name in arr.dtype.names}
+
+    def to_frame(self):
+        """필드 뷰를 그대로 사용하는 DataFrame (복사 없음)"""
+        return pd.DataFrame(self.columns(), copy=False)
+
+
+class _OpenTrade:
+    """진행 중인 거래의 누적 상태"""
+
+    __slots__ = ('direction', 'entry_bar', 'entry_dt', 'opened_size', 'opened_value',
+                 'closed_size', 'closed_value', 'max_size', 'commission', 'pnl',
+                 'high', 'low', 'num_fills')
+
+    def __init__(self, direction, bar, dt, price):
+        self.direction = direction
+        self.entry_bar = bar
+        self.entry_dt = dt
+        self.opened_size = 0.0
+        self.opened_value = 0.0
+        self.closed_size = 0.0
+        self.closed_value = 0.0
+        self.max_size = 0.0
+        self.commission = 0.0
+        self.pnl = 0.0
+        self.high = price
+        self.low = price
+        self.num_fills = 0
+
+
+class ColumnarTradeRecorder(bt.Analyzer):
+    """체결과 종료 거래를 구조화 배열에 기록하는 분석기
+
+    TradeRecorder(chapter14)와 TradeAnalyzer(chapter13)는 진입 가격을 하나만
+    기억하므로 부분 체결과 피라미딩이 사라집니다. 이 분석기는 주문의
+    체결 조각(execution bit)을 모두 기록하고, 포지션이 0이 될 때 하나의
+    거래로 묶습니다.
+    """
+
+    params = (
+        ('capacity', 256),
+    )
+
+    def start(self):
+        self.fills = GrowableRecordArray(FILL_DTYPE, self.p.capacity)
+        self.closed_trades = GrowableRecordArray(TRADE_DTYPE, self.p.capacity)
+        self._data_ids = {id(d): i for i, d in enumerate(self.strategy.datas)}
+        self._open = {}
+
+    def notify_order(self, order):
+        if order.status not in (order.Partial, order.Completed):
+            return
+
+        data = order.data
+        data_id = self._data_ids[id(data)]
+        bar = len(data)
+
+        # 지난 알림 이후 새로 생긴 체결 조각만 처리
+        for bit in order.executed.iterpending():
+            self.fills.append((bar, bit.dt, data_id, order.ref, bit.size, bit.price,
+                               bit.comm, bit.pnl, bit.psize))
+            self._apply_fill(data_id, bar, bit)
+
+    def _apply_fill(self, data_id, bar, bit):
+        """체결 조각을 진행 중인 거래에 반영"""
+
+        state = self._open.get(data_id)
+
+        if bit.closed and state is not None:
+            closed_abs = abs(bit.closed)
+            share = closed_abs / abs(bit.size)
+            state.closed_size += closed_abs
+            state.closed_value += closed_abs * bit.price
+            state.commission += bit.comm * share
+            state.pnl += bit.pnl
+            state.num_fills += 1
+            state.high = max(state.high, bit.price)
+            state.low = min(state.low, bit.price)
+
+            if bit.psize == 0 or bit.opened:
+                self._close_trade(data_id, state, bar, bit.dt)
+                state = None
+
+        if bit.opened:
+            opened_abs = abs(bit.opened)
+            if state is None:
+                state = _OpenTrade(1 if bit.opened > 0 else -1, bar, bit.dt, bit.price)
+                self._open[data_id] = state
+            state.opened_size += opened_abs
+            state.opened_value += opened_abs * bit.price
+            state.commission += bit.comm * (opened_abs / abs(bit.size))
+            state.max_size = max(state.max_size, abs(bit.psize))
+            state.num_fills += 1
+
+    def _close_trade(self, data_id, state, bar, dt):
+        entry_price = state.opened_value / state.opened_size
+        exit_price = state.closed_value / state.closed_size
+        pnl_net = state.pnl - state.commission
+
+        if state.direction > 0:
+            mae = state.low / entry_price - 1
+            mfe = state.high / entry_price - 1
+        else:
+            mae = 1 - state.high / entry_price
+            mfe = 1 - state.low / entry_price
+
+        self.closed_trades.append((
+            data_id, state.direction, state.entry_bar, bar, state.entry_dt, dt,
+            entry_price, exit_price, state.max_size, state.commission,
+            state.pnl, pnl_net, pnl_net / state.opened_value,
+            min(mae, 0.0), max(mfe, 0.0), bar - state.entry_bar, state.num_fills,
+        ))
+        del self._open[data_id]
+
+    def next(self):
+        # 진행 중인 거래의 최고가/최저가만 갱신 (MAE/MFE 계산용)
+        for data_id, state in self._open.items():
+            data = self.strategy.datas[data_id]
+            high = data.high[0]
+            low = data.low[0]
+            if high > state.high:
+                state.high = high
+            if low < state.low:
+                state.low = low
+
+    def get_analysis(self):
+        return {
+            'fills': self.fills.array,
+            'trades': self.closed_trades.array,
+        }
+
+    def fills_frame(self):
+        """체결 기록 DataFrame (날짜 열 추가)"""
+        df = self.fills.to_frame()
+        df['date'] = [bt.num2date(x) for x in df['dt']]
+        return df
+
+    def trades_frame(self):
+        """종료 거래 DataFrame (날짜 열 추가)"""
+        df = self.closed_trades.to_frame()
+        df['entry_date'] = [bt.num2date(x) for x in df['entry_dt']]
+        df['exit_date'] = [bt.num2date(x) for x in df['exit_dt']]
+        return df
+
+
+class PyramidingSMAStrategy(bt.Strategy):
+    """분할 매수/분할 매도를 하는 이동평균 전략 (기록기 시연용)"""
+
+    params = (
+        ('fast_period', 20),
+        ('slow_period', 50),
+        ('unit_size', 10),
+        ('max_units', 3),
+    )
+
+    def __init__(self):
+        self.fast_ma = bt.indicators.SMA(self.data.close, period=self.params.fast_period)
+        self.slow_ma = bt.indicators.SMA(self.data.close, period=self.params.slow_period)
+        self.crossover = bt.indicators.CrossOver(self.fast_ma, self.slow_ma)
+        self.units = 0
+
+    def next(self):
+        if self.crossover > 0 and self.units == 0:
+            self.buy(size=self.params.unit_size)
+            self.units = 1
+        elif self.crossover < 0 and self.units > 0:
+            # 데드 크로스는 한 봉에만 발생하므로 피라미딩보다 먼저 확인
+            # 절반 먼저 청산한 뒤 나머지 청산 (부분 청산)
+            half = max(self.position.size // 2, 1)
+            self.sell(size=half)
+            self.sell(size=self.position.size - half)
+            self.units = 0
+        elif 0 < self.units < self.params.max_units and self.data.close[0] > self.data.close[-5]:
+            # 추세가 이어지면 한 단위씩 추가 (피라미딩)
+            self.buy(size=self.params.unit_size)
+            self.units += 1
+
+
+def run_backtest_with_recorder(symbol='NVDA', start_date='2020-01-01', end_date='2024-01-01'):
+    """백테스트 실행 후 구조화 배열 기록 반환"""
+
+    # 데이터 다운로드
+    print(f"\n{symbol} 데이터 다운로드 중...")
+    data = yf.download(symbol, start=start_date, end=end_date, progress=False)
+
+    # yfinance multi-level columns handling
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+
+    if data.empty:
+        print("데이터 다운로드 실패")
+        return None
+
+    # Backtrader 설정
+    cerebro = bt.Cerebro()
+    data_feed = bt.feeds.PandasData(dataname=data)
+    cerebro.adddata(data_feed)
+    cerebro.addstrategy(PyramidingSMAStrategy)
+    cerebro.addanalyzer(ColumnarTradeRecorder, _name='recorder')
+    cerebro.broker.setcash(100000.0)
+    cerebro.broker.setcommission(commission=0.001)
+
+    # 백테스트 실행
+    print("백테스트 실행 중...")
+    strategies = cerebro.run()
+    return strategies[0].analyzers.recorder
+
+
+def main():
+    """메인 함수"""
+
+    print("=" * 60)
+    print("Chapter 13: Columnar Trade Recorder")
+    print("=" * 60)
+
+    recorder = run_backtest_with_recorder(
+        symbol='NVDA',
+        start_date='2020-01-01',
+        end_date='2024-01-01'
+    )
+
+    if recorder is None:
+        return
+
+    analysis = recorder.get_analysis()
+    fills, trades = analysis['fills'], analysis['trades']
+
+    print(f"\n체결 기록: {len(fills)}건, 종료 거래: {len(trades)}건")
+
+    if len(trades) == 0:
+        print("거래가 없습니다.")
+        return
+
+    # pandas로 전달 (필드 뷰 공유, 복사 없음)
+    trades_df = recorder.trades_frame()
+    print("\n" + "=" * 60)
+    print("종료 거래")
+    print("=" * 60)
+    print(trades_df[['entry_date', 'exit_date', 'entry_price', 'exit_price', 'size',
+                     'num_fills', 'pnl_net', 'pnl_pct', 'mae', 'mfe']].to_string(index=False))
+
+    # 몬테카를로 / 성과 지표 코드에는 필드 배열을 그대로 전달
+    pnl_pct = trades['pnl_pct']
+    rng = np.random.default_rng(42)
+    resampled = rng.choice(pnl_pct, size=(1000, len(pnl_pct)), replace=True)
+    sim_returns = np.prod(1 + resampled, axis=1) - 1
+
+    print("\n" + "=" * 60)
+    print("거래 통계")
+    print("=" * 60)
+    print(f"승률: {(pnl_pct > 0).mean():.2%}")
+    print(f"평균 MAE: {trades['mae'].mean():.2%}")
+    print(f"평균 MFE: {trades['mfe'].mean():.2%}")
+    print(f"MFE 대비 실현 비율: {np.mean(pnl_pct / np.where(trades['mfe'] > 0, trades['mfe'], np.nan)):.2f}")
+    print(f"몬테카를로 (1,000회) 수익률 5~95%: "
+          f"[{np.percentile(sim_returns, 5):.2%}, {np.percentile(sim_returns, 95):.2%}]")
+
+    print("\n분석 완료!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""
+Chapter 13: 백테스트 결과 분석과 시각화
+Columnar Trade Analytics
+
+03_trade_analysis.py의 analyze_trades는 거래별 딕셔너리로 DataFrame을 만들고
+통계를 거래 하나씩 계산합니다. 이 스크립트는 열(column) 단위 거래 배열과
+가격 배열만으로 모든 통계를 벡터 연산으로 계산합니다:
+- 거래별 MAE/MFE: np.maximum.reduceat / np.minimum.reduceat 구간 축약
+- 연속 승/패(streak): run-length encoding
+- 보유 기간 히스토그램: np.bincount
+
+파라미터 스윕에서 나온 거래 백만 건도 몇 초 안에 분석할 수 있습니다.
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import matplotlib.pyplot as plt
+
+# 예제 스크립트 불러오기 도우미 (codes/chapter_loader.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chapter_loader import load_chapter_module
+
+plt.rcParams['font.family'] = ['Nanum Gothic', 'Malgun Gothic', 'AppleGothic', 'Arial Unicode MS', 'DejaVu Sans']
+plt.rcParams['axes.unicode_minus'] = False
+
+
+def segment_reduce(values, starts, ends, ufunc):
+    """임의의 [start, end) 구간들에 대해 ufunc 축약 (구간이 겹치거나 정렬되지 않아도 됨)
+
+    reduceat에 [s0, e0, s1, e1, ...] 인덱스를 주면 짝수 번째 결과가
+    각 구간 values[s:e]의 축약값이 됩니다 (홀수 번째는 버림).
+    e가 배열 끝일 수 있으므로 값 하나를 덧붙여 인덱스 범위를 맞춥니다.
+    """
+    padded = np.append(values, values[-1])
+    idx = np.empty(2 * len(starts), dtype=np.int64)
+    idx[0::2] = starts
+    idx[1::2] = ends
+    return ufunc.reduceat(padded, idx)[0::2]
+
+
+def trade_excursions(entry_bar, exit_bar, entry_price, exit_price, direction, high, low):
+    """거래별 MAE/MFE (진입가 대비 비율)
+
+    진입 봉부터 청산 봉 직전까지의 고가/저가와 진입/청산 체결가를 사용합니다
+    (청산은 다음 봉 시가에 체결되므로 청산 봉의 나머지 가격은 제외).
+
+    Parameters:
+    -----------
+    entry_bar, exit_bar : np.ndarray
+        가격 배열 기준 0부터 시작하는 봉 인덱스. high/low가 2차원이면
+        (종목 × 봉)을 펼친 인덱스를 사용합니다 (flat_bar_index 참고).
+    direction : np.ndarray
+        1: 롱, -1: 숏
+    """
+    high = np.ravel(high)
+    low = np.ravel(low)
+    starts = np.asarray(entry_bar, dtype=np.int64)
+    ends = np.maximum(np.asarray(exit_bar, dtype=np.int64), starts + 1)
+
+    seg_high = segment_reduce(high, starts, ends, np.maximum)
+    seg_low = segment_reduce(low, starts, ends, np.minimum)
+    seg_high = np.maximum(seg_high, np.maximum(entry_price, exit_price))
+    seg_low = np.minimum(seg_low, np.minimum(entry_price, exit_price))
+
+    is_long = np.asarray(direction) > 0
+    mae = np.where(is_long, seg_low / entry_price - 1, 1 - seg_high / entry_price)
+    mfe = np.where(is_long, seg_high / entry_price - 1, 1 - seg_low / entry_price)
+    return np.minimum(mae, 0.0), np.maximum(mfe, 0.0)
+
+
+def flat_bar_index(data_id, bar, num_bars):
+    """(종목, 봉) 인덱스를 (종목 × 봉) 가격 행렬을 펼친 1차원 인덱스로 변환"""
+    return np.asarray(data_id, dtype=np.int64) * num_bars + np.asarray(bar, dtype=np.int64)
+
+
+def run_lengths(is_win, group=None):
+    """연속 승/패 구간의 run-length encoding
+
+    값이 바뀌거나 그룹(예: 스윕의 파라미터 조합)이 바뀌는 지점에서 구간을 끊습니다.
+
+    Returns:
+    --------
+    (run_group, run_is_win, run_length) : 구간별 그룹, 승/패 여부, 길이
+    """
+    is_win = np.asarray(is_win, dtype=bool)
+    n = len(is_win)
+    if n == 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, np.array([], dtype=bool), empty
+
+    group = np.zeros(n, dtype=np.int64) if group is None else np.asarray(group)
+    boundary = np.empty(n, dtype=bool)
+    boundary[0] = True
+    boundary[1:] = (is_win[1:] != is_win[:-1]) | (group[1:] != group[:-1])
+
+    run_starts = np.flatnonzero(boundary)
+    run_length = np.diff(np.append(run_starts, n))
+    return group[run_starts], is_win[run_starts], run_length
+
+
+def streak_statistics(is_win, group=None):
+    """그룹별 최대 연속 승/패와 연속 구간 길이 분포"""
+
+    run_group, run_is_win, run_length = run_lengths(is_win, group)
+    groups, group_idx = np.unique(run_group, return_inverse=True)
+
+    max_wins = np.zeros(len(groups), dtype=np.int64)
+    max_losses = np.zeros(len(groups), dtype=np.int64)
+    np.maximum.at(max_wins, group_idx[run_is_win], run_length[run_is_win])
+    np.maximum.at(max_losses, group_idx[~run_is_win], run_length[~run_is_win])
+
+    return {
+        'groups': groups,
+        'max_consecutive_wins': max_wins,
+        'max_consecutive_losses': max_losses,
+        'win_streak_hist': np.bincount(run_length[run_is_win]),
+        'loss_streak_hist': np.bincount(run_length[~run_is_win]),
+    }
+
+
+def duration_histograms(entry_bar, exit_bar, is_win):
+    """보유 기간(봉) 히스토그램 - 전체/승리/패배"""
+    duration = np.asarray(exit_bar) - np.asarray(entry_bar)
+    size = int(duration.max()) + 1 if len(duration) else 1
+    return {
+        'duration': duration,
+        'all': np.bincount(duration, minlength=size),
+        'win': np.bincount(duration[is_win], minlength=size),
+        'loss': np.bincount(duration[~is_win], minlength=size),
+    }
+
+
+def analyze_trade_arrays(trades, high, low, group=None):
+    """열 단위 거래 배열에 대한 종합 통계
+
+    Parameters:
+    -----------
+    trades : dict or np.ndarray (structured)
+        'entry_bar', 'exit_bar', 'entry_price', 'exit_price', 'direction', 'pnl_pct' 필드
+        (봉 인덱스는 0부터 시작)
+    high, low : np.ndarray
+        가격 배열 (1차원, 또는 (종목 × 봉)을 펼친 배열)
+    group : np.ndarray
+        연속 승/패를 끊을 그룹 (선택)
+    """
+    pnl_pct = np.asarray(trades['pnl_pct'])
+    is_win = pnl_pct > 0
+
+    mae, mfe = trade_excursions(trades['entry_bar'], trades['exit_bar'],
+                                trades['entry_price'], trades['exit_price'],
+                                trades['direction'], high, low)
+    streaks = streak_statistics(is_win, group)
+    durations = duration_histograms(trades['entry_bar'], trades['exit_bar'], is_win)
+
+    n_trades = len(pnl_pct)
+    n_wins = int(is_win.sum())
+    win_rate = n_wins / n_trades if n_trades > 0 else 0
+    avg_win = pnl_pct[is_win].mean() if n_wins > 0 else 0
+    avg_loss = pnl_pct[~is_win].mean() if n_wins < n_trades else 0
+    duration = durations['duration']
+
+    summary = {
+        'Total Trades': n_trades,
+        'Win Rate': win_rate,
+        'Avg Win': avg_win,
+        'Avg Loss': avg_loss,
+        'Max Win': pnl_pct.max() if n_trades else 0,
+        'Max Loss': pnl_pct.min() if n_trades else 0,
+        'Avg Duration': duration.mean() if n_trades else 0,
+        'Win Duration': duration[is_win].mean() if n_wins > 0 else 0,
+        'Loss Duration': duration[~is_win].mean() if n_wins < n_trades else 0,
+        'Max Consecutive Wins': int(streaks['max_consecutive_wins'].max(initial=0)),
+        'Max Consecutive Losses': int(streaks['max_consecutive_losses'].max(initial=0)),
+        'Avg MAE': mae.mean() if n_trades else 0,
+        'Avg MFE': mfe.mean() if n_trades else 0,
+        'Expectancy': win_rate * avg_win - (1 - win_rate) * abs(avg_loss),
+    }
+
+    return {
+        'summary': summary,
+        'mae': mae,
+        'mfe': mfe,
+        'streaks': streaks,
+        'durations': durations,
+    }
+
+
+def synthetic_sweep_trades(high, low, close, num_trades, num_groups, seed=42):
+    """파라미터 스윕 규모의 합성 거래 배열 (성능 측정용)"""
+
+    rng = np.random.default_rng(seed)
+    num_bars = len(close)
+    entry_bar = rng.integers(0, num_bars - 61, size=num_trades)
+    exit_bar = entry_bar + rng.integers(1, 60, size=num_trades)
+    direction = np.where(rng.random(num_trades) < 0.8, 1, -1).astype(np.int8)
+    entry_price = close[entry_bar]
+    exit_price = close[exit_bar]
+    pnl_pct = direction * (exit_price / entry_price - 1)
+    group = np.sort(rng.integers(0, num_groups, size=num_trades))
+
+    return {
+        'entry_bar': entry_bar, 'exit_bar': exit_bar, 'direction': direction,
+        'entry_price': entry_price, 'exit_price': exit_price, 'pnl_pct': pnl_pct,
+    }, group
+
+
+def plot_trade_analytics(result, symbol):
+    """MAE/MFE, 연속 승패, 보유 기간 분포 시각화"""
+
+    fig, axes = plt.subplots(1, 3, figsize=(18, 5))
+    fig.suptitle(f'{symbol} - Columnar Trade Analytics', fontsize=16, fontweight='bold')
+
+    # 1. MAE vs MFE
+    ax1 = axes[0]
+    ax1.scatter(result['mae'] * 100, result['mfe'] * 100, alpha=0.6, s=30)
+    ax1.set_title('MAE vs MFE')
+    ax1.set_xlabel('MAE (%)')
+    ax1.set_ylabel('MFE (%)')
+    ax1.grid(True, alpha=0.3)
+
+    # 2. 연속 승/패 길이 분포
+    ax2 = axes[1]
+    win_hist = result['streaks']['win_streak_hist']
+    loss_hist = result['streaks']['loss_streak_hist']
+    ax2.bar(np.arange(len(win_hist)) - 0.2, win_hist, width=0.4, color='green', label='Win streaks')
+    ax2.bar(np.arange(len(loss_hist)) + 0.2, loss_hist, width=0.4, color='red', label='Loss streaks')
+    ax2.set_title('Streak Length Distribution')
+    ax2.set_xlabel('Streak Length')
+    ax2.set_ylabel('Count')
+    ax2.legend()
+    ax2.grid(True, alpha=0.3)
+
+    # 3. 보유 기간 히스토그램
+    ax3 = axes[2]
+    durations = result['durations']
+    bars = np.arange(len(durations['all']))
+    ax3.bar(bars, durations['win'], color='green', alpha=0.7, label='Winning')
+    ax3.bar(bars, durations['loss'], bottom=durations['win'], color='red', alpha=0.7, label='Losing')
+    ax3.set_title('Trade Duration Histogram')
+    ax3.set_xlabel('Bars Held')
+    ax3.set_ylabel('Count')
+    ax3.legend()
+    ax3.grid(True, alpha=0.3)
+
+    plt.tight_layout()
+
+    # 이미지 저장
+    images_dir = os.path.join(os.path.dirname(__file__), 'images')
+    os.makedirs(images_dir, exist_ok=True)
+    output_path = os.path.join(images_dir, 'columnar_trade_analytics.png')
+    plt.savefig(output_path, dpi=300, bbox_inches='tight')
+    print(f"\n차트 저장됨: {output_path}")
+
+    plt.show()
+
+
+def main():
+    """메인 함수"""
+
+    print("=" * 60)
+    print("Chapter 13: Columnar Trade Analytics")
+    print("=" * 60)
+
+    # 1. 구조화 배열 거래 기록기(04_columnar_trade_recorder.py)로 백테스트
+    recorder_module = load_chapter_module('chapter13', '04_columnar_trade_recorder.py')
+    recorder = recorder_module.run_backtest_with_recorder(
+        symbol='NVDA',
+        start_date='2020-01-01',
+        end_date='2024-01-01'
+    )
+    if recorder is None:
+        return
+
+    trades = recorder.get_analysis()['trades']
+    if len(trades) == 0:
+        print("거래가 없습니다.")
+        return
+
+    data = recorder.strategy.data
+    high = np.asarray(data.high.array)
+    low = np.asarray(data.low.array)
+
+    # 기록기의 봉 번호는 1부터 시작하므로 0부터 시작하는 인덱스로 변환
+    columns = {name: trades[name] for name in trades.dtype.names}
+    columns['entry_bar'] = trades['entry_bar'] - 1
+    columns['exit_bar'] = trades['exit_bar'] - 1
+
+    result = analyze_trade_arrays(columns, high, low)
+
+    print("\n" + "=" * 60)
+    print("거래 통계")
+    print("=" * 60)
+    for key, value in result['summary'].items():
+        print(f"{key:25s}: {value:.4f}" if isinstance(value, float) else f"{key:25s}: {value}")
+
+    diff = max(np.max(np.abs(result['mae'] - trades['mae'])),
+               np.max(np.abs(result['mfe'] - trades['mfe'])))
+    print(f"\n기록기가 봉마다 추적한 MAE/MFE와의 최대 오차: {diff:.2e}")
+
+    plot_trade_analytics(result, 'NVDA')
+
+    # 2. 스윕 규모 성능 측정 (거래 1,000,000건, 파라미터 조합 2,000개)
+    close = np.asarray(data.close.array)
+    sweep_trades, group = synthetic_sweep_trades(high, low, close,
+                                                 num_trades=1_000_000, num_groups=2000)
+    t0 = time.perf_counter()
+    sweep_result = analyze_trade_arrays(sweep_trades, high, low, group=group)
+    elapsed = time.perf_counter() - t0
+    streaks = sweep_result['streaks']
+    print(f"\n거래 1,000,000건 분석: {elapsed:.2f}초")
+    print(f"  조합별 최대 연속 패배 (중앙값): {np.median(streaks['max_consecutive_losses']):.0f}회")
+    print(f"  평균 MAE: {sweep_result['summary']['Avg MAE']:.2%}, "
+          f"평균 MFE: {sweep_result['summary']['Avg MFE']:.2%}")
+
+    print("\n분석 완료!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Chapter 13: 백테스트 결과 분석과 시각화
+Calendar Return Buckets
+
+월별 수익률을 returns.resample('ME').apply(lambda x: (1 + x).prod() - 1)로 계산하면
+매월 Python 함수가 한 번씩 호출됩니다.
+이 스크립트는 달력 구간(월/분기/연)의 경계를 거래일 인덱스에 대해 한 번만 구해두고,
+(봉 × 종목) 2차원 수익률을 로그 합(log-sum)과 구간 축약(np.add.reduceat)으로
+한꺼번에 복리 계산합니다. 연도 × 월 히트맵 행렬도 유니버스 전체에 대해 바로 만듭니다.
+02_returns_analysis.py의 월별 수익률과 히트맵도 CalendarBuckets로 계산합니다.
+"""
+
+import os
+import time
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import seaborn as sns
+import yfinance as yf
+
+plt.rcParams['font.family'] = ['Nanum Gothic', 'Malgun Gothic', 'AppleGothic', 'Arial Unicode MS', 'DejaVu Sans']
+plt.rcParams['axes.unicode_minus'] = False
+
+
+MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+               'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+class CalendarBuckets:
+    """거래일 인덱스에 대한 월/분기/연 구간 경계 (달력마다 한 번만 계산)"""
+
+    FREQUENCIES = ('M', 'Q', 'Y')
+
+    def __init__(self, index):
+        """
+        Parameters:
+        -----------
+        index : pd.DatetimeIndex
+            정렬된 거래일 인덱스
+        """
+        index = pd.DatetimeIndex(index)
+        if not index.is_monotonic_increasing:
+            raise ValueError("CalendarBuckets에는 정렬된 날짜 인덱스가 필요합니다.")
+
+        self.index = index
+        years = index.year.values.astype(np.int64)
+        months = index.month.values.astype(np.int64)
+
+        keys = {
+            'M': years * 12 + (months - 1),
+            'Q': years * 4 + (months - 1) // 3,
+            'Y': years,
+        }
+
+        self._starts = {}
+        self._labels = {}
+        for freq, key in keys.items():
+            change = np.empty(len(key), dtype=bool)
+            change[:1] = True
+            change[1:] = key[1:] != key[:-1]
+            starts = np.flatnonzero(change)
+            self._starts[freq] = starts
+            self._labels[freq] = pd.PeriodIndex(index[starts], freq={'M': 'M', 'Q': 'Q', 'Y': 'Y'}[freq])
+
+        # 히트맵용: 월 구간의 (연도 위치, 월 위치)
+        month_starts = self._starts['M']
+        self.years = np.unique(years)
+        self._month_year_pos = np.searchsorted(self.years, years[month_starts])
+        self._month_pos = months[month_starts] - 1
+
+    def labels(self, freq):
+        """구간 라벨 (PeriodIndex)"""
+        return self._labels[freq]
+
+    def compound(self, returns, freq='M'):
+        """(봉 × 종목) 수익률을 구간별로 복리 계산 → (구간 × 종목)
+
+        NaN(상장 전 등)은 0으로 취급하되, 구간 전체가 NaN이면 결과도 NaN입니다.
+        """
+        values = np.asarray(returns, dtype=np.float64)
+        squeeze = values.ndim == 1
+        if squeeze:
+            values = values[:, None]
+
+        starts = self._starts[freq]
+        missing = np.isnan(values)
+        log_returns = np.log1p(np.where(missing, 0.0, values))
+
+        bucket_log = np.add.reduceat(log_returns, starts, axis=0)
+        bucket_count = np.add.reduceat(~missing, starts, axis=0)
+
+        result = np.expm1(bucket_log)
+        result[bucket_count == 0] = np.nan
+        return result[:, 0] if squeeze else result
+
+    def compound_frame(self, returns, freq='M'):
+        """DataFrame/Series 입력에 대해 라벨이 붙은 결과 반환"""
+        values = self.compound(returns.values, freq)
+        if isinstance(returns, pd.Series):
+            return pd.Series(values, index=self.labels(freq), name=returns.name)
+        return pd.DataFrame(values, index=self.labels(freq), columns=returns.columns)
+
+    def monthly_heatmap(self, returns):
+        """(종목 × 연도 × 월) 히트맵 행렬을 한 번에 생성"""
+        monthly = self.compound(returns, 'M')
+        if monthly.ndim == 1:
+            monthly = monthly[:, None]
+
+        heatmap = np.full((monthly.shape[1], len(self.years), 12), np.nan)
+        heatmap[:, self._month_year_pos, self._month_pos] = monthly.T
+        return heatmap
+
+    def monthly_heatmap_frame(self, returns, column=None):
+        """한 종목의 연도 × 월 히트맵 DataFrame (02_returns_analysis.py와 같은 모양)"""
+        if isinstance(returns, pd.DataFrame):
+            returns = returns[column] if column is not None else returns.iloc[:, 0]
+        heatmap = self.monthly_heatmap(returns.values)[0]
+        frame = pd.DataFrame(heatmap, index=pd.Index(self.years, name='year'),
+                             columns=pd.Index(np.arange(1, 13), name='month'))
+        return frame.dropna(how='all', axis=1)
+
+
+def download_universe(tickers, start_date, end_date):
+    """여러 종목의 종가를 하나의 DataFrame으로 다운로드"""
+
+    closes = {}
+    for ticker in tickers:
+        data = yf.download(ticker, start=start_date, end=end_date, progress=False)
+
+        # yfinance multi-level columns handling
+        if isinstance(data.columns, pd.MultiIndex):
+            data.columns = data.columns.get_level_values(0)
+
+        if not data.empty:
+            closes[ticker] = data['Close']
+
+    return pd.DataFrame(closes).sort_index()
+
+
+def plot_universe_heatmaps(buckets, heatmaps, tickers):
+    """종목별 연도 × 월 히트맵 시각화"""
+
+    num = len(tickers)
+    cols = min(num, 3)
+    rows = -(-num // cols)
+    fig, axes = plt.subplots(rows, cols, figsize=(6 * cols, 3.5 * rows), squeeze=False)
+    fig.suptitle('Monthly Returns Heatmap (Universe)', fontsize=16, fontweight='bold')
+
+    for i, ticker in enumerate(tickers):
+        ax = axes[i // cols, i % cols]
+        frame = pd.DataFrame(heatmaps[i], index=buckets.years, columns=MONTH_NAMES)
+        sns.heatmap(frame, annot=False, cmap='RdYlGn', center=0, ax=ax,
+                    cbar_kws={'label': 'Return'}, linewidths=0.5)
+        ax.set_title(ticker)
+        ax.set_xlabel('Month')
+        ax.set_ylabel('Year')
+
+    for j in range(num, rows * cols):
+        axes[j // cols, j % cols].axis('off')
+
+    plt.tight_layout()
+
+    # 이미지 저장
+    images_dir = os.path.join(os.path.dirname(__file__), 'images')
+    os.makedirs(images_dir, exist_ok=True)
+    output_path = os.path.join(images_dir, 'calendar_return_buckets.png')
+    plt.savefig(output_path, dpi=300, bbox_inches='tight')
+    print(f"\n차트 저장됨: {output_path}")
+
+    plt.show()
+
+
+def main():
+    """메인 함수"""
+
+    print("=" * 60)
+    print("Chapter 13: Calendar Return Buckets")
+    print("=" * 60)
+
+    tickers = ['NVDA', 'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'SPY']
+    print(f"\n{', '.join(tickers)} 데이터 다운로드 중...")
+    closes = download_universe(tickers, '2015-01-01', '2024-01-01')
+
+    if closes.empty:
+        print("데이터 다운로드 실패")
+        return
+
+    returns = closes.pct_change().iloc[1:]
+    buckets = CalendarBuckets(returns.index)
+
+    # 1. 분기/연 수익률 (유니버스 전체 한 번에)
+    quarterly = buckets.compound_frame(returns, 'Q')
+    yearly = buckets.compound_frame(returns, 'Y')
+
+    print("\n" + "=" * 60)
+    print("연도별 수익률")
+    print("=" * 60)
+    print(yearly.to_string(float_format=lambda x: f"{x:.2%}"))
+
+    print("\n분기 수익률 (최근 4분기):")
+    print(quarterly.tail(4).to_string(float_format=lambda x: f"{x:.2%}"))
+
+    # 2. resample().apply(lambda)와 비교
+    t0 = time.perf_counter()
+    naive = returns.resample('ME').apply(lambda x: (1 + x).prod() - 1)
+    naive_time = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    fast = buckets.compound(returns.values, 'M')
+    fast_time = time.perf_counter() - t0
+    print(f"\n월별 복리 수익률: resample().apply {naive_time:.4f}초, "
+          f"구간 축약 {fast_time:.5f}초, 최대 오차 {np.nanmax(np.abs(naive.values - fast)):.2e}")
+
+    # 3. 대규모 유니버스 (합성 수익률 2,000종목 × 10년)
+    rng = np.random.default_rng(42)
+    synthetic_index = pd.bdate_range('2014-01-01', periods=2520)
+    synthetic = rng.normal(0.0004, 0.02, size=(2520, 2000))
+    t0 = time.perf_counter()
+    synthetic_buckets = CalendarBuckets(synthetic_index)
+    synthetic_buckets.monthly_heatmap(synthetic)
+    print(f"합성 2,000종목 × 2,520일 히트맵 행렬: {time.perf_counter() - t0:.2f}초")
+
+    # 4. 종목별 연도 × 월 히트맵
+    heatmaps = buckets.monthly_heatmap(returns.values)
+    plot_universe_heatmaps(buckets, heatmaps, list(returns.columns))
+
+    print("\n분석 완료!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""
+Chapter 14: 과최적화 방지와 검증
+Synthetic Price Path Stress Test
+
+이 스크립트는 실제 가격 시계열에 맞춰 보정한 합성 OHLC 경로를 N개 생성하고,
+SMA 크로스오버 전략을 모든 경로에 대해 한 번의 배열 연산으로 재평가합니다.
+- 경로 생성: Bootstrap, GBM, GARCH(1,1)
+- 결과: 경로별 수익률, 거래 횟수, 최대 낙폭의 분포
+
+몬테카를로 거래 재샘플링(02_monte_carlo_simulation.py)과 달리,
+전략이 "다른 가격 역사"에서 어떻게 거래했을지를 보여줍니다.
+"""
+
+import os
+import time
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import yfinance as yf
+from scipy import optimize
+
+plt.rcParams['font.family'] = ['Nanum Gothic', 'Malgun Gothic', 'AppleGothic', 'Arial Unicode MS', 'DejaVu Sans']
+plt.rcParams['axes.unicode_minus'] = False
+
+
+def calibrate_from_ohlc(data):
+    """실제 OHLC 데이터에서 경로 생성용 통계 추출"""
+
+    close = data['Close'].values.astype(float)
+    open_ = data['Open'].values.astype(float)
+    high = data['High'].values.astype(float)
+    low = data['Low'].values.astype(float)
+
+    # 종가 대비 로그 수익률과 장중 형태 (전일 종가 기준 갭, 고가/저가 꼬리)
+    log_ret = np.diff(np.log(close))
+    gap = np.log(open_[1:] / close[:-1])
+    upper_wick = np.log(high[1:] / np.maximum(open_[1:], close[1:]))
+    lower_wick = np.log(np.minimum(open_[1:], close[1:]) / low[1:])
+
+    return {
+        'start_price': close[-1],
+        'log_returns': log_ret,
+        'gaps': gap,
+        'upper_wicks': np.clip(upper_wick, 0, None),
+        'lower_wicks': np.clip(lower_wick, 0, None),
+        'mu': log_ret.mean(),
+        'sigma': log_ret.std(ddof=1),
+        'gap_ratio': min(gap.var() / log_ret.var(), 1.0) if log_ret.var() > 0 else 0.0,
+    }
+
+
+def fit_garch11(log_returns):
+    """GARCH(1,1) 파라미터 추정 (가우시안 준최대우도)"""
+
+    eps = log_returns - log_returns.mean()
+    var0 = eps.var()
+
+    def neg_loglik(params):
+        omega, alpha, beta = params
+        if omega <= 0 or alpha < 0 or beta < 0 or alpha + beta >= 0.999:
+            return 1e10
+        sigma2 = np.empty_like(eps)
+        sigma2[0] = var0
+        for t in range(1, len(eps)):
+            sigma2[t] = omega + alpha * eps[t - 1] ** 2 + beta * sigma2[t - 1]
+        return 0.5 * np.sum(np.log(sigma2) + eps ** 2 / sigma2)
+
+    x0 = [var0 * 0.05, 0.08, 0.9]
+    result = optimize.minimize(neg_loglik, x0, method='Nelder-Mead',
+                               options={'maxiter': 2000, 'xatol': 1e-10, 'fatol': 1e-8})
+    omega, alpha, beta = result.x
+    return {'omega': omega, 'alpha': alpha, 'beta': beta}
+
+
+def generate_log_returns(calib, num_paths, num_bars, method='bootstrap',
+                         garch_params=None, block_size=20, rng=None):
+    """(paths × bars) 로그 수익률과 갭 행렬 생성"""
+
+    rng = np.random.default_rng() if rng is None else rng
+    hist = calib['log_returns']
+
+    if method == 'bootstrap':
+        # 블록 부트스트랩: 변동성 군집을 보존하기 위해 연속 구간을 이어 붙임
+        num_blocks = -(-num_bars // block_size)
+        starts = rng.integers(0, len(hist) - block_size + 1, size=(num_paths, num_blocks))
+        idx = (starts[:, :, None] + np.arange(block_size)).reshape(num_paths, -1)[:, :num_bars]
+        return hist[idx], calib['gaps'][idx]
+
+    if method == 'gbm':
+        z = rng.standard_normal((num_paths, num_bars))
+        sigma = np.full((num_paths, num_bars), calib['sigma'])
+        log_ret = calib['mu'] + calib['sigma'] * z
+
+    elif method == 'garch':
+        if garch_params is None:
+            garch_params = fit_garch11(hist)
+        omega, alpha, beta = garch_params['omega'], garch_params['alpha'], garch_params['beta']
+
+        z = rng.standard_normal((num_paths, num_bars))
+        sigma = np.empty((num_paths, num_bars))
+        eps = np.empty((num_paths, num_bars))
+        sigma2 = np.full(num_paths, omega / max(1 - alpha - beta, 1e-6))
+
+        # 시간 방향으로만 반복하고 경로 방향은 벡터화
+        for t in range(num_bars):
+            sigma[:, t] = np.sqrt(sigma2)
+            eps[:, t] = sigma[:, t] * z[:, t]
+            sigma2 = omega + alpha * eps[:, t] ** 2 + beta * sigma2
+        log_ret = calib['mu'] + eps
+
+    else:
+        raise ValueError(f"지원하지 않는 경로 생성 방식: {method}")
+
+    # 갭은 당일 변동성 중 overnight 비중만큼 할당
+    gaps = np.sqrt(calib['gap_ratio']) * sigma * rng.standard_normal((num_paths, num_bars))
+    return log_ret, gaps
+
+
+def build_ohlc_paths(calib, log_returns, gaps, rng=None):
+    """로그 수익률과 갭으로부터 OHLC 경로 구성"""
+
+    rng = np.random.default_rng() if rng is None else rng
+    num_paths, num_bars = log_returns.shape
+
+    log_close = np.log(calib['start_price']) + np.cumsum(log_returns, axis=1)
+    prev_close = np.empty_like(log_close)
+    prev_close[:, 0] = np.log(calib['start_price'])
+    prev_close[:, 1:] = log_close[:, :-1]
+
+    close = np.exp(log_close)
+    open_ = np.exp(prev_close + gaps)
+
+    # 고가/저가 꼬리는 실제 데이터의 분포에서 재샘플링
+    wick_idx = rng.integers(0, len(calib['upper_wicks']), size=(num_paths, num_bars))
+    high = np.maximum(open_, close) * np.exp(calib['upper_wicks'][wick_idx])
+    low = np.minimum(open_, close) * np.exp(-calib['lower_wicks'][wick_idx])
+
+    return open_, high, low, close
+
+
+def rolling_mean_2d(values, period):
+    """누적합으로 계산한 행 방향 단순 이동평균 (워밍업 구간은 NaN, 기간이 봉 수보다 길면 전부 NaN)"""
+
+    if period < 1:
+        raise ValueError(f"period는 1 이상이어야 합니다: {period}")
+
+    sma = np.full_like(values, np.nan, dtype=np.float64)
+    if period > values.shape[1]:
+        return sma
+
+    csum = np.cumsum(values, axis=1)
+    sma[:, period - 1] = csum[:, period - 1] / period
+    sma[:, period:] = (csum[:, period:] - csum[:, :-period]) / period
+    return sma
+
+
+def batched_sma_backtest(open_, close, fast_period=50, slow_period=200, commission=0.001):
+    """SMA 크로스오버 전략을 모든 경로에 대해 한 번에 백테스트
+
+    SMAStrategy와 동일한 규칙을 따릅니다:
+    - 골든 크로스 발생 시 다음 봉 시가에 매수 (전액 투자)
+    - 데드 크로스 발생 시 다음 봉 시가에 청산
+    """
+
+    num_paths, num_bars = close.shape
+
+    fast = rolling_mean_2d(close, fast_period)
+    slow = rolling_mean_2d(close, slow_period)
+    diff = fast - slow
+
+    # CrossOver: 이전 봉에서 아래(위)에 있다가 현재 봉에서 위(아래)로 교차
+    valid = ~np.isnan(diff)
+    prev_valid = np.zeros_like(valid)
+    prev_valid[:, 1:] = valid[:, :-1] & valid[:, 1:]
+    prev_diff = np.zeros_like(diff)
+    prev_diff[:, 1:] = diff[:, :-1]
+
+    signal = np.zeros((num_paths, num_bars), dtype=np.int8)
+    signal[prev_valid & (prev_diff <= 0) & (diff > 0)] = 1
+    signal[prev_valid & (prev_diff >= 0) & (diff < 0)] = -1
+
+    # 마지막 신호를 앞으로 전파하여 목표 포지션 계산 (상태 머신을 벡터화)
+    last_idx = np.where(signal != 0, np.arange(num_bars), 0)
+    np.maximum.accumulate(last_idx, axis=1, out=last_idx)
+    target = np.take_along_axis(signal, last_idx, axis=1) > 0
+
+    # 신호 다음 봉에 체결
+    position = np.zeros_like(target)
+    position[:, 1:] = target[:, :-1]
+    prev_position = np.zeros_like(position)
+    prev_position[:, 1:] = position[:, :-1]
+
+    entries = position & ~prev_position
+    exits = ~position & prev_position
+    holds = position & prev_position
+
+    prev_close = np.empty_like(close)
+    prev_close[:, 0] = open_[:, 0]
+    prev_close[:, 1:] = close[:, :-1]
+
+    # 봉별 전략 수익률 (시가 체결 반영)
+    bar_growth = np.ones_like(close)
+    bar_growth[entries] = (close[entries] / open_[entries]) * (1 - commission)
+    bar_growth[holds] = close[holds] / prev_close[holds]
+    bar_growth[exits] = (open_[exits] / prev_close[exits]) * (1 - commission)
+
+    equity = np.cumprod(bar_growth, axis=1)
+    running_max = np.maximum.accumulate(equity, axis=1)
+    max_drawdown = ((equity - running_max) / running_max).min(axis=1)
+
+    return {
+        'total_return': equity[:, -1] - 1,
+        'num_trades': entries.sum(axis=1),
+        'max_drawdown': max_drawdown,
+        'time_in_market': position.mean(axis=1),
+    }
+
+
+def run_stress_test(calib, num_paths=10000, num_bars=1000, method='bootstrap',
+                    fast_period=50, slow_period=200, commission=0.001,
+                    chunk_size=2000, seed=42):
+    """합성 경로 스트레스 테스트 (메모리 제한을 위해 경로를 청크 단위로 처리)"""
+
+    rng = np.random.default_rng(seed)
+    garch_params = fit_garch11(calib['log_returns']) if method == 'garch' else None
+
+    results = []
+    for start in range(0, num_paths, chunk_size):
+        n = min(chunk_size, num_paths - start)
+        log_ret, gaps = generate_log_returns(calib, n, num_bars, method=method,
+                                             garch_params=garch_params, rng=rng)
+        open_, high, low, close = build_ohlc_paths(calib, log_ret, gaps, rng=rng)
+        chunk = batched_sma_backtest(open_, close, fast_period, slow_period, commission)
+        chunk['buy_hold_return'] = close[:, -1] / open_[:, 0] - 1
+        results.append(pd.DataFrame(chunk))
+
+    return pd.concat(results, ignore_index=True)
+
+
+def summarize_distribution(results):
+    """경로별 결과의 분포 요약"""
+
+    summary = results.describe(percentiles=[0.05, 0.25, 0.5, 0.75, 0.95]).T
+    summary['prob_positive'] = (results > 0).mean()
+    return summary
+
+
+def plot_stress_test_results(results_by_method, actual_return, symbol):
+    """스트레스 테스트 결과 시각화"""
+
+    fig, axes = plt.subplots(2, 2, figsize=(15, 10))
+    fig.suptitle(f'{symbol} - Synthetic Path Stress Test (SMA Crossover)', fontsize=16, fontweight='bold')
+
+    colors = {'bootstrap': 'blue', 'gbm': 'green', 'garch': 'purple'}
+
+    # 1. 수익률 분포
+    ax1 = axes[0, 0]
+    for method, results in results_by_method.items():
+        ax1.hist(results['total_return'] * 100, bins=100, density=True, alpha=0.4,
+                 color=colors.get(method), label=method.upper())
+    if actual_return is not None:
+        ax1.axvline(actual_return * 100, color='red', linestyle='--', linewidth=2,
+                    label=f'Actual: {actual_return:.2%}')
+    ax1.set_title('Total Return Distribution')
+    ax1.set_xlabel('Return (%)')
+    ax1.set_ylabel('Density')
+    ax1.legend()
+    ax1.grid(True, alpha=0.3)
+
+    # 2. 최대 낙폭 분포
+    ax2 = axes[0, 1]
+    for method, results in results_by_method.items():
+        ax2.hist(results['max_drawdown'] * 100, bins=100, density=True, alpha=0.4,
+                 color=colors.get(method), label=method.upper())
+    ax2.set_title('Maximum Drawdown Distribution')
+    ax2.set_xlabel('Max Drawdown (%)')
+    ax2.set_ylabel('Density')
+    ax2.legend()
+    ax2.grid(True, alpha=0.3)
+
+    # 3. 거래 횟수 분포
+    ax3 = axes[1, 0]
+    max_trades = max(int(r['num_trades'].max()) for r in results_by_method.values())
+    bins = np.arange(0, max_trades + 2) - 0.5
+    for method, results in results_by_method.items():
+        ax3.hist(results['num_trades'], bins=bins, density=True, alpha=0.4,
+                 color=colors.get(method), label=method.upper())
+    ax3.set_title('Trade Count Distribution')
+    ax3.set_xlabel('Number of Trades')
+    ax3.set_ylabel('Density')
+    ax3.legend()
+    ax3.grid(True, alpha=0.3)
+
+    # 4. 전략 vs Buy & Hold
+    ax4 = axes[1, 1]
+    for method, results in results_by_method.items():
+        sample = results.sample(min(2000, len(results)), random_state=0)
+        ax4.scatter(sample['buy_hold_return'] * 100, sample['total_return'] * 100,
+                    s=5, alpha=0.3, color=colors.get(method), label=method.upper())
+    lims = ax4.get_xlim()
+    ax4.plot(lims, lims, 'k--', linewidth=1)
+    ax4.set_title('Strategy vs Buy & Hold (per path)')
+    ax4.set_xlabel('Buy & Hold Return (%)')
+    ax4.set_ylabel('Strategy Return (%)')
+    ax4.legend()
+    ax4.grid(True, alpha=0.3)
+
+    plt.tight_layout()
+
+    # 이미지 저장
+    images_dir = os.path.join(os.path.dirname(__file__), 'images')
+    os.makedirs(images_dir, exist_ok=True)
+    output_path = os.path.join(images_dir, 'synthetic_path_stress_test.png')
+    plt.savefig(output_path, dpi=300, bbox_inches='tight')
+    print(f"\n차트 저장됨: {output_path}")
+
+    plt.show()
+
+
+def main():
+    """메인 함수"""
+
+    print("=" * 60)
+    print("Chapter 14: Synthetic Price Path Stress Test")
+    print("=" * 60)
+
+    symbol = 'NVDA'
+
+    # 데이터 다운로드
+    print(f"\n{symbol} 데이터 다운로드 중...")
+    data = yf.download(symbol, start='2015-01-01', end='2024-01-01', progress=False)
+
+    # yfinance multi-level columns handling
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+
+    if data.empty:
+        print("데이터 다운로드 실패")
+        return
+
+    calib = calibrate_from_ohlc(data)
+    print(f"일별 로그 수익률: 평균 {calib['mu']:.5f}, 표준편차 {calib['sigma']:.5f}")
+
+    # 실제 데이터에서의 전략 성과 (같은 벡터화 엔진)
+    actual = batched_sma_backtest(data['Open'].values[None, :].astype(float),
+                                  data['Close'].values[None, :].astype(float))
+    actual_return = float(actual['total_return'][0])
+    print(f"실제 데이터 전략 수익률: {actual_return:.2%} (거래 {int(actual['num_trades'][0])}회)")
+
+    num_paths, num_bars = 10000, 1000
+    results_by_method = {}
+
+    for method in ['bootstrap', 'gbm', 'garch']:
+        print(f"\n[{method.upper()}] {num_paths:,}개 경로 × {num_bars:,}봉 시뮬레이션 중...")
+        t0 = time.perf_counter()
+        results = run_stress_test(calib, num_paths=num_paths, num_bars=num_bars, method=method)
+        elapsed = time.perf_counter() - t0
+        results_by_method[method] = results
+
+        print(f"  소요 시간: {elapsed:.1f}초")
+        summary = summarize_distribution(results)
+        print(summary[['mean', '5%', '50%', '95%', 'prob_positive']].to_string(
+            float_format=lambda x: f"{x:.4f}"))
+
+    plot_stress_test_results(results_by_method, actual_return, symbol)
+
+    # 해석
+    print("\n" + "=" * 60)
+    print("결과 해석")
+    print("=" * 60)
+    for method, results in results_by_method.items():
+        beat_bh = (results['total_return'] > results['buy_hold_return']).mean()
+        print(f"{method.upper():10s}: 양수 수익 확률 {(results['total_return'] > 0).mean():.1%}, "
+              f"Buy & Hold 초과 확률 {beat_bh:.1%}, "
+              f"MDD 중앙값 {results['max_drawdown'].median():.2%}")
+
+    print("\n분석 완료!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""
+Chapter 14: 과최적화 방지와 검증
+Data-Snooping Correction (Reality Check Bootstrap)
+
+파라미터 최적화는 수많은 조합 중 가장 좋은 Sharpe를 고르므로,
+그 최댓값은 우연만으로도 높게 나올 수 있습니다(다중 검정 문제).
+이 스크립트는 (조합 × 일) 수익률 행렬을 받아 다음을 계산합니다:
+- White's Reality Check p-value
+- Hansen SPA (Superior Predictive Ability) p-value (lower / consistent / upper)
+- Deflated Sharpe Ratio (Bailey & López de Prado)
+
+부트스트랩 평균은 "표본 횟수 행렬 × 수익률 행렬"의 행렬곱으로 계산하고,
+조합 방향으로 청크를 나누어 10,000 조합 × 2,000 부트스트랩도 한 머신에서 처리합니다.
+"""
+
+import os
+import time
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import yfinance as yf
+from scipy import stats
+
+plt.rcParams['font.family'] = ['Nanum Gothic', 'Malgun Gothic', 'AppleGothic', 'Arial Unicode MS', 'DejaVu Sans']
+plt.rcParams['axes.unicode_minus'] = False
+
+
+def rolling_mean_1d(values, period):
+    """누적합으로 계산한 단순 이동평균 (워밍업 구간은 NaN)"""
+
+    csum = np.cumsum(values)
+    sma = np.full(len(values), np.nan)
+    sma[period - 1] = csum[period - 1] / period
+    sma[period:] = (csum[period:] - csum[:-period]) / period
+    return sma
+
+
+def sweep_return_matrix(data, fast_range, slow_range, commission=0.001):
+    """SMA 크로스오버 파라미터 스윕의 (조합 × 일) 일별 수익률 행렬
+
+    optimize_parameters가 Cerebro로 조합마다 백테스트하는 것과 같은 규칙
+    (크로스 다음 봉 시가 체결, 전액 투자)을 배열 연산으로 계산합니다.
+    """
+
+    open_ = data['Open'].values.astype(float)
+    close = data['Close'].values.astype(float)
+    num_bars = len(close)
+
+    periods = sorted(set(fast_range) | set(slow_range))
+    smas = {p: rolling_mean_1d(close, p) for p in periods}
+
+    combos = [(f, s) for f in fast_range for s in slow_range if f < s]
+    fast = np.array([smas[f] for f, _ in combos])
+    slow = np.array([smas[s] for _, s in combos])
+    diff = fast - slow
+
+    valid = ~np.isnan(diff)
+    prev_valid = np.zeros_like(valid)
+    prev_valid[:, 1:] = valid[:, :-1] & valid[:, 1:]
+    prev_diff = np.zeros_like(diff)
+    prev_diff[:, 1:] = diff[:, :-1]
+
+    signal = np.zeros(diff.shape, dtype=np.int8)
+    signal[prev_valid & (prev_diff <= 0) & (diff > 0)] = 1
+    signal[prev_valid & (prev_diff >= 0) & (diff < 0)] = -1
+
+    last_idx = np.where(signal != 0, np.arange(num_bars), 0)
+    np.maximum.accumulate(last_idx, axis=1, out=last_idx)
+    target = np.take_along_axis(signal, last_idx, axis=1) > 0
+
+    position = np.zeros_like(target)
+    position[:, 1:] = target[:, :-1]
+    prev_position = np.zeros_like(position)
+    prev_position[:, 1:] = position[:, :-1]
+
+    prev_close = np.concatenate([[open_[0]], close[:-1]])
+    entry_growth = close / open_ * (1 - commission)
+    hold_growth = close / prev_close
+    exit_growth = open_ / prev_close * (1 - commission)
+
+    growth = np.ones(diff.shape)
+    growth = np.where(position & ~prev_position, entry_growth, growth)
+    growth = np.where(position & prev_position, hold_growth, growth)
+    growth = np.where(~position & prev_position, exit_growth, growth)
+
+    # 첫 봉은 수익률이 정의되지 않으므로 제외
+    returns = growth[:, 1:] - 1
+    index = pd.MultiIndex.from_tuples(combos, names=['fast', 'slow'])
+    return returns, index
+
+
+def stationary_bootstrap_indices(num_obs, num_boot, block_len=10, rng=None):
+    """Politis-Romano stationary bootstrap 인덱스 (num_boot × num_obs)
+
+    매 시점마다 확률 1/block_len로 새 블록을 시작하고,
+    그렇지 않으면 직전 인덱스 다음 값을 이어 붙입니다 (끝에서는 처음으로 순환).
+    """
+
+    rng = np.random.default_rng() if rng is None else rng
+    starts = rng.integers(0, num_obs, size=(num_boot, num_obs))
+    new_block = rng.random((num_boot, num_obs)) < 1.0 / block_len
+    new_block[:, 0] = True
+
+    t = np.arange(num_obs)
+    block_start = np.where(new_block, t, 0)
+    np.maximum.accumulate(block_start, axis=1, out=block_start)
+    first = np.take_along_axis(starts, block_start, axis=1)
+    return (first + t - block_start) % num_obs
+
+
+def bootstrap_weight_matrix(indices):
+    """부트스트랩 인덱스를 (num_boot × num_obs) 표본 횟수 행렬로 변환
+
+    부트스트랩 평균 = 횟수 행렬 @ 수익률 / num_obs 이므로
+    (조합 × 부트스트랩) 평균을 BLAS 행렬곱 한 번으로 얻을 수 있습니다.
+    """
+
+    num_boot, num_obs = indices.shape
+    flat = (np.arange(num_boot)[:, None] * num_obs + indices).ravel()
+    counts = np.bincount(flat, minlength=num_boot * num_obs)
+    return counts.reshape(num_boot, num_obs).astype(np.float64)
+
+
+def reality_check(returns, benchmark=None, num_boot=2000, block_len=10,
+                  chunk_size=1000, seed=42):
+    """White's Reality Check와 Hansen SPA 검정
+
+    Parameters:
+    -----------
+    returns : np.ndarray
+        (조합 × 일) 전략 일별 수익률 행렬
+    benchmark : np.ndarray
+        비교 대상 일별 수익률 (기본값: 0, 즉 "수익이 없다"는 귀무가설)
+    num_boot : int
+        부트스트랩 반복 횟수
+    block_len : int
+        stationary bootstrap 평균 블록 길이
+    chunk_size : int
+        한 번에 처리할 조합 개수 (메모리 = num_boot × chunk_size × 8 bytes)
+    """
+
+    returns = np.asarray(returns, dtype=np.float64)
+    num_combos, num_obs = returns.shape
+    rng = np.random.default_rng(seed)
+
+    weights = bootstrap_weight_matrix(
+        stationary_bootstrap_indices(num_obs, num_boot, block_len, rng)) / num_obs
+    sqrt_n = np.sqrt(num_obs)
+    threshold = np.sqrt(2 * np.log(np.log(num_obs)))
+
+    rc_star = np.full(num_boot, -np.inf)
+    spa_star = {'lower': np.zeros(num_boot), 'consistent': np.zeros(num_boot),
+                'upper': np.zeros(num_boot)}
+    means = np.empty(num_combos)
+    t_stats = np.empty(num_combos)
+
+    for start in range(0, num_combos, chunk_size):
+        stop = min(start + chunk_size, num_combos)
+        d = returns[start:stop]
+        if benchmark is not None:
+            d = d - benchmark
+
+        mean = d.mean(axis=1)
+        boot_means = weights @ d.T                      # (num_boot × chunk)
+        centered = sqrt_n * (boot_means - mean)
+
+        # Hansen: 부트스트랩 분산으로 표준화
+        omega = centered.std(axis=0)
+        omega[omega == 0] = np.inf
+
+        means[start:stop] = mean
+        t_stats[start:stop] = sqrt_n * mean / omega
+
+        # Reality Check: 표준화하지 않은 최댓값
+        np.maximum(rc_star, centered.max(axis=1), out=rc_star)
+
+        # SPA: 재중심화 정도에 따라 lower / consistent / upper
+        studentized = centered / omega
+        shift_consistent = np.where(sqrt_n * mean / omega <= -threshold, sqrt_n * mean / omega, 0.0)
+        shift_lower = np.minimum(sqrt_n * mean / omega, 0.0)
+        np.maximum(spa_star['upper'], studentized.max(axis=1), out=spa_star['upper'])
+        np.maximum(spa_star['consistent'], (studentized + shift_consistent).max(axis=1),
+                   out=spa_star['consistent'])
+        np.maximum(spa_star['lower'], (studentized + shift_lower).max(axis=1),
+                   out=spa_star['lower'])
+
+    rc_stat = sqrt_n * means.max()
+    spa_stat = max(t_stats.max(), 0.0)
+
+    return {
+        'best_index': int(np.argmax(means)),
+        'best_mean': means.max(),
+        'rc_statistic': rc_stat,
+        'rc_pvalue': float(np.mean(rc_star >= rc_stat)),
+        'spa_statistic': spa_stat,
+        'spa_pvalue_lower': float(np.mean(spa_star['lower'] >= spa_stat)),
+        'spa_pvalue_consistent': float(np.mean(spa_star['consistent'] >= spa_stat)),
+        'spa_pvalue_upper': float(np.mean(spa_star['upper'] >= spa_stat)),
+        'rc_bootstrap': rc_star,
+    }
+
+
+def sharpe_ratios(returns, rf_rate=0.02):
+    """조합별 (비연율화) Sharpe Ratio 벡터"""
+
+    daily_rf_rate = (1 + rf_rate) ** (1/252) - 1
+    excess = returns - daily_rf_rate
+    std = excess.std(axis=1, ddof=1)
+    return np.divide(excess.mean(axis=1), std, out=np.zeros(len(std)), where=std > 0)
+
+
+def deflated_sharpe_ratio(returns, rf_rate=0.02, num_trials=None):
+    """Deflated Sharpe Ratio (Bailey & López de Prado, 2014)
+
+    여러 번 시도한 뒤 고른 최고 Sharpe가 "기대되는 최대 Sharpe"보다
+    유의하게 큰지를 확률로 반환합니다. 비정규성(왜도/첨도)도 보정합니다.
+    """
+
+    sr = sharpe_ratios(returns, rf_rate)
+    num_trials = len(sr) if num_trials is None else num_trials
+    num_obs = returns.shape[1]
+
+    best = int(np.argmax(sr))
+    best_sr = sr[best]
+
+    # 시도 횟수 N일 때 기대되는 최대 Sharpe (귀무가설: 진짜 Sharpe = 0)
+    euler_gamma = 0.5772156649
+    sr_std = sr.std(ddof=1) if len(sr) > 1 else 0.0
+    expected_max = sr_std * ((1 - euler_gamma) * stats.norm.ppf(1 - 1 / num_trials)
+                             + euler_gamma * stats.norm.ppf(1 - 1 / (num_trials * np.e)))
+
+    skew = stats.skew(returns[best])
+    kurt = stats.kurtosis(returns[best], fisher=False)
+    denom = np.sqrt(max(1 - skew * best_sr + (kurt - 1) / 4 * best_sr ** 2, 1e-12))
+    dsr = stats.norm.cdf((best_sr - expected_max) * np.sqrt(num_obs - 1) / denom)
+
+    return {
+        'best_index': best,
+        'best_sharpe_annual': best_sr * np.sqrt(252),
+        'expected_max_sharpe_annual': expected_max * np.sqrt(252),
+        'deflated_sharpe': dsr,
+        'num_trials': num_trials,
+    }
+
+
+def plot_reality_check(rc_result, dsr_result, sharpe_annual, symbol):
+    """Reality Check 결과 시각화"""
+
+    fig, axes = plt.subplots(1, 2, figsize=(15, 5))
+    fig.suptitle(f'{symbol} - Data-Snooping Correction', fontsize=16, fontweight='bold')
+
+    # 1. 조합별 Sharpe 분포와 기대 최댓값
+    ax1 = axes[0]
+    ax1.hist(sharpe_annual, bins=50, alpha=0.7, color='blue', edgecolor='black')
+    ax1.axvline(dsr_result['best_sharpe_annual'], color='red', linestyle='--', linewidth=2,
+                label=f"Best: {dsr_result['best_sharpe_annual']:.2f}")
+    ax1.axvline(dsr_result['expected_max_sharpe_annual'], color='orange', linestyle=':', linewidth=2,
+                label=f"Expected max (N={dsr_result['num_trials']}): "
+                      f"{dsr_result['expected_max_sharpe_annual']:.2f}")
+    ax1.set_title(f"Sharpe across combos (DSR = {dsr_result['deflated_sharpe']:.2%})")
+    ax1.set_xlabel('Annualized Sharpe Ratio')
+    ax1.set_ylabel('Frequency')
+    ax1.legend()
+    ax1.grid(True, alpha=0.3)
+
+    # 2. Reality Check 부트스트랩 분포
+    ax2 = axes[1]
+    ax2.hist(rc_result['rc_bootstrap'], bins=50, alpha=0.7, color='gray', edgecolor='black')
+    ax2.axvline(rc_result['rc_statistic'], color='red', linestyle='--', linewidth=2,
+                label=f"Observed (p = {rc_result['rc_pvalue']:.3f})")
+    ax2.set_title("White's Reality Check: bootstrap max statistic")
+    ax2.set_xlabel('sqrt(T) × max mean return')
+    ax2.set_ylabel('Frequency')
+    ax2.legend()
+    ax2.grid(True, alpha=0.3)
+
+    plt.tight_layout()
+
+    # 이미지 저장
+    images_dir = os.path.join(os.path.dirname(__file__), 'images')
+    os.makedirs(images_dir, exist_ok=True)
+    output_path = os.path.join(images_dir, 'reality_check_bootstrap.png')
+    plt.savefig(output_path, dpi=300, bbox_inches='tight')
+    print(f"\n차트 저장됨: {output_path}")
+
+    plt.show()
+
+
+def main():
+    """메인 함수"""
+
+    print("=" * 60)
+    print("Chapter 14: Data-Snooping Correction")
+    print("=" * 60)
+
+    symbol = 'NVDA'
+
+    # 데이터 다운로드
+    print(f"\n{symbol} 데이터 다운로드 중...")
+    data = yf.download(symbol, start='2016-01-01', end='2024-01-01', progress=False)
+
+    # yfinance multi-level columns handling
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+
+    if data.empty:
+        print("데이터 다운로드 실패")
+        return
+
+    # 파라미터 스윕 (walk-forward 분석보다 넓은 그리드)
+    fast_range = range(5, 100, 5)
+    slow_range = range(20, 300, 10)
+    returns, combos = sweep_return_matrix(data, fast_range, slow_range)
+    print(f"파라미터 조합: {len(combos)}개, 관측치: {returns.shape[1]}일")
+
+    # Deflated Sharpe
+    dsr_result = deflated_sharpe_ratio(returns)
+    best_fast, best_slow = combos[dsr_result['best_index']]
+    print(f"\n최고 조합: Fast={best_fast}, Slow={best_slow}")
+    print(f"최고 Sharpe (연율): {dsr_result['best_sharpe_annual']:.2f}")
+    print(f"{dsr_result['num_trials']}회 시도 시 기대 최대 Sharpe: "
+          f"{dsr_result['expected_max_sharpe_annual']:.2f}")
+    print(f"Deflated Sharpe Ratio: {dsr_result['deflated_sharpe']:.2%}")
+
+    # Reality Check / SPA (벤치마크: Buy & Hold)
+    close = data['Close'].values.astype(float)
+    buy_hold = close[1:] / close[:-1] - 1
+    t0 = time.perf_counter()
+    rc_result = reality_check(returns, benchmark=buy_hold, num_boot=2000)
+    print(f"\nReality Check / SPA (벤치마크: Buy & Hold, 부트스트랩 2,000회, "
+          f"{time.perf_counter() - t0:.1f}초)")
+    print(f"  Reality Check p-value:   {rc_result['rc_pvalue']:.3f}")
+    print(f"  SPA p-value (lower):      {rc_result['spa_pvalue_lower']:.3f}")
+    print(f"  SPA p-value (consistent): {rc_result['spa_pvalue_consistent']:.3f}")
+    print(f"  SPA p-value (upper):      {rc_result['spa_pvalue_upper']:.3f}")
+
+    plot_reality_check(rc_result, dsr_result, sharpe_ratios(returns) * np.sqrt(252), symbol)
+
+    # 대규모 그리드 처리 시간 (합성 데이터, 10,000 조합 × 2,000 부트스트랩)
+    print("\n대규모 그리드 처리 시간 측정 중 (10,000 조합 × 2,000일 × 2,000 부트스트랩)...")
+    rng = np.random.default_rng(0)
+    synthetic = rng.normal(0.0002, 0.01, size=(10000, 2000))
+    t0 = time.perf_counter()
+    synthetic_result = reality_check(synthetic, num_boot=2000, chunk_size=1000)
+    print(f"  소요 시간: {time.perf_counter() - t0:.1f}초, "
+          f"SPA p-value (consistent): {synthetic_result['spa_pvalue_consistent']:.3f}")
+
+    # 해석
+    print("\n" + "=" * 60)
+    print("결과 해석")
+    print("=" * 60)
+    if rc_result['spa_pvalue_consistent'] < 0.05:
+        print("  → SPA p < 0.05: 최고 조합의 초과 성과가 데이터 스누핑만으로 설명되지 않음")
+    else:
+        print("  → SPA p >= 0.05: 최고 조합의 성과는 다중 검정의 우연일 가능성이 높음")
+
+    if dsr_result['deflated_sharpe'] > 0.95:
+        print("  → DSR > 95%: 시도 횟수를 고려해도 Sharpe가 유의함")
+    else:
+        print("  → DSR <= 95%: 시도 횟수를 고려하면 Sharpe가 유의하지 않음")
+
+    print("\n분석 완료!")
+
+
+if __name__ == "__main__":
+    main()
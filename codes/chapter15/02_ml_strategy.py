@@ -6,6 +6,7 @@ ML-Based Trading Strategy
 """
 
 import os
+import sys
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -17,67 +18,20 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score, confusion_matrix
 import backtrader as bt
 
+# 예제 스크립트 불러오기 도우미 (codes/chapter_loader.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chapter_loader import load_chapter_module
+
 plt.rcParams['font.family'] = ['Nanum Gothic', 'Malgun Gothic', 'AppleGothic', 'Arial Unicode MS', 'DejaVu Sans']
 plt.rcParams['axes.unicode_minus'] = False
 
 
-def create_features(data):
-    """특성 생성 (Chapter 15-01과 동일)"""
-
-    df = data.copy()
-
-    # 수익률
-    df['returns'] = df['Close'].pct_change()
-
-    # 이동평균
-    df['sma_5'] = df['Close'].rolling(window=5).mean()
-    df['sma_20'] = df['Close'].rolling(window=20).mean()
-    df['sma_50'] = df['Close'].rolling(window=50).mean()
-    df['price_to_sma_20'] = df['Close'] / df['sma_20'] - 1
-
-    # EMA
-    df['ema_12'] = df['Close'].ewm(span=12, adjust=False).mean()
-    df['ema_26'] = df['Close'].ewm(span=26, adjust=False).mean()
-
-    # RSI
-    delta = df['Close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-    rs = gain / loss
-    df['rsi'] = 100 - (100 / (1 + rs))
-
-    # MACD
-    df['macd'] = df['ema_12'] - df['ema_26']
-    df['macd_signal'] = df['macd'].ewm(span=9, adjust=False).mean()
-    df['macd_diff'] = df['macd'] - df['macd_signal']
-
-    # Bollinger Bands
-    df['bb_middle'] = df['Close'].rolling(window=20).mean()
-    bb_std = df['Close'].rolling(window=20).std()
-    df['bb_upper'] = df['bb_middle'] + (bb_std * 2)
-    df['bb_lower'] = df['bb_middle'] - (bb_std * 2)
-    df['bb_position'] = (df['Close'] - df['bb_lower']) / (df['bb_upper'] - df['bb_lower'])
-
-    # 변동성
-    df['volatility'] = df['returns'].rolling(window=20).std()
+def train_ml_models(symbol='NVDA', start_date='2020-01-01', end_date='2024-01-01', n_cores=None):
+    """머신러닝 모델 학습 및 평가
 
-    # 거래량
-    df['volume_sma_5'] = df['Volume'].rolling(window=5).mean()
-    df['volume_ratio'] = df['Volume'] / df['volume_sma_5']
-
-    # 래그 특성
-    for lag in [1, 2, 3, 5]:
-        df[f'returns_lag_{lag}'] = df['returns'].shift(lag)
-
-    # 타겟
-    df['future_return'] = df['returns'].shift(-1)
-    df['target'] = (df['future_return'] > 0).astype(int)
-
-    return df
-
-
-def train_ml_models(symbol='NVDA', start_date='2020-01-01', end_date='2024-01-01'):
-    """머신러닝 모델 학습 및 평가"""
+    n_cores를 지정하면 (폴드, 모델) 작업을 04_parallel_model_training.py의
+    프로세스 풀에서 병렬로 학습합니다 (결과는 순차 실행과 같음).
+    """
 
     # 데이터 다운로드
     print(f"\n{symbol} 데이터 다운로드 중...")
@@ -91,22 +45,29 @@ def train_ml_models(symbol='NVDA', start_date='2020-01-01', end_date='2024-01-01
         print("데이터 다운로드 실패")
         return None
 
-    # 특성 생성
+    # 특성과 타겟 (특성 저장소: 같은 데이터면 저장된 컬럼을 읽기만 함)
     print("특성 생성 중...")
-    df = create_features(data)
-    df = df.dropna()
-
-    # 특성과 타겟 분리
     feature_cols = ['returns', 'price_to_sma_20', 'rsi', 'macd_diff', 'bb_position',
                     'volatility', 'volume_ratio', 'returns_lag_1', 'returns_lag_2',
                     'returns_lag_3', 'returns_lag_5']
 
-    X = df[feature_cols]
-    y = df['target']
+    feature_store = load_chapter_module('chapter15', '03_feature_store.py').FeatureStore()
+    X, y = feature_store.training_matrix(symbol, data, feature_cols)
 
-    print(f"데이터 크기: {len(df)} 행, {len(feature_cols)} 특성")
+    print(f"데이터 크기: {len(X)} 행, {len(feature_cols)} 특성")
     print(f"타겟 분포: 상승={y.sum()}, 하락={len(y)-y.sum()}, 상승 비율={y.mean():.2%}")
 
+    if n_cores is not None:
+        parallel = load_chapter_module('chapter15', '04_parallel_model_training.py')
+        # float64 행렬로 학습해야 아래 순차 루프와 결과가 같음
+        results_df = parallel.train_models_parallel({symbol: (X, y)}, n_cores=n_cores, dtype=np.float64)
+        results_df = results_df.drop(columns='symbol')
+
+        # 결과 시각화
+        plot_model_comparison(results_df, symbol)
+
+        return results_df
+
     # 시계열 분할
     tscv = TimeSeriesSplit(n_splits=5)
 
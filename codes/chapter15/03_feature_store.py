@@ -0,0 +1,503 @@
+"""
+Chapter 15: 머신러닝 기반 전략 (Part 1)
+Feature Store
+
+01_feature_engineering.py, 02_ml_strategy.py, chapter16의 prepare_ml_model에는
+거의 같은 create_features가 따로 있고, 실행할 때마다 40개가 넘는 롤링 컬럼을 처음부터 다시 계산합니다.
+이 스크립트의 특성 저장소는
+- 특성을 이름과 파라미터로 한 번만 정의하고 (예: sma_{period}, returns_lag_{lag})
+- 요청한 컬럼(feature_cols)과 그 의존 컬럼만 계산하며
+- 종목/데이터 버전(OHLCV 내용 + 특성 정의)별로 컬럼 단위 파일(.npy)에 저장하고
+- 학습 행렬을 만들 때 필요한 컬럼 파일만 읽습니다 (column projection).
+같은 데이터로 다시 학습하는 실험에서는 특성 계산을 완전히 건너뜁니다.
+"""
+
+import os
+import re
+import sys
+import time
+import shutil
+import inspect
+import hashlib
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+# 예제 스크립트 불러오기 도우미 (codes/chapter_loader.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chapter_loader import load_chapter_module
+
+
+FEATURE_SPECS = {}
+
+# 특성 계산 방식이 소스 밖에서 바뀌면(공유 헬퍼, 라이브러리 동작 등) 올려서 저장된 컬럼을 무효화
+FEATURE_VERSION = 1
+
+_DEFINITIONS_HASH = {}
+
+# chapter15/02, chapter16에서 쓰는 이름 → 정규 이름
+FEATURE_ALIASES = {
+    'volatility': 'volatility_20',
+    'volume_ratio': 'volume_ratio_5',
+}
+
+TARGET_COLUMNS = ['future_return', 'target', 'target_threshold']
+
+
+def feature(pattern):
+    """특성 계산 함수를 이름 패턴으로 등록하는 데코레이터
+
+    패턴의 {param}은 정수 파라미터로 해석됩니다. 예: 'sma_{period}' → sma_20(period=20)
+    """
+    regex = re.compile('^' + re.sub(r'\{(\w+)\}', r'(?P<\1>\\d+)', pattern) + '$')
+
+    def register(func):
+        FEATURE_SPECS[pattern] = (regex, func)
+        return func
+    return register
+
+
+def resolve_feature(name):
+    """특성 이름을 (정규 이름, 계산 함수, 파라미터)로 변환"""
+    canonical = FEATURE_ALIASES.get(name, name)
+    for regex, func in FEATURE_SPECS.values():
+        match = regex.match(canonical)
+        if match:
+            params = {key: int(value) for key, value in match.groupdict().items()}
+            return canonical, func, params
+    raise KeyError(f"정의되지 않은 특성: {name}")
+
+
+def _definition_source(func):
+    """특성 함수의 소스 (대화형 세션처럼 소스 파일이 없으면 바이트코드와 상수로 대신함)"""
+    try:
+        return inspect.getsource(func)
+    except (OSError, TypeError):
+        code = func.__code__
+        consts = [const for const in code.co_consts if not inspect.iscode(const)]
+        return f'{code.co_code.hex()}{code.co_names}{consts}'
+
+
+def feature_definitions_hash():
+    """등록된 특성 정의(패턴, 계산 함수 소스, 별칭)와 FEATURE_VERSION의 해시
+
+    특성 함수를 고치면 해시가 바뀌므로 이전 정의로 저장된 컬럼을 다시 쓰지 않습니다.
+    """
+    key = (FEATURE_VERSION, tuple((pattern, func) for pattern, (_, func) in FEATURE_SPECS.items()),
+           tuple(FEATURE_ALIASES.items()))
+    if key not in _DEFINITIONS_HASH:
+        digest = hashlib.sha1(str(FEATURE_VERSION).encode())
+        for pattern, (_, func) in sorted(FEATURE_SPECS.items()):
+            digest.update(pattern.encode())
+            digest.update(_definition_source(func).encode())
+        for alias, canonical in sorted(FEATURE_ALIASES.items()):
+            digest.update(f'{alias}={canonical}'.encode())
+        _DEFINITIONS_HASH[key] = digest.hexdigest()
+    return _DEFINITIONS_HASH[key]
+
+
+class FeatureContext:
+    """한 번의 계산에서 특성과 의존 특성을 메모이제이션하는 컨텍스트"""
+
+    def __init__(self, data, cache=None):
+        self.data = data
+        self.cache = {} if cache is None else cache
+
+    def __getitem__(self, name):
+        if name in ('Open', 'High', 'Low', 'Close', 'Volume'):
+            return self.data[name]
+
+        canonical, func, params = resolve_feature(name)
+        if canonical not in self.cache:
+            self.cache[canonical] = func(self, **params)
+        return self.cache[canonical]
+
+
+# 1. 가격 기반 특성
+@feature('returns')
+def _returns(f):
+    return f['Close'].pct_change()
+
+
+@feature('sma_{period}')
+def _sma(f, period):
+    return f['Close'].rolling(window=period).mean()
+
+
+@feature('price_to_sma_{period}')
+def _price_to_sma(f, period):
+    return f['Close'] / f[f'sma_{period}'] - 1
+
+
+@feature('ema_{period}')
+def _ema(f, period):
+    return f['Close'].ewm(span=period, adjust=False).mean()
+
+
+# 2. 모멘텀 지표
+@feature('rsi')
+def _rsi(f):
+    delta = f['Close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    rs = gain / loss
+    return 100 - (100 / (1 + rs))
+
+
+@feature('macd')
+def _macd(f):
+    return f['ema_12'] - f['ema_26']
+
+
+@feature('macd_signal')
+def _macd_signal(f):
+    return f['macd'].ewm(span=9, adjust=False).mean()
+
+
+@feature('macd_diff')
+def _macd_diff(f):
+    return f['macd'] - f['macd_signal']
+
+
+@feature('roc_{period}')
+def _roc(f, period):
+    close = f['Close']
+    return (close - close.shift(period)) / close.shift(period)
+
+
+# 3. 변동성 지표
+def _rolling_std(series, window):
+    """롤링 표본 표준편차 (값이 모두 같은 윈도우는 정확히 0)
+
+    pandas rolling().std()는 일정한 구간에서 누적 반올림 오차(1e-6 수준)가 남을 수 있으므로
+    최댓값과 최솟값이 같은 윈도우는 0으로 둡니다 (chapter16 증분 엔진과 같은 규칙).
+    """
+    rolling = series.rolling(window=window)
+    return rolling.std().mask(rolling.max() == rolling.min(), 0.0)
+
+
+@feature('bb_middle')
+def _bb_middle(f):
+    return f['Close'].rolling(window=20).mean()
+
+
+@feature('bb_std')
+def _bb_std(f):
+    return _rolling_std(f['Close'], 20)
+
+
+@feature('bb_upper')
+def _bb_upper(f):
+    return f['bb_middle'] + (f['bb_std'] * 2)
+
+
+@feature('bb_lower')
+def _bb_lower(f):
+    return f['bb_middle'] - (f['bb_std'] * 2)
+
+
+@feature('bb_width')
+def _bb_width(f):
+    return (f['bb_upper'] - f['bb_lower']) / f['bb_middle']
+
+
+@feature('bb_position')
+def _bb_position(f):
+    # 밴드 폭이 0이면(가격이 일정한 구간) 종가가 중심선에 있으므로 0.5
+    band = f['bb_upper'] - f['bb_lower']
+    return ((f['Close'] - f['bb_lower']) / band).mask(band == 0, 0.5)
+
+
+@feature('atr')
+def _atr(f):
+    high_low = f['High'] - f['Low']
+    high_close = np.abs(f['High'] - f['Close'].shift())
+    low_close = np.abs(f['Low'] - f['Close'].shift())
+    true_range = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
+    return true_range.rolling(window=14).mean()
+
+
+@feature('atr_ratio')
+def _atr_ratio(f):
+    return f['atr'] / f['Close']
+
+
+@feature('volatility_{period}')
+def _volatility(f, period):
+    return _rolling_std(f['returns'], period)
+
+
+# 4. 거래량 지표
+@feature('volume_sma_{period}')
+def _volume_sma(f, period):
+    return f['Volume'].rolling(window=period).mean()
+
+
+@feature('volume_ratio_{period}')
+def _volume_ratio(f, period):
+    return f['Volume'] / f[f'volume_sma_{period}']
+
+
+@feature('obv')
+def _obv(f):
+    return (np.sign(f['Close'].diff()) * f['Volume']).fillna(0).cumsum()
+
+
+@feature('obv_sma')
+def _obv_sma(f):
+    return f['obv'].rolling(window=20).mean()
+
+
+# 5. 래그 특성
+@feature('returns_lag_{lag}')
+def _returns_lag(f, lag):
+    return f['returns'].shift(lag)
+
+
+@feature('volume_lag_{lag}')
+def _volume_lag(f, lag):
+    return f['Volume'].shift(lag)
+
+
+# 6. 타겟 (마지막 봉처럼 다음 수익률이 없으면 NaN으로 두어 학습 행렬에서 제외)
+@feature('future_return')
+def _future_return(f):
+    return f['returns'].shift(-1)
+
+
+@feature('target')
+def _target(f):
+    future_return = f['future_return']
+    return (future_return > 0).astype(float).where(future_return.notna())
+
+
+@feature('target_threshold')
+def _target_threshold(f):
+    future_return = f['future_return']
+    return (future_return > 0.01).astype(float).where(future_return.notna())
+
+
+def default_feature_columns():
+    """01_feature_engineering.py의 create_features가 만드는 특성 컬럼 (타겟 제외)"""
+    columns = ['returns']
+    for period in [5, 10, 20, 50, 200]:
+        columns += [f'sma_{period}', f'price_to_sma_{period}']
+    columns += ['ema_12', 'ema_26', 'rsi', 'macd', 'macd_signal', 'macd_diff']
+    columns += [f'roc_{period}' for period in [5, 10, 20]]
+    columns += ['bb_middle', 'bb_upper', 'bb_lower', 'bb_width', 'bb_position', 'atr', 'atr_ratio']
+    columns += [f'volatility_{period}' for period in [5, 10, 20]]
+    for period in [5, 10, 20]:
+        columns += [f'volume_sma_{period}', f'volume_ratio_{period}']
+    columns += ['obv', 'obv_sma']
+    for lag in [1, 2, 3, 5, 10]:
+        columns += [f'returns_lag_{lag}', f'volume_lag_{lag}']
+    return columns
+
+
+class FeatureStore:
+    """종목/데이터 버전별로 특성 컬럼을 저장하고 재사용하는 저장소
+
+    저장 구조: {root}/{symbol}/{데이터 해시}_{특성 정의 해시}/{feature}.npy (컬럼마다 파일 하나)
+    특성 정의가 바뀌면 같은 데이터의 이전 정의 폴더는 새 버전을 만들 때 삭제합니다.
+    """
+
+    def __init__(self, root=None):
+        """
+        Parameters:
+        -----------
+        root : str
+            저장 위치 (기본값: codes/data/feature_store)
+        """
+        if root is None:
+            root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'feature_store')
+        self.root = os.path.normpath(root)
+        self.stats = {'computed': 0, 'loaded': 0}
+
+    @staticmethod
+    def data_version(data):
+        """'{OHLCV 데이터 해시}_{특성 정의 해시}' (데이터나 특성 정의가 바뀌면 버전도 바뀜)"""
+        digest = hashlib.sha1()
+        digest.update(np.asarray(data.index.asi8).tobytes())
+        for column in ['Open', 'High', 'Low', 'Close', 'Volume']:
+            digest.update(np.ascontiguousarray(data[column].values, dtype=np.float64).tobytes())
+        return f'{digest.hexdigest()[:12]}_{feature_definitions_hash()[:8]}'
+
+    def _version_dir(self, symbol, version):
+        return os.path.join(self.root, symbol, version)
+
+    def _column_path(self, symbol, version, name):
+        return os.path.join(self._version_dir(symbol, version), f'{name}.npy')
+
+    @staticmethod
+    def _save(path, values):
+        """다른 프로세스가 반쯤 쓰인 파일을 읽지 않도록 임시 파일에 쓴 뒤 교체"""
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, values)
+        os.replace(tmp_path, path)
+
+    def compute(self, data, feature_cols):
+        """요청한 특성만 계산 (저장하지 않음)"""
+        context = FeatureContext(data)
+        return pd.DataFrame({name: context[name] for name in feature_cols}, index=data.index)
+
+    def materialize(self, symbol, data, feature_cols):
+        """저장되지 않은 특성만 계산해서 저장하고 데이터 버전을 반환"""
+        version = self.data_version(data)
+        version_dir = self._version_dir(symbol, version)
+        os.makedirs(version_dir, exist_ok=True)
+
+        index_path = os.path.join(version_dir, '_index.npy')
+        if not os.path.exists(index_path):
+            self._save(index_path, data.index.values.astype('datetime64[ns]'))
+            self._prune_stale_versions(symbol, version)
+
+        canonical = dict.fromkeys(resolve_feature(name)[0] for name in feature_cols)
+        missing = [name for name in canonical
+                   if not os.path.exists(self._column_path(symbol, version, name))]
+
+        if missing:
+            context = FeatureContext(data)
+            for name in missing:
+                values = np.asarray(context[name], dtype=np.float64)
+                self._save(self._column_path(symbol, version, name), values)
+            self.stats['computed'] += len(missing)
+
+        return version
+
+    def _prune_stale_versions(self, symbol, version):
+        """같은 데이터를 이전 특성 정의로 계산한 버전 폴더 삭제
+
+        데이터 해시가 다른 폴더(다른 기간 등)는 아직 쓰일 수 있으므로 남겨둡니다.
+        정의 해시가 없는 이전 구조의 폴더는 다시 조회되지 않으므로 함께 삭제합니다.
+        """
+        data_hash = version.split('_')[0]
+        symbol_dir = os.path.join(self.root, symbol)
+        for name in os.listdir(symbol_dir):
+            if name != version and ('_' not in name or name.split('_')[0] == data_hash):
+                shutil.rmtree(os.path.join(symbol_dir, name), ignore_errors=True)
+
+    def load(self, symbol, version, columns, mmap=True):
+        """저장된 특성 중 요청한 컬럼 파일만 읽기"""
+        mmap_mode = 'r' if mmap else None
+        version_dir = self._version_dir(symbol, version)
+        index = pd.DatetimeIndex(np.load(os.path.join(version_dir, '_index.npy')))
+
+        frame = pd.DataFrame({
+            name: np.load(self._column_path(symbol, version, resolve_feature(name)[0]),
+                          mmap_mode=mmap_mode)
+            for name in columns
+        }, index=index)
+        self.stats['loaded'] += len(columns)
+        return frame
+
+    def get_features(self, symbol, data, feature_cols):
+        """특성 DataFrame (없는 컬럼만 계산 후 저장소에서 읽기)"""
+        version = self.materialize(symbol, data, feature_cols)
+        return self.load(symbol, version, feature_cols)
+
+    def training_matrix(self, symbol, data, feature_cols, target='target'):
+        """특성과 타겟에 결측치가 없는 행만 골라 (X, y) 반환"""
+        frame = self.get_features(symbol, data, list(feature_cols) + [target]).dropna()
+        return frame[list(feature_cols)], frame[target].astype(int)
+
+    def training_arrays(self, symbol, data, feature_cols, target='target', out=None, dtype=np.float32):
+        """training_matrix와 같은 행을 DataFrame 없이 C-연속 배열로 반환
+
+        저장된 컬럼을 mmap으로 읽어 결측 없는 행만 (행 × 특성) 배열에 바로 씁니다.
+        out이 주어지면 out[:행 수] 자리에 쓰고 그 뷰를 반환합니다 (큰 행렬에 이어 붙이기용).
+
+        Returns:
+        --------
+        tuple
+            (X: dtype의 C-연속 배열, y: int8 배열)
+        """
+        feature_cols = list(feature_cols)
+        version = self.materialize(symbol, data, feature_cols + [target])
+        columns = [np.load(self._column_path(symbol, version, resolve_feature(name)[0]), mmap_mode='r')
+                   for name in feature_cols + [target]]
+        self.stats['loaded'] += len(columns)
+
+        valid = np.ones(len(columns[0]), dtype=bool)
+        for values in columns:
+            valid &= ~np.isnan(values)
+        n_rows = int(valid.sum())
+
+        if out is None:
+            out = np.empty((n_rows, len(feature_cols)), dtype=dtype)
+        elif len(out) < n_rows:
+            raise ValueError(f"out 행 수 부족: {len(out)} < {n_rows}")
+        X = out[:n_rows]
+        for j, values in enumerate(columns[:-1]):
+            X[:, j] = values[valid]
+        y = columns[-1][valid].astype(np.int8)
+        return X, y
+
+
+def main():
+    """메인 함수"""
+
+    print("=" * 60)
+    print("Chapter 15: Feature Store")
+    print("=" * 60)
+
+    symbol = 'NVDA'
+    print(f"\n{symbol} 데이터 다운로드 중...")
+    data = yf.download(symbol, start='2020-01-01', end='2024-01-01', progress=False)
+
+    # yfinance multi-level columns handling
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+
+    if data.empty:
+        print("데이터 다운로드 실패")
+        return
+
+    store = FeatureStore()
+    version = store.data_version(data)
+    print(f"데이터 버전: {version}")
+    print(f"저장 위치: {store.root}")
+
+    # 1. 01_feature_engineering.py의 create_features와 비교
+    reference = load_chapter_module('chapter15', '01_feature_engineering.py')
+
+    all_cols = default_feature_columns()
+    t0 = time.perf_counter()
+    expected = reference.create_features(data)
+    full_time = time.perf_counter() - t0
+
+    computed = store.get_features(symbol, data, all_cols + TARGET_COLUMNS)
+    max_diff = np.nanmax(np.abs(computed[all_cols].values - expected[all_cols].values))
+    nan_match = (computed[all_cols].isna().values == expected[all_cols].isna().values).all()
+    print(f"\n특성 {len(all_cols)}개: create_features와 최대 오차 {max_diff:.2e}, 결측 위치 일치: {nan_match}")
+
+    # 2. chapter15/02의 학습용 특성만 요청
+    feature_cols = ['returns', 'price_to_sma_20', 'rsi', 'macd_diff', 'bb_position',
+                    'volatility', 'volume_ratio', 'returns_lag_1', 'returns_lag_2',
+                    'returns_lag_3', 'returns_lag_5']
+
+    t0 = time.perf_counter()
+    subset = store.compute(data, feature_cols)
+    subset_time = time.perf_counter() - t0
+
+    # 3. 같은 데이터로 다시 학습할 때는 저장된 컬럼만 읽음
+    store.stats = {'computed': 0, 'loaded': 0}
+    t0 = time.perf_counter()
+    X, y = store.training_matrix(symbol, data, feature_cols)
+    cached_time = time.perf_counter() - t0
+
+    print("\n" + "=" * 60)
+    print("특성 계산 시간 비교")
+    print("=" * 60)
+    print(f"create_features (전체 컬럼): {full_time * 1000:8.2f} ms")
+    print(f"필요한 {len(feature_cols)}개 특성만 계산: {subset_time * 1000:8.2f} ms")
+    print(f"저장소에서 읽기 (계산 {store.stats['computed']}개, "
+          f"로드 {store.stats['loaded']}개): {cached_time * 1000:8.2f} ms")
+    print(f"\n학습 행렬: {X.shape[0]} 행 × {X.shape[1]} 특성, 상승 비율 {y.mean():.2%}")
+    print(f"계산 결과와 저장소 결과 일치: {np.allclose(subset.loc[X.index].values, X.values)}")
+
+    print("\n분석 완료!")
+
+
+if __name__ == "__main__":
+    main()
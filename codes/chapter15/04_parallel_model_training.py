@@ -0,0 +1,351 @@
+"""
+Chapter 15: 머신러닝 기반 전략 (Part 1)
+Parallel Model Training
+
+02_ml_strategy.py의 train_ml_models는 5개 TimeSeriesSplit 폴드마다
+로지스틱 회귀와 랜덤 포레스트를 차례로 학습합니다.
+이 스크립트는 (종목, 폴드, 모델) 작업을 프로세스 풀에서 실행합니다.
+- 종목별 특성은 미리 할당한 float32 C-연속 행렬(FeatureMatrix)에 차례로 씁니다
+- 특성 행렬은 공유 메모리(multiprocessing.shared_memory)에 한 번만 올리고
+  워커는 폴드 구간을 뷰로 읽습니다 (작업마다 데이터를 피클링하지 않음)
+- CPU 코어를 바깥 프로세스 풀과 RandomForest의 n_jobs로 나눠 과다 구독을 피합니다
+- 폴드별 지표는 train_ml_models와 같은 results_df로 합칩니다
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from threadpoolctl import threadpool_limits
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import LogisticRegression
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
+
+# 예제 스크립트 불러오기 도우미 (codes/chapter_loader.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chapter_loader import load_chapter_module
+
+
+# train_ml_models와 같은 모델과 하이퍼파라미터 (학습 순서도 같음)
+MODEL_SPECS = {
+    'Logistic Regression': (LogisticRegression, {'random_state': 42, 'max_iter': 1000}),
+    'Random Forest': (RandomForestClassifier, {'n_estimators': 100, 'max_depth': 10, 'random_state': 42}),
+}
+
+FEATURE_COLS = ['returns', 'price_to_sma_20', 'rsi', 'macd_diff', 'bb_position',
+                'volatility', 'volume_ratio', 'returns_lag_1', 'returns_lag_2',
+                'returns_lag_3', 'returns_lag_5']
+
+
+class FeatureMatrix:
+    """여러 종목의 학습 행렬을 미리 할당한 C-연속 배열 하나에 이어 붙이는 버퍼
+
+    종목마다 DataFrame을 만들고 마지막에 np.concatenate로 합치는 대신,
+    특성 저장소에서 읽은 값을 dtype(기본값 float32) 행렬의 다음 구간에 바로 씁니다.
+    종목 구간은 segments에 (시작, 끝)으로 기록되고 폴드는 이 행렬의 뷰로 잘라 씁니다.
+    """
+
+    def __init__(self, capacity, n_features, dtype=np.float32):
+        """
+        Parameters:
+        -----------
+        capacity : int
+            미리 할당할 행 수 (부족하면 두 배로 늘림)
+        n_features : int
+            특성 개수
+        dtype : numpy dtype
+            특성 행렬의 자료형
+        """
+        self._X = np.empty((max(1, capacity), n_features), dtype=dtype)
+        self._y = np.empty(max(1, capacity), dtype=np.int8)
+        self.n_rows = 0
+        self.segments = {}
+
+    @property
+    def X(self):
+        return self._X[:self.n_rows]
+
+    @property
+    def y(self):
+        return self._y[:self.n_rows]
+
+    def _reserve(self, n_rows):
+        """n_rows 행을 더 쓸 공간 확보"""
+        needed = self.n_rows + n_rows
+        if needed <= len(self._X):
+            return
+        capacity = max(needed, 2 * len(self._X))
+        X = np.empty((capacity, self._X.shape[1]), dtype=self._X.dtype)
+        y = np.empty(capacity, dtype=self._y.dtype)
+        X[:self.n_rows] = self._X[:self.n_rows]
+        y[:self.n_rows] = self._y[:self.n_rows]
+        self._X, self._y = X, y
+
+    def append(self, symbol, X, y):
+        """이미 만들어진 (X, y)를 다음 구간에 복사"""
+        self._reserve(len(X))
+        start = self.n_rows
+        self._X[start:start + len(X)] = X
+        self._y[start:start + len(X)] = y
+        self.n_rows += len(X)
+        self.segments[symbol] = (start, self.n_rows)
+
+    def append_from_store(self, store, symbol, data, feature_cols):
+        """특성 저장소의 컬럼을 중간 DataFrame 없이 다음 구간에 바로 쓰기"""
+        self._reserve(len(data))
+        start = self.n_rows
+        X, y = store.training_arrays(symbol, data, feature_cols, out=self._X[start:])
+        self._y[start:start + len(y)] = y
+        self.n_rows += len(y)
+        self.segments[symbol] = (start, self.n_rows)
+
+    @classmethod
+    def from_datasets(cls, datasets, dtype=np.float32):
+        """{종목: (X, y)} 딕셔너리에서 만들기"""
+        n_rows = sum(len(X) for X, _ in datasets.values())
+        n_features = np.shape(next(iter(datasets.values()))[0])[1]
+        matrix = cls(n_rows, n_features, dtype)
+        for symbol, (X, y) in datasets.items():
+            matrix.append(symbol, np.asarray(X), np.asarray(y))
+        return matrix
+
+    @property
+    def nbytes(self):
+        return self.X.nbytes + self.y.nbytes
+
+
+def split_cores(num_jobs, n_cores=None):
+    """코어를 (바깥 워커 수, RandomForest n_jobs)로 분배
+
+    작업이 코어보다 많으면 작업 단위 병렬화가 가장 효율적이므로 RandomForest는 1스레드,
+    작업이 적으면 남는 코어를 RandomForest의 트리 병렬화에 나눠줍니다.
+    """
+    n_cores = n_cores or os.cpu_count() or 1
+    workers = max(1, min(num_jobs, n_cores))
+    return workers, max(1, n_cores // workers)
+
+
+class SharedArray:
+    """NumPy 배열을 공유 메모리에 올리고 다른 프로세스에서 이름으로 붙는 래퍼"""
+
+    def __init__(self, array):
+        array = np.ascontiguousarray(array)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self.spec = (self.shm.name, array.shape, array.dtype.str)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=self.shm.buf)[...] = array
+
+    @staticmethod
+    def attach(spec):
+        """(공유 메모리 핸들, 배열 뷰) 반환"""
+        name, shape, dtype = spec
+        shm = shared_memory.SharedMemory(name=name)
+        return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+_WORKER = {}
+
+
+def _init_worker(x_spec, y_spec, rf_n_jobs):
+    """워커 초기화: 공유 메모리에 한 번만 붙고, BLAS 스레드는 1개로 제한"""
+    _WORKER['x_shm'], _WORKER['X'] = SharedArray.attach(x_spec)
+    _WORKER['y_shm'], _WORKER['y'] = SharedArray.attach(y_spec)
+    _WORKER['rf_n_jobs'] = rf_n_jobs
+    _WORKER['limits'] = threadpool_limits(limits=1, user_api='blas')
+
+
+def fit_and_score(X, y, train, test, model_name, rf_n_jobs=1):
+    """한 폴드에서 스케일링 → 학습 → 평가 (train_ml_models의 한 단계와 같음)"""
+    X_train, X_test = X[train[0]:train[1]], X[test[0]:test[1]]
+    y_train, y_test = y[train[0]:train[1]], y[test[0]:test[1]]
+
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+
+    model_class, params = MODEL_SPECS[model_name]
+    if model_class is RandomForestClassifier:
+        params = dict(params, n_jobs=rf_n_jobs)
+    model = model_class(**params)
+    model.fit(X_train_scaled, y_train)
+    pred = model.predict(X_test_scaled)
+    prob = model.predict_proba(X_test_scaled)[:, 1]
+
+    return {
+        'model': model_name,
+        'accuracy': accuracy_score(y_test, pred),
+        'precision': precision_score(y_test, pred, zero_division=0),
+        'recall': recall_score(y_test, pred, zero_division=0),
+        'f1': f1_score(y_test, pred, zero_division=0),
+        'auc': roc_auc_score(y_test, prob)
+    }
+
+
+def _run_job(job):
+    """워커에서 실행: 공유 행렬의 [offset + 구간] 뷰로 학습"""
+    symbol, fold, offset, train, test, model_name = job
+    train = (offset + train[0], offset + train[1])
+    test = (offset + test[0], offset + test[1])
+    result = fit_and_score(_WORKER['X'], _WORKER['y'], train, test, model_name, _WORKER['rf_n_jobs'])
+    result.update({'symbol': symbol, 'fold': fold})
+    return result
+
+
+def build_jobs(segments, n_splits=5):
+    """(종목, 폴드, 모델) 작업 목록 생성 (TimeSeriesSplit 폴드는 연속 구간이므로 시작/끝만 전달)
+
+    segments는 {종목: (시작 행, 끝 행)} (FeatureMatrix.segments)
+    """
+    jobs = []
+    for symbol, (offset, end) in segments.items():
+        tscv = TimeSeriesSplit(n_splits=n_splits)
+        for fold, (train_idx, test_idx) in enumerate(tscv.split(np.empty((end - offset, 1)))):
+            train = (int(train_idx[0]), int(train_idx[-1]) + 1)
+            test = (int(test_idx[0]), int(test_idx[-1]) + 1)
+            for model_name in MODEL_SPECS:
+                jobs.append((symbol, fold + 1, offset, train, test, model_name))
+    return jobs
+
+
+def train_models_parallel(datasets, n_splits=5, n_cores=None, dtype=np.float32):
+    """여러 종목의 (폴드, 모델) 작업을 프로세스 풀에서 학습
+
+    Parameters:
+    -----------
+    datasets : FeatureMatrix or dict
+        FeatureMatrix 또는 {종목: (X, y)} - X는 (행 × 특성) 배열 또는 DataFrame
+    n_splits : int
+        TimeSeriesSplit 폴드 수
+    n_cores : int
+        사용할 코어 수 (기본값: 전체)
+    dtype : numpy dtype
+        딕셔너리를 받았을 때 만들 행렬의 자료형
+        (np.float64이면 train_ml_models와 같은 결과, float32이면 메모리 절반)
+
+    Returns:
+    --------
+    pd.DataFrame
+        train_ml_models와 같은 열(model, fold, 지표)에 symbol 열을 더한 결과
+    """
+    matrix = datasets if isinstance(datasets, FeatureMatrix) else FeatureMatrix.from_datasets(datasets, dtype)
+    jobs = build_jobs(matrix.segments, n_splits)
+    workers, rf_n_jobs = split_cores(len(jobs), n_cores)
+    X_all, y_all = matrix.X, matrix.y
+
+    if workers == 1:
+        # 코어가 하나면 풀 없이 같은 경로로 실행
+        _WORKER.update({'X': X_all, 'y': y_all, 'rf_n_jobs': rf_n_jobs})
+        try:
+            results = [_run_job(job) for job in jobs]
+        finally:
+            _WORKER.clear()
+    else:
+        shared_X, shared_y = SharedArray(X_all), SharedArray(y_all)
+
+        # spawn 방식의 워커도 이 모듈(파일명이 숫자로 시작)을 이름으로 찾을 수 있도록
+        module_dir = os.path.dirname(os.path.abspath(__file__))
+        if module_dir not in sys.path:
+            sys.path.insert(0, module_dir)
+
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(shared_X.spec, shared_y.spec, rf_n_jobs)) as pool:
+                results = list(pool.map(_run_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+        finally:
+            shared_X.close()
+            shared_y.close()
+
+    columns = ['symbol', 'model', 'fold', 'accuracy', 'precision', 'recall', 'f1', 'auc']
+    return pd.DataFrame(results)[columns]
+
+
+def load_universe_datasets(tickers, start_date, end_date, feature_cols=FEATURE_COLS,
+                           rows_per_symbol=2600, dtype=np.float32):
+    """종목별 학습 데이터를 FeatureMatrix 하나에 차례로 쓰기 (특성 저장소 사용)
+
+    종목을 하나씩 내려받아 미리 할당한 행렬에 바로 쓰므로
+    종목별 DataFrame이나 float64 사본을 모아두지 않습니다.
+    """
+
+    store = load_chapter_module('chapter15', '03_feature_store.py').FeatureStore()
+    matrix = FeatureMatrix(len(tickers) * rows_per_symbol, len(feature_cols), dtype)
+    for ticker in tickers:
+        data = yf.download(ticker, start=start_date, end=end_date, progress=False)
+
+        # yfinance multi-level columns handling
+        if isinstance(data.columns, pd.MultiIndex):
+            data.columns = data.columns.get_level_values(0)
+
+        if data.empty:
+            continue
+        matrix.append_from_store(store, ticker, data, feature_cols)
+    return matrix
+
+
+def main():
+    """메인 함수"""
+
+    print("=" * 60)
+    print("Chapter 15: Parallel Model Training")
+    print("=" * 60)
+
+    n_cores = os.cpu_count() or 1
+    print(f"\n사용 가능한 코어: {n_cores}")
+
+    # 1. 단일 종목: 순차 실행과 병렬 실행의 results_df 비교
+    datasets = load_universe_datasets(['NVDA'], '2020-01-01', '2024-01-01')
+    if not datasets.segments:
+        print("데이터 다운로드 실패")
+        return
+
+    t0 = time.perf_counter()
+    serial = train_models_parallel(datasets, n_cores=1)
+    serial_time = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    parallel = train_models_parallel(datasets, n_cores=n_cores)
+    parallel_time = time.perf_counter() - t0
+
+    workers, rf_n_jobs = split_cores(len(parallel), n_cores)
+    print("\n" + "=" * 60)
+    print("NVDA: 5개 폴드 × 2개 모델")
+    print("=" * 60)
+    print(parallel.drop(columns='symbol').to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+    print(f"\n순차 실행: {serial_time:.2f}초, 병렬 실행: {parallel_time:.2f}초 "
+          f"(워커 {workers}개 × RandomForest n_jobs={rf_n_jobs})")
+    print(f"결과 일치: {serial.equals(parallel)}")
+
+    # 2. 여러 종목 유니버스
+    tickers = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'NVDA', 'META', 'TSLA', 'JPM', 'V', 'SPY']
+    print(f"\n{len(tickers)}개 종목 데이터 준비 중...")
+    universe = load_universe_datasets(tickers, '2015-01-01', '2024-01-01')
+
+    t0 = time.perf_counter()
+    results = train_models_parallel(universe, n_cores=n_cores)
+    elapsed = time.perf_counter() - t0
+
+    workers, rf_n_jobs = split_cores(len(results), n_cores)
+    print("\n" + "=" * 60)
+    print(f"유니버스 모델 비교 ({len(universe.segments)}개 종목 × 5개 폴드 × 2개 모델)")
+    print("=" * 60)
+    print(results.groupby('model')[['accuracy', 'precision', 'recall', 'f1', 'auc']]
+          .mean().to_string(float_format=lambda x: f"{x:.4f}"))
+    print(f"\n학습 행렬: {universe.X.shape[0]} 행 × {universe.X.shape[1]} 특성, "
+          f"{universe.X.dtype} {universe.nbytes / 1024 ** 2:.1f} MB")
+    print(f"실행 시간: {elapsed:.1f}초 (워커 {workers}개 × RandomForest n_jobs={rf_n_jobs})")
+    print(f"200개 종목 예상 시간: {elapsed / len(universe.segments) * 200 / 60:.1f}분")
+
+    print("\n분석 완료!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Chapter 15: 머신러닝 기반 전략 (Part 1)
+Compact Feature Matrix
+
+여러 종목을 한 번에 학습할 때 특성은 float64 DataFrame → .values →
+np.concatenate → 폴드별 X.iloc[train_idx] → scaler.fit_transform을 거치며
+단계마다 사본이 생깁니다.
+이 스크립트는 04_parallel_model_training.py의 FeatureMatrix 경로와 비교합니다.
+- 특성 저장소의 컬럼(mmap)을 미리 할당한 float32 C-연속 행렬에 종목별로 바로 씀
+- 폴드는 행렬의 연속 구간(뷰)으로 자름 (TimeSeriesSplit 폴드는 연속 구간)
+- StandardScaler와 sklearn 모델은 float32 입력을 그대로 사용 (float64로 다시 변환하지 않음)
+500개 종목 × 10년 데이터로 두 경로의 최대 메모리 사용량(tracemalloc)을 측정합니다.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import LogisticRegression
+
+# 예제 스크립트 불러오기 도우미 (codes/chapter_loader.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chapter_loader import load_chapter_module
+
+
+parallel = load_chapter_module('chapter15', '04_parallel_model_training.py')
+feature_store = load_chapter_module('chapter15', '03_feature_store.py')
+
+
+def synthetic_universe(n_symbols, n_days=2520, seed=42):
+    """기하 브라운 운동으로 만든 가상 종목 OHLCV (종목마다 시드 고정)"""
+    index = pd.bdate_range('2014-01-01', periods=n_days)
+    for i in range(n_symbols):
+        rng = np.random.default_rng(seed + i)
+        close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, n_days)))
+        spread = np.abs(rng.normal(0, 0.01, n_days))
+        yield f'SYM{i:04d}', pd.DataFrame({
+            'Open': close * (1 + rng.normal(0, 0.005, n_days)),
+            'High': close * (1 + spread),
+            'Low': close * (1 - spread),
+            'Close': close,
+            'Volume': rng.integers(1_000_000, 10_000_000, n_days).astype(float),
+        }, index=index)
+
+
+def build_legacy(store, universe, feature_cols):
+    """이전 경로: 종목별 float64 DataFrame을 모은 뒤 np.concatenate"""
+    datasets = {}
+    for symbol, data in universe:
+        X, y = store.training_matrix(symbol, data, feature_cols)
+        datasets[symbol] = (X.values, y.values)
+
+    X_all = np.concatenate([np.asarray(X, dtype=np.float64) for X, _ in datasets.values()])
+    y_all = np.concatenate([np.asarray(y) for _, y in datasets.values()])
+    lengths = {symbol: len(X) for symbol, (X, _) in datasets.items()}
+    return datasets, X_all, y_all, lengths
+
+
+def build_compact(store, universe, feature_cols, n_symbols, n_days):
+    """FeatureMatrix 경로: 미리 할당한 float32 행렬에 종목별로 바로 쓰기"""
+    matrix = parallel.FeatureMatrix(n_symbols * n_days, len(feature_cols))
+    for symbol, data in universe:
+        matrix.append_from_store(store, symbol, data, feature_cols)
+    return matrix
+
+
+def pooled_folds(segments, n_splits=5):
+    """시간 순서 폴드: 종목마다 TimeSeriesSplit 구간을 구해 같은 폴드끼리 모음"""
+    folds = [([], []) for _ in range(n_splits)]
+    for offset, end in segments:
+        tscv = TimeSeriesSplit(n_splits=n_splits)
+        for fold, (train_idx, test_idx) in enumerate(tscv.split(np.empty((end - offset, 1)))):
+            folds[fold][0].append((offset + train_idx[0], offset + train_idx[-1] + 1))
+            folds[fold][1].append((offset + test_idx[0], offset + test_idx[-1] + 1))
+    return folds
+
+
+def train_pooled(X, y, segments, n_splits=5):
+    """전 종목을 합친 횡단면 모델 학습 (폴드마다 스케일링 → 로지스틱 회귀)
+
+    폴드의 학습 구간이 종목마다 떨어져 있으므로 구간 뷰를 모아 한 번만 복사합니다.
+    """
+    scores = []
+    for train, test in pooled_folds(segments, n_splits):
+        X_train = np.concatenate([X[a:b] for a, b in train])
+        y_train = np.concatenate([y[a:b] for a, b in train])
+        X_test = np.concatenate([X[a:b] for a, b in test])
+        y_test = np.concatenate([y[a:b] for a, b in test])
+
+        scaler = StandardScaler()
+        X_train = scaler.fit_transform(X_train)
+        X_test = scaler.transform(X_test)
+
+        model = LogisticRegression(random_state=42, max_iter=1000)
+        model.fit(X_train, y_train)
+        scores.append(model.score(X_test, y_test))
+        del X_train, X_test
+    return float(np.mean(scores))
+
+
+def measure_peak(func, *args):
+    """func 실행 중 최대 메모리 (tracemalloc, MB)와 실행 시간, 반환값"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    t0 = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak / 1024 ** 2, elapsed
+
+
+def main():
+    """메인 함수"""
+
+    print("=" * 60)
+    print("Chapter 15: Compact Feature Matrix")
+    print("=" * 60)
+
+    feature_cols = parallel.FEATURE_COLS
+
+    # 1. 실제 종목: FeatureMatrix와 training_matrix 값 비교
+    symbol = 'NVDA'
+    print(f"\n{symbol} 데이터 다운로드 중...")
+    data = yf.download(symbol, start='2020-01-01', end='2024-01-01', progress=False)
+
+    # yfinance multi-level columns handling
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+
+    if data.empty:
+        print("데이터 다운로드 실패")
+        return
+
+    store = feature_store.FeatureStore()
+    X_df, y_series = store.training_matrix(symbol, data, feature_cols)
+    X, y = store.training_arrays(symbol, data, feature_cols)
+    print(f"training_arrays: {X.shape}, {X.dtype}, C-연속: {X.flags['C_CONTIGUOUS']}")
+    print(f"training_matrix와 값 일치 (float32 반올림): "
+          f"{np.array_equal(X, X_df.values.astype(np.float32)) and np.array_equal(y, y_series.values)}")
+
+    fold_view = X[100:500]
+    print(f"폴드 구간이 사본 없는 뷰인지: {np.shares_memory(fold_view, X)}")
+
+    # 2. 500개 종목 × 10년 횡단면 학습의 최대 메모리
+    n_symbols, n_days = 500, 2520
+    root = tempfile.mkdtemp(prefix='feature_store_')
+    try:
+        store = feature_store.FeatureStore(root)
+        print(f"\n가상 종목 {n_symbols}개 × {n_days}일 특성 저장 중...")
+        for sym, frame in synthetic_universe(n_symbols, n_days):
+            store.materialize(sym, frame, feature_cols + ['target'])
+
+        def legacy_pipeline():
+            datasets, X_all, y_all, lengths = build_legacy(store, synthetic_universe(n_symbols, n_days),
+                                                           feature_cols)
+            bounds = np.cumsum([0] + list(lengths.values()))
+            return X_all.shape, train_pooled(X_all, y_all, list(zip(bounds[:-1], bounds[1:])))
+
+        def compact_pipeline():
+            matrix = build_compact(store, synthetic_universe(n_symbols, n_days), feature_cols,
+                                   n_symbols, n_days)
+            return matrix.X.shape, train_pooled(matrix.X, matrix.y, list(matrix.segments.values()))
+
+        (legacy_shape, legacy_score), legacy_peak, legacy_time = measure_peak(legacy_pipeline)
+        (compact_shape, compact_score), compact_peak, compact_time = measure_peak(compact_pipeline)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    print(f"횡단면 학습 최대 메모리 ({legacy_shape[0]:,} 행 × {legacy_shape[1]} 특성, 5개 폴드)")
+    print("=" * 60)
+    print(f"{'경로':<28}{'최대 메모리':>12}{'실행 시간':>10}{'평균 정확도':>12}")
+    print(f"{'float64 DataFrame + concat':<28}{legacy_peak:>10.1f}MB{legacy_time:>9.1f}초{legacy_score:>12.4f}")
+    print(f"{'float32 FeatureMatrix':<28}{compact_peak:>10.1f}MB{compact_time:>9.1f}초{compact_score:>12.4f}")
+    print(f"\n최대 메모리 감소: {1 - compact_peak / legacy_peak:.1%} "
+          f"(행 수 일치: {legacy_shape == compact_shape})")
+
+    print("\n분석 완료!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Chapter 15: 머신러닝 기반 전략 (Part 1)
+Chunked Panel Dataset
+
+create_features는 종목 하나의 DataFrame을 처리하므로, 여러 종목을 합친
+횡단면(panel) 학습 데이터를 만들려면 모든 종목을 메모리에 올려야 합니다.
+이 스크립트의 데이터셋 빌더는 종목을 chunk_size개씩 특성 파이프라인에 통과시키고
+결과를 (연도 × 종목 묶음) 단위의 행 그룹 파일로 디스크에 씁니다.
+- 학습은 행 그룹을 mmap으로 읽어 (X, y) 배치로 순회 (메모리보다 큰 데이터셋도 학습 가능)
+- 연도 경계로 나눈 시간 순서 분할 (앞 연도로 학습, 다음 연도로 평가)
+- partial_fit을 지원하는 모델(SGDClassifier, StandardScaler)로 배치 단위 학습
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import tracemalloc
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import SGDClassifier
+
+# 예제 스크립트 불러오기 도우미 (codes/chapter_loader.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chapter_loader import load_chapter_module
+
+
+feature_store = load_chapter_module('chapter15', '03_feature_store.py')
+
+
+class PanelDatasetBuilder:
+    """종목을 묶음 단위로 특성 파이프라인에 통과시켜 행 그룹 파일로 쓰는 빌더
+
+    저장 구조: {path}/part-{연도}-{묶음 번호}/X.npy, y.npy, dates.npy, symbols.npy
+               {path}/manifest.json (특성 목록, 종목 목록, 행 그룹 목록)
+    """
+
+    def __init__(self, path, feature_cols, target='target', chunk_size=50, dtype=np.float32):
+        """
+        Parameters:
+        -----------
+        path : str
+            데이터셋을 쓸 폴더
+        feature_cols : list
+            특성 이름 (특성 저장소의 이름 규칙)
+        target : str
+            타겟 컬럼
+        chunk_size : int
+            한 번에 메모리에 모으는 종목 수
+        dtype : numpy dtype
+            특성 행렬의 자료형
+        """
+        self.path = path
+        self.feature_cols = list(feature_cols)
+        self.target = target
+        self.chunk_size = chunk_size
+        self.dtype = dtype
+        self.store = feature_store.FeatureStore()
+
+    def _symbol_rows(self, data):
+        """종목 하나의 (X, y, 날짜) - 특성과 타겟에 결측치가 없는 행만"""
+        frame = self.store.compute(data, self.feature_cols + [self.target]).dropna()
+        X = np.ascontiguousarray(frame[self.feature_cols].values, dtype=self.dtype)
+        return X, frame[self.target].values.astype(np.int8), frame.index.values.astype('datetime64[ns]')
+
+    def _write_chunk(self, tmp_path, chunk_id, rows, parts):
+        """묶음의 행을 연도별 행 그룹으로 나눠 쓰기"""
+        X = np.concatenate([r[0] for r in rows])
+        y = np.concatenate([r[1] for r in rows])
+        dates = np.concatenate([r[2] for r in rows])
+        symbols = np.concatenate([np.full(len(r[0]), r[3], dtype=np.int32) for r in rows])
+        years = dates.astype('datetime64[Y]').astype(int) + 1970
+
+        for year in np.unique(years):
+            mask = years == year
+            name = f'part-{year}-{chunk_id:04d}'
+            os.makedirs(os.path.join(tmp_path, name))
+            for key, values in [('X', X[mask]), ('y', y[mask]), ('dates', dates[mask]),
+                                ('symbols', symbols[mask])]:
+                np.save(os.path.join(tmp_path, name, f'{key}.npy'), values)
+            parts.append({'name': name, 'year': int(year), 'chunk': chunk_id, 'rows': int(mask.sum())})
+
+    def build(self, universe):
+        """(종목, OHLCV DataFrame) 이터러블로 데이터셋을 만들고 PanelDataset 반환
+
+        전체 데이터셋을 임시 폴더에 쓴 뒤 교체하므로 중간에 실패해도 반쯤 쓰인 데이터셋이 남지 않습니다.
+        """
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        symbols, parts, rows = [], [], []
+        for symbol, data in universe:
+            X, y, dates = self._symbol_rows(data)
+            rows.append((X, y, dates, len(symbols)))
+            symbols.append(symbol)
+            if len(rows) == self.chunk_size:
+                self._write_chunk(tmp_path, len(symbols) // self.chunk_size - 1, rows, parts)
+                rows = []
+        if rows:
+            self._write_chunk(tmp_path, (len(symbols) - 1) // self.chunk_size, rows, parts)
+
+        parts.sort(key=lambda part: (part['year'], part['chunk']))
+        manifest = {
+            'feature_cols': self.feature_cols,
+            'target': self.target,
+            'dtype': np.dtype(self.dtype).str,
+            'symbols': symbols,
+            'parts': parts,
+        }
+        with open(os.path.join(tmp_path, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(tmp_path, self.path)
+        return PanelDataset(self.path)
+
+
+class PanelDataset:
+    """디스크의 행 그룹을 (X, y) 배치로 순회하는 횡단면 데이터셋"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.feature_cols = self.manifest['feature_cols']
+        self.symbols = self.manifest['symbols']
+        self.parts = self.manifest['parts']
+
+    @property
+    def n_rows(self):
+        return sum(part['rows'] for part in self.parts)
+
+    @property
+    def years(self):
+        return sorted({part['year'] for part in self.parts})
+
+    @property
+    def nbytes(self):
+        """디스크 사용량 (바이트)"""
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, files in os.walk(self.path) for name in files)
+
+    def iter_parts(self, years=None):
+        """행 그룹을 시간 순서(연도 → 종목 묶음)로 mmap해서 순회
+
+        Yields:
+        -------
+        dict
+            {'X', 'y', 'dates', 'symbols'} - 읽기 전용 mmap 배열
+        """
+        for part in self.parts:
+            if years is not None and part['year'] not in years:
+                continue
+            part_path = os.path.join(self.path, part['name'])
+            yield {key: np.load(os.path.join(part_path, f'{key}.npy'), mmap_mode='r')
+                   for key in ('X', 'y', 'dates', 'symbols')}
+
+    def iter_batches(self, batch_size=65536, years=None):
+        """(X, y) 배치 순회 (행 그룹을 시간 순서로 이어 붙여 batch_size행씩, 마지막 배치만 짧을 수 있음)
+
+        배치가 행 그룹 하나 안에 있으면 mmap 뷰를, 여러 행 그룹에 걸치면 이어 붙인 복사본을 반환합니다.
+        """
+        pending, n_pending = [], 0
+        for part in self.iter_parts(years):
+            start, n_rows = 0, len(part['y'])
+            while start < n_rows:
+                stop = min(n_rows, start + batch_size - n_pending)
+                pending.append((part['X'][start:stop], part['y'][start:stop]))
+                n_pending += stop - start
+                start = stop
+                if n_pending == batch_size:
+                    yield self._join(pending)
+                    pending, n_pending = [], 0
+        if pending:
+            yield self._join(pending)
+
+    @staticmethod
+    def _join(pieces):
+        """배치 조각 [(X, y), ...]를 하나의 (X, y)로"""
+        if len(pieces) == 1:
+            return pieces[0]
+        return np.concatenate([X for X, _ in pieces]), np.concatenate([y for _, y in pieces])
+
+    def time_splits(self, n_splits=5, min_train_years=1):
+        """연도 경계로 나눈 확장 윈도우 분할 (TimeSeriesSplit과 같은 방식)
+
+        Returns:
+        --------
+        list
+            [(학습 연도 목록, 평가 연도 목록), ...] - 평가 연도는 항상 학습 연도 이후
+        """
+        years = self.years
+        test_years = years[max(min_train_years, len(years) - n_splits):]
+        return [([y for y in years if y < test_year], [test_year]) for test_year in test_years]
+
+
+def train_on_split(dataset, train_years, test_years, batch_size=65536, epochs=2):
+    """배치 단위로 스케일러와 SGD 로지스틱 회귀를 학습하고 평가 연도의 정확도 반환"""
+    scaler = StandardScaler()
+    for X, _ in dataset.iter_batches(batch_size, train_years):
+        scaler.partial_fit(X)
+
+    model = SGDClassifier(loss='log_loss', alpha=1e-4, random_state=42)
+    for _ in range(epochs):
+        for X, y in dataset.iter_batches(batch_size, train_years):
+            model.partial_fit(scaler.transform(X), y, classes=np.array([0, 1]))
+
+    correct = total = 0
+    for X, y in dataset.iter_batches(batch_size, test_years):
+        correct += int((model.predict(scaler.transform(X)) == y).sum())
+        total += len(y)
+    return correct / total
+
+
+def main():
+    """메인 함수"""
+
+    print("=" * 60)
+    print("Chapter 15: Chunked Panel Dataset")
+    print("=" * 60)
+
+    compact = load_chapter_module('chapter15', '05_compact_feature_matrix.py')
+    feature_cols = compact.parallel.FEATURE_COLS
+    n_symbols, n_days = 500, 2520
+
+    root = tempfile.mkdtemp(prefix='panel_dataset_')
+    try:
+        # 1. 종목 50개씩 특성 계산 → 연도별 행 그룹 쓰기
+        print(f"\n가상 종목 {n_symbols}개 × {n_days}일 데이터셋 생성 중 (묶음당 50개 종목)...")
+        builder = PanelDatasetBuilder(os.path.join(root, 'panel'), feature_cols, chunk_size=50)
+
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        dataset = builder.build(compact.synthetic_universe(n_symbols, n_days))
+        build_time = time.perf_counter() - t0
+        _, build_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        in_memory = dataset.n_rows * len(feature_cols) * 8
+        print("\n" + "=" * 60)
+        print("데이터셋")
+        print("=" * 60)
+        print(f"행 수: {dataset.n_rows:,} ({len(dataset.symbols)}개 종목 × {len(feature_cols)} 특성)")
+        print(f"행 그룹: {len(dataset.parts)}개 ({dataset.years[0]}~{dataset.years[-1]}년 × 종목 묶음)")
+        print(f"디스크 사용량: {dataset.nbytes / 1024 ** 2:.1f} MB")
+        print(f"생성 시간: {build_time:.1f}초, 최대 메모리: {build_peak / 1024 ** 2:.1f} MB "
+              f"(전체를 float64로 올리면 {in_memory / 1024 ** 2:.1f} MB)")
+
+        # 2. 종목별 행이 특성 저장소의 학습 행렬과 같은지 확인 (앞쪽 5개 종목)
+        check = dict(list(compact.synthetic_universe(5, n_days)))
+        expected = {symbol: builder._symbol_rows(data) for symbol, data in check.items()}
+        collected = {symbol: ([], []) for symbol in check}
+        for part in dataset.iter_parts():
+            for code, symbol in enumerate(dataset.symbols[:5]):
+                mask = part['symbols'] == code
+                collected[symbol][0].append(part['X'][mask])
+                collected[symbol][1].append(part['dates'][mask])
+        same = all(np.array_equal(np.concatenate(collected[s][0]), expected[s][0]) and
+                   np.array_equal(np.concatenate(collected[s][1]), expected[s][2]) for s in check)
+        print(f"행 그룹에서 모은 종목별 행 = 특성 파이프라인 결과: {same}")
+
+        # 3. 연도 경계 시간 순서 분할로 배치 학습
+        print("\n" + "=" * 60)
+        print("시간 순서 분할 배치 학습 (StandardScaler + SGD 로지스틱 회귀)")
+        print("=" * 60)
+        tracemalloc.start()
+        for train_years, test_years in dataset.time_splits(n_splits=5):
+            t0 = time.perf_counter()
+            accuracy = train_on_split(dataset, train_years, test_years)
+            elapsed = time.perf_counter() - t0
+            train_rows = sum(p['rows'] for p in dataset.parts if p['year'] in train_years)
+            print(f"학습 {train_years[0]}~{train_years[-1]} ({train_rows:>9,} 행) → "
+                  f"평가 {test_years[0]}: 정확도 {accuracy:.4f}, {elapsed:.1f}초")
+        _, train_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"\n배치 학습 최대 메모리: {train_peak / 1024 ** 2:.1f} MB")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print("\n분석 완료!")
+
+
+if __name__ == "__main__":
+    main()
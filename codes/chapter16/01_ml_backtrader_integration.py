@@ -3,18 +3,30 @@ Chapter 16: 머신러닝 기반 전략 (Part 2)
 ML and Backtrader Integration
 
 이 스크립트는 머신러닝 모델을 Backtrader와 통합하여 백테스트합니다.
+
+batch_inference=True이면 봉마다 predict_proba를 호출하는 대신
+전체 구간의 인과적(causal) 특성 행렬을 한 번에 계산하고 한 번의 호출로 확률을 구해
+추가 데이터 라인(ml_prob)으로 전략에 전달합니다. 거래 결과는 봉 단위 방식과 같습니다.
 """
 
 import os
+import sys
+import math
+import time
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import yfinance as yf
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import accuracy_score, roc_auc_score
 import backtrader as bt
 import pickle
 
+# 예제 스크립트 불러오기 도우미 (codes/chapter_loader.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chapter_loader import load_chapter_module
+
 plt.rcParams['font.family'] = ['Nanum Gothic', 'Malgun Gothic', 'AppleGothic', 'Arial Unicode MS', 'DejaVu Sans']
 plt.rcParams['axes.unicode_minus'] = False
 
@@ -113,72 +125,219 @@ class MLStrategy(bt.Strategy):
             return None
 
 
-def prepare_ml_model(data, feature_cols):
-    """ML 모델 학습"""
+class MLSignalData(bt.feeds.PandasData):
+    """사전 계산한 ML 확률을 ml_prob 라인으로 싣는 데이터 피드"""
 
-    print("\nML 모델 학습 중...")
+    lines = ('ml_prob',)
+    params = (('ml_prob', -1),)
+
+
+class PrecomputedMLStrategy(bt.Strategy):
+    """데이터 피드의 ml_prob 라인을 읽어 거래하는 ML 전략 (MLStrategy와 같은 규칙)"""
+
+    params = (
+        ('prob_threshold', 0.6),
+    )
+
+    def next(self):
+        prob = self.data.ml_prob[0]
+
+        # 워밍업 구간이나 특성을 계산할 수 없는 봉
+        if math.isnan(prob):
+            return
+
+        # 확률 기반 거래
+        if not self.position:
+            if prob > self.params.prob_threshold:
+                self.buy()
+        else:
+            if prob < (1 - self.params.prob_threshold):
+                self.close()
+
+
+def _bt_sma(values, period, start=0):
+    """backtrader SMA와 같은 계산 (윈도우마다 math.fsum)"""
+    out = np.full(len(values), np.nan)
+    for i in range(start + period - 1, len(values)):
+        out[i] = math.fsum(values[i - period + 1:i + 1]) / period
+    return out
+
+
+def _bt_smoothing(values, period, alpha=None, start=0):
+    """backtrader EMA/SMMA와 같은 계산 (SMA로 시작값을 정한 뒤 지수 평활)"""
+    alpha = 2.0 / (1.0 + period) if alpha is None else alpha
+    alpha1 = 1.0 - alpha
+
+    out = _bt_sma(values, period, start)
+    first = start + period - 1
+    if first >= len(values):
+        return out
+
+    prev = out[first]
+    for i in range(first + 1, len(values)):
+        out[i] = prev = prev * alpha1 + values[i] * alpha
+    return out
+
+
+def compute_strategy_features(data, min_bars=200):
+    """MLStrategy.calculate_features와 같은 특성을 전체 구간에 대해 한 번에 계산
 
-    # 특성 생성
-    df = data.copy()
-    df['returns'] = df['Close'].pct_change()
-    df['sma_20'] = df['Close'].rolling(window=20).mean()
-    df['price_to_sma_20'] = df['Close'] / df['sma_20'] - 1
+    t번째 행은 t번째 봉까지의 데이터만 사용합니다 (봉 단위 방식과 같은 지표 정의:
+    backtrader의 SMA/EMA/SMMA, 모집단 표준편차, 직전 20개 수익률의 변동성).
+    min_bars개의 봉이 쌓이기 전에는 NaN입니다.
+    """
+    close = data['Close'].values.astype(np.float64)
+    volume = data['Volume'].values.astype(np.float64)
+    n = len(close)
 
-    # RSI
-    delta = df['Close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-    rs = gain / loss
-    df['rsi'] = 100 - (100 / (1 + rs))
+    returns = np.full(n, np.nan)
+    returns[1:] = (close[1:] - close[:-1]) / close[:-1]
+
+    def lag(values, k):
+        out = np.full(n, np.nan)
+        out[k:] = values[:n - k]
+        return out
+
+    # 가격 대비 SMA
+    sma_20 = _bt_sma(close, 20)
+
+    # RSI (Wilder 평활)
+    upday = np.full(n, np.nan)
+    downday = np.full(n, np.nan)
+    upday[1:] = np.maximum(close[1:] - close[:-1], 0.0)
+    downday[1:] = np.maximum(close[:-1] - close[1:], 0.0)
+    maup = _bt_smoothing(upday, 14, alpha=1.0 / 14, start=1)
+    madown = _bt_smoothing(downday, 14, alpha=1.0 / 14, start=1)
 
     # MACD
-    df['ema_12'] = df['Close'].ewm(span=12, adjust=False).mean()
-    df['ema_26'] = df['Close'].ewm(span=26, adjust=False).mean()
-    df['macd'] = df['ema_12'] - df['ema_26']
-    df['macd_signal'] = df['macd'].ewm(span=9, adjust=False).mean()
-    df['macd_diff'] = df['macd'] - df['macd_signal']
+    macd = _bt_smoothing(close, 12) - _bt_smoothing(close, 26)
+    macd_signal = _bt_smoothing(macd, 9, start=25)
 
-    # Bollinger Bands
-    df['bb_middle'] = df['Close'].rolling(window=20).mean()
-    bb_std = df['Close'].rolling(window=20).std()
-    df['bb_upper'] = df['bb_middle'] + (bb_std * 2)
-    df['bb_lower'] = df['bb_middle'] - (bb_std * 2)
-    df['bb_position'] = (df['Close'] - df['bb_lower']) / (df['bb_upper'] - df['bb_lower'])
+    # Bollinger Bands (모집단 표준편차)
+    stddev = 2.0 * np.sqrt(_bt_sma(close ** 2, 20) - sma_20 ** 2)
+    bb_top = sma_20 + stddev
+    bb_bot = sma_20 - stddev
 
-    # 변동성
-    df['volatility'] = df['returns'].rolling(window=20).std()
+    # 직전 20개 수익률의 변동성 / 최근 5개 거래량 평균 (봉 단위 방식과 같은 순서로 합산)
+    volatility = np.full(n, np.nan)
+    if n > 21:
+        windows = np.lib.stride_tricks.sliding_window_view(returns[1:n - 1], 20)
+        volatility[21:] = np.ascontiguousarray(windows[:, ::-1]).std(axis=1)
 
-    # 거래량
-    df['volume_sma_5'] = df['Volume'].rolling(window=5).mean()
-    df['volume_ratio'] = df['Volume'] / df['volume_sma_5']
+    volume_sma_5 = np.full(n, np.nan)
+    if n >= 5:
+        windows = np.lib.stride_tricks.sliding_window_view(volume, 5)
+        volume_sma_5[4:] = np.ascontiguousarray(windows[:, ::-1]).mean(axis=1)
 
-    # 래그 특성
-    for lag in [1, 2, 3, 5]:
-        df[f'returns_lag_{lag}'] = df['returns'].shift(lag)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        features = pd.DataFrame({
+            'returns': returns,
+            'price_to_sma_20': close / sma_20 - 1,
+            'rsi': 100.0 - 100.0 / (1.0 + maup / madown),
+            'macd_diff': macd - macd_signal,
+            'bb_position': (close - bb_bot) / (bb_top - bb_bot),
+            'volatility': volatility,
+            'volume_ratio': np.where(volume_sma_5 > 0, volume / volume_sma_5, 1.0),
+            'returns_lag_1': lag(returns, 1),
+            'returns_lag_2': lag(returns, 2),
+            'returns_lag_3': lag(returns, 3),
+            'returns_lag_5': lag(returns, 5),
+        }, index=data.index)
 
-    # 타겟
-    df['future_return'] = df['returns'].shift(-1)
-    df['target'] = (df['future_return'] > 0).astype(int)
+    features.iloc[:min_bars - 1] = np.nan
+    return features
 
-    # 결측치 제거
-    df = df.dropna()
 
-    # 훈련 데이터 (처음 70%)
-    split_idx = int(len(df) * 0.7)
-    train_df = df.iloc[:split_idx]
+def check_causality(data, feature_func=compute_strategy_features, num_checks=5, seed=42):
+    """미래 봉을 사용하지 않는지 확인 (앞부분만 잘라 계산한 결과가 전체 계산과 같아야 함)"""
+    full = feature_func(data).values
+    rng = np.random.default_rng(seed)
+    cutoffs = rng.integers(len(data) // 2, len(data), size=num_checks)
+
+    for cutoff in cutoffs:
+        prefix = feature_func(data.iloc[:cutoff]).values
+        if not np.array_equal(prefix, full[:cutoff], equal_nan=True):
+            raise ValueError(f"특성 계산이 {cutoff}번째 봉 이후의 데이터를 사용합니다.")
+    return True
+
+
+def batch_predict_proba(model, scaler, features):
+    """특성 행렬 전체를 한 번의 호출로 스케일링/예측 (계산할 수 없는 행은 NaN)"""
+    values = features.values
+    valid = np.isfinite(values).all(axis=1)
+
+    probs = np.full(len(values), np.nan)
+    if valid.any():
+        probs[valid] = model.predict_proba(scaler.transform(values[valid]))[:, 1]
+    return pd.Series(probs, index=features.index, name='ml_prob')
+
+
+def load_feature_store():
+    """chapter15/03_feature_store.py의 특성 저장소 불러오기"""
+    return load_chapter_module('chapter15', '03_feature_store.py').FeatureStore()
+
+
+def load_model_registry():
+    """03_model_registry.py의 모델 저장소 불러오기"""
+    return load_chapter_module('chapter16', '03_model_registry.py').ModelRegistry()
+
+
+# 랜덤 포레스트 하이퍼파라미터 (n_jobs는 결과에 영향이 없으므로 모델 키에서 제외)
+RF_PARAMS = {'n_estimators': 100, 'max_depth': 10, 'random_state': 42}
 
-    X_train = train_df[feature_cols]
-    y_train = train_df['target']
 
-    # 스케일링
+def fit_ml_model(X_train, y_train):
+    """스케일러와 랜덤 포레스트 학습"""
     scaler = StandardScaler()
     X_train_scaled = scaler.fit_transform(X_train)
 
-    # 모델 학습
-    model = RandomForestClassifier(n_estimators=100, max_depth=10, random_state=42, n_jobs=-1)
+    model = RandomForestClassifier(**RF_PARAMS, n_jobs=-1)
     model.fit(X_train_scaled, y_train)
+    return model, scaler
+
+
+def prepare_ml_model(data, feature_cols, symbol='NVDA', registry=None):
+    """ML 모델 학습
+
+    Parameters:
+    -----------
+    registry : ModelRegistry
+        모델 저장소 (03_model_registry.py). 주어지면 같은 학습 데이터/특성/하이퍼파라미터로
+        학습된 모델을 불러오고, 없을 때만 학습 후 저장합니다.
+    """
+
+    print("\nML 모델 학습 중...")
 
-    print(f"훈련 데이터: {len(train_df)} 행")
+    # 특성 생성 (특성 저장소: 같은 데이터면 저장된 컬럼을 읽기만 함)
+    X, y = load_feature_store().training_matrix(symbol, data, feature_cols)
+
+    # 훈련 데이터 (처음 70%)
+    split_idx = int(len(X) * 0.7)
+    X_train = X.iloc[:split_idx]
+    y_train = y.iloc[:split_idx]
+
+    if registry is None:
+        model, scaler = fit_ml_model(X_train, y_train)
+    else:
+        def evaluate(model, scaler):
+            # 나머지 30% 구간의 정확도와 AUC
+            X_test = scaler.transform(X.iloc[split_idx:])
+            y_test = y.iloc[split_idx:]
+            return {
+                'train_accuracy': float(accuracy_score(y_train, model.predict(scaler.transform(X_train)))),
+                'test_accuracy': float(accuracy_score(y_test, model.predict(X_test))),
+                'test_auc': float(roc_auc_score(y_test, model.predict_proba(X_test)[:, 1])),
+            }
+
+        model, scaler, metadata, cached = registry.get_or_train(
+            X_train, y_train, feature_cols, RF_PARAMS, fit_ml_model, evaluate)
+        if cached:
+            print(f"저장된 모델 사용: {metadata['key']} "
+                  f"(학습 시간 {metadata['train_time_sec']:.2f}초 절약, "
+                  f"테스트 정확도 {metadata['metrics']['test_accuracy']:.2%})")
+            return model, scaler
+
+    print(f"훈련 데이터: {len(X_train)} 행")
     print(f"특성 개수: {len(feature_cols)}")
     print("모델 학습 완료!")
 
@@ -186,8 +345,16 @@ def prepare_ml_model(data, feature_cols):
 
 
 def run_ml_backtest(symbol='NVDA', start_date='2020-01-01', end_date='2024-01-01',
-                    prob_threshold=0.6):
-    """ML 전략 백테스트"""
+                    prob_threshold=0.6, batch_inference=False, use_registry=True):
+    """ML 전략 백테스트
+
+    Parameters:
+    -----------
+    batch_inference : bool
+        True이면 확률을 한 번에 계산해 ml_prob 라인으로 전달 (봉마다 predict_proba를 호출하지 않음)
+    use_registry : bool
+        True이면 모델 저장소에서 학습된 모델을 재사용 (False이면 매번 재학습)
+    """
 
     # 데이터 다운로드
     print(f"\n{symbol} 데이터 다운로드 중...")
@@ -207,19 +374,32 @@ def run_ml_backtest(symbol='NVDA', start_date='2020-01-01', end_date='2024-01-01
                     'returns_lag_3', 'returns_lag_5']
 
     # 모델 학습
-    model, scaler = prepare_ml_model(data, feature_cols)
+    registry = load_model_registry() if use_registry else None
+    model, scaler = prepare_ml_model(data, feature_cols, symbol, registry=registry)
 
     # Backtrader 설정
     cerebro = bt.Cerebro()
-    data_feed = bt.feeds.PandasData(dataname=data)
-    cerebro.adddata(data_feed)
-
-    # ML 전략 추가
-    cerebro.addstrategy(MLStrategy,
-                       model=model,
-                       scaler=scaler,
-                       feature_cols=feature_cols,
-                       prob_threshold=prob_threshold)
+    t0 = time.perf_counter()
+
+    if batch_inference:
+        # 인과적 특성 행렬 → 한 번의 predict_proba → ml_prob 라인
+        check_causality(data)
+        features = compute_strategy_features(data)
+        signal_data = data.copy()
+        signal_data['ml_prob'] = batch_predict_proba(model, scaler, features[feature_cols])
+
+        cerebro.adddata(MLSignalData(dataname=signal_data))
+        cerebro.addstrategy(PrecomputedMLStrategy, prob_threshold=prob_threshold)
+    else:
+        data_feed = bt.feeds.PandasData(dataname=data)
+        cerebro.adddata(data_feed)
+
+        # ML 전략 추가
+        cerebro.addstrategy(MLStrategy,
+                           model=model,
+                           scaler=scaler,
+                           feature_cols=feature_cols,
+                           prob_threshold=prob_threshold)
 
     cerebro.broker.setcash(100000.0)
     cerebro.broker.setcommission(commission=0.001)
@@ -228,12 +408,15 @@ def run_ml_backtest(symbol='NVDA', start_date='2020-01-01', end_date='2024-01-01
     cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe', riskfreerate=0.02)
     cerebro.addanalyzer(bt.analyzers.Returns, _name='returns')
     cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
+    cerebro.addanalyzer(bt.analyzers.Transactions, _name='transactions')
 
     # 백테스트 실행
-    print(f"\n백테스트 실행 중 (확률 임계값: {prob_threshold})...")
+    mode = '일괄 추론' if batch_inference else '봉 단위 추론'
+    print(f"\n백테스트 실행 중 (확률 임계값: {prob_threshold}, {mode})...")
     initial_value = cerebro.broker.getvalue()
     results = cerebro.run()
     final_value = cerebro.broker.getvalue()
+    elapsed = time.perf_counter() - t0
 
     # 결과 분석
     strategy = results[0]
@@ -250,11 +433,14 @@ def run_ml_backtest(symbol='NVDA', start_date='2020-01-01', end_date='2024-01-01
     print(f"총 수익률: {total_return:.2%}")
     print(f"Sharpe Ratio: {sharpe:.2f}")
     print(f"최대 낙폭: {max_dd:.2f}%")
+    print(f"실행 시간: {elapsed:.2f}초")
 
     return {
         'total_return': total_return,
         'sharpe': sharpe,
-        'max_dd': max_dd
+        'max_dd': max_dd,
+        'elapsed': elapsed,
+        'transactions': dict(strategy.analyzers.transactions.get_analysis())
     }
 
 
@@ -265,7 +451,21 @@ def main():
     print("Chapter 16: ML and Backtrader Integration")
     print("=" * 60)
 
-    # 다양한 확률 임계값으로 테스트
+    # 1. 봉 단위 추론과 일괄 추론 비교 (같은 거래가 나와야 함)
+    per_bar = run_ml_backtest(symbol='NVDA', start_date='2020-01-01', end_date='2024-01-01',
+                              prob_threshold=0.6, batch_inference=False)
+    batch = run_ml_backtest(symbol='NVDA', start_date='2020-01-01', end_date='2024-01-01',
+                            prob_threshold=0.6, batch_inference=True)
+
+    if per_bar and batch:
+        print("\n" + "=" * 60)
+        print("봉 단위 추론 vs 일괄 추론")
+        print("=" * 60)
+        print(f"봉 단위 추론: {per_bar['elapsed']:.2f}초, 거래 {len(per_bar['transactions'])}건")
+        print(f"일괄 추론:   {batch['elapsed']:.2f}초, 거래 {len(batch['transactions'])}건")
+        print(f"거래 내역 일치: {per_bar['transactions'] == batch['transactions']}")
+
+    # 2. 다양한 확률 임계값으로 테스트 (일괄 추론)
     thresholds = [0.5, 0.55, 0.6, 0.65, 0.7]
 
     results = []
@@ -278,7 +478,8 @@ def main():
             symbol='NVDA',
             start_date='2020-01-01',
             end_date='2024-01-01',
-            prob_threshold=threshold
+            prob_threshold=threshold,
+            batch_inference=True
         )
 
         if result:
@@ -291,7 +492,7 @@ def main():
         print("확률 임계값 비교")
         print("=" * 60)
 
-        results_df = pd.DataFrame(results)
+        results_df = pd.DataFrame(results).drop(columns='transactions')
         print(results_df.to_string(index=False))
 
         # 최적 임계값
@@ -0,0 +1,453 @@
+"""
+Chapter 16: 머신러닝 기반 전략 (Part 2)
+Incremental Feature Engine
+
+01_ml_backtrader_integration.py의 MLStrategy.calculate_features는 매 봉마다
+self.data.close[-i]로 20개 수익률 리스트와 5개 거래량 리스트를 다시 만들고 np.std를 호출하며,
+그 정의(모집단 표준편차, 직전 20개 수익률 등)도 학습에 쓴 create_features와 다릅니다.
+이 스크립트의 특성 엔진은 고정 크기 링 버퍼와 누적 합으로 각 특성을 봉마다 O(1)에 갱신하고,
+pandas rolling/ewm과 같은 순서로 계산해 학습용 특성(chapter15/03_feature_store.py)과 같은 값을 냅니다.
+가격이 일정한 윈도우는 두 쪽 모두 표준편차를 0, Bollinger 위치를 0.5로 정하고,
+그런 구간을 지난 뒤의 롤링 표준편차는 pandas와 반올림 오차만큼 다를 수 있습니다.
+따라서 실시간 예측과 학습이 같은 특성을 보게 됩니다.
+"""
+
+import os
+import sys
+import math
+import time
+import numpy as np
+import pandas as pd
+import yfinance as yf
+import backtrader as bt
+
+# 예제 스크립트 불러오기 도우미 (codes/chapter_loader.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chapter_loader import load_chapter_module
+
+
+FEATURE_COLS = ['returns', 'price_to_sma_20', 'rsi', 'macd_diff', 'bb_position',
+                'volatility', 'volume_ratio', 'returns_lag_1', 'returns_lag_2',
+                'returns_lag_3', 'returns_lag_5']
+
+# 증분 특성과 일괄 특성 비교 허용 오차 (가격이 일정했던 구간 뒤의 롤링 표준편차 반올림 차이)
+FEATURE_RTOL = 1e-6
+FEATURE_ATOL = 1e-12
+
+
+def _divide(a, b):
+    """0으로 나누면 예외 대신 inf/NaN을 반환 (pandas 나눗셈과 같은 결과)"""
+    if b == 0:
+        if a != a or a == 0:
+            return float('nan')
+        return math.copysign(float('inf'), a) * math.copysign(1.0, b)
+    return a / b
+
+
+class RingBuffer:
+    """고정 크기 링 버퍼 (가득 차면 가장 오래된 값을 밀어냄)"""
+
+    __slots__ = ('values', 'size', 'count', 'head')
+
+    def __init__(self, size):
+        self.values = np.full(size, np.nan)
+        self.size = size
+        self.count = 0
+        self.head = 0
+
+    def push(self, value):
+        """값을 넣고, 밀려난 값을 반환 (아직 가득 차지 않았으면 None)"""
+        evicted = self.values[self.head] if self.count == self.size else None
+        self.values[self.head] = value
+        self.head = (self.head + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+        return evicted
+
+    def lag(self, k):
+        """k봉 전 값 (0이면 가장 최근 값)"""
+        if k >= self.count:
+            return float('nan')
+        return float(self.values[(self.head - 1 - k) % self.size])
+
+
+class RollingMean:
+    """pandas rolling().mean()과 같은 결과의 O(1) 롤링 평균
+
+    pandas와 같이 보상(Kahan) 합으로 더하고 빼며, 윈도우가 가득 차면
+    오래된 값을 먼저 빼고 새 값을 더합니다.
+    """
+
+    __slots__ = ('window', 'buffer', 'nobs', 'sum_x', 'comp_add', 'comp_remove',
+                 'neg_ct', 'same_ct', 'prev_value')
+
+    def __init__(self, window):
+        self.window = window
+        self.buffer = RingBuffer(window)
+        self.nobs = 0
+        self.sum_x = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.neg_ct = 0
+        self.same_ct = 0
+        self.prev_value = float('nan')
+
+    def _add(self, value):
+        if value != value:
+            return
+        self.nobs += 1
+        y = value - self.comp_add
+        t = self.sum_x + y
+        self.comp_add = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, value) < 0:
+            self.neg_ct += 1
+        if value == self.prev_value:
+            self.same_ct += 1
+        else:
+            self.same_ct = 1
+        self.prev_value = value
+
+    def _remove(self, value):
+        if value != value:
+            return
+        self.nobs -= 1
+        y = -value - self.comp_remove
+        t = self.sum_x + y
+        self.comp_remove = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, value) < 0:
+            self.neg_ct -= 1
+
+    def update(self, value):
+        evicted = self.buffer.push(value)
+        if evicted is not None:
+            self._remove(float(evicted))
+        self._add(value)
+
+        if self.buffer.count < self.window or self.nobs < self.window:
+            return float('nan')
+        result = self.sum_x / self.nobs
+        if self.same_ct >= self.nobs:
+            result = self.prev_value
+        elif self.neg_ct == 0 and result < 0:
+            result = 0.0
+        elif self.neg_ct == self.nobs and result > 0:
+            result = 0.0
+        return result
+
+
+class RollingStd:
+    """pandas rolling().std() (ddof=1)와 같은 결과의 O(1) 롤링 표준편차 (보상 Welford 갱신)"""
+
+    __slots__ = ('window', 'buffer', 'nobs', 'mean_x', 'ssqdm_x', 'comp_add', 'comp_remove',
+                 'same_ct', 'prev_value')
+
+    def __init__(self, window):
+        self.window = window
+        self.buffer = RingBuffer(window)
+        self.nobs = 0
+        self.mean_x = 0.0
+        self.ssqdm_x = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.same_ct = 0
+        self.prev_value = float('nan')
+
+    def _add(self, value):
+        if value != value:
+            return
+        if value == self.prev_value:
+            self.same_ct += 1
+        else:
+            self.same_ct = 1
+        self.prev_value = value
+
+        self.nobs += 1
+        prev_mean = self.mean_x - self.comp_add
+        y = value - self.comp_add
+        t = y - self.mean_x
+        self.comp_add = t + self.mean_x - y
+        self.mean_x = self.mean_x + t / self.nobs
+        self.ssqdm_x = self.ssqdm_x + (value - prev_mean) * (value - self.mean_x)
+
+    def _remove(self, value):
+        if value != value:
+            return
+        self.nobs -= 1
+        if self.nobs:
+            prev_mean = self.mean_x - self.comp_remove
+            y = value - self.comp_remove
+            t = y - self.mean_x
+            self.comp_remove = t + self.mean_x - y
+            self.mean_x = self.mean_x - t / self.nobs
+            self.ssqdm_x = self.ssqdm_x - (value - prev_mean) * (value - self.mean_x)
+        else:
+            self.mean_x = 0.0
+            self.ssqdm_x = 0.0
+
+    def update(self, value):
+        evicted = self.buffer.push(value)
+        if evicted is not None:
+            self._remove(float(evicted))
+        self._add(value)
+
+        if self.buffer.count < self.window or self.nobs < self.window or self.nobs < 2:
+            return float('nan')
+        # 값이 모두 같은 윈도우는 정확히 0 (특성 저장소의 _rolling_std와 같은 규칙)
+        if self.same_ct >= self.nobs:
+            return 0.0
+        return math.sqrt(max(self.ssqdm_x / (self.nobs - 1), 0.0))
+
+
+class ExponentialMean:
+    """pandas ewm(span, adjust=False).mean()과 같은 결과의 지수 이동평균"""
+
+    __slots__ = ('alpha', 'old_weight', 'value')
+
+    def __init__(self, span):
+        self.alpha = 2.0 / (span + 1.0)
+        self.old_weight = 1.0 - self.alpha
+        self.value = None
+
+    def update(self, x):
+        if self.value is None:
+            self.value = x
+        elif self.value != x:
+            self.value = (self.old_weight * self.value + self.alpha * x) / (self.old_weight + self.alpha)
+        return self.value
+
+
+class IncrementalFeatureEngine:
+    """봉마다 O(1)로 학습용 특성(create_features와 같은 정의)을 갱신하는 엔진"""
+
+    def __init__(self, feature_cols=FEATURE_COLS):
+        """
+        Parameters:
+        -----------
+        feature_cols : list
+            반환할 특성 이름 (FEATURE_COLS의 부분집합, 순서 유지)
+        """
+        unknown = set(feature_cols) - set(FEATURE_COLS)
+        if unknown:
+            raise KeyError(f"증분 계산을 지원하지 않는 특성: {sorted(unknown)}")
+        self.feature_cols = list(feature_cols)
+
+        self.prev_close = None
+        self.returns = RingBuffer(6)  # 현재 수익률 + 최대 5봉 래그
+
+        self.sma_20 = RollingMean(20)
+        self.bb_std = RollingStd(20)
+        self.gain = RollingMean(14)
+        self.loss = RollingMean(14)
+        self.ema_12 = ExponentialMean(12)
+        self.ema_26 = ExponentialMean(26)
+        self.macd_signal = ExponentialMean(9)
+        self.volatility = RollingStd(20)
+        self.volume_sma_5 = RollingMean(5)
+
+        self.current = dict.fromkeys(FEATURE_COLS, float('nan'))
+
+    def update(self, close, volume):
+        """새 봉의 종가/거래량으로 특성을 갱신하고 feature_cols 순서의 배열 반환"""
+        close = float(close)
+        volume = float(volume)
+        f = self.current
+
+        # 수익률과 래그 (pct_change와 같은 close / prev - 1)
+        if self.prev_close is None:
+            ret = float('nan')
+            delta = float('nan')
+        else:
+            ret = _divide(close, self.prev_close) - 1
+            delta = close - self.prev_close
+        self.prev_close = close
+
+        self.returns.push(ret)
+        f['returns'] = ret
+        for lag in (1, 2, 3, 5):
+            f[f'returns_lag_{lag}'] = self.returns.lag(lag)
+
+        # 이동평균과 Bollinger Bands
+        sma_20 = self.sma_20.update(close)
+        bb_std = self.bb_std.update(close)
+        f['price_to_sma_20'] = _divide(close, sma_20) - 1
+        bb_upper = sma_20 + (bb_std * 2)
+        bb_lower = sma_20 - (bb_std * 2)
+        # 밴드 폭이 0이면(가격이 일정한 구간) 특성 저장소와 같이 0.5
+        band = bb_upper - bb_lower
+        f['bb_position'] = 0.5 if band == 0 else _divide(close - bb_lower, band)
+
+        # RSI (상승폭/하락폭의 단순 평균, delta가 NaN인 첫 봉은 0)
+        gain = self.gain.update(delta if delta > 0 else 0.0)
+        loss = self.loss.update(-(delta if delta < 0 else 0.0))
+        f['rsi'] = 100 - _divide(100, 1 + _divide(gain, loss))
+
+        # MACD
+        macd = self.ema_12.update(close) - self.ema_26.update(close)
+        f['macd_diff'] = macd - self.macd_signal.update(macd)
+
+        # 변동성과 거래량 비율
+        f['volatility'] = self.volatility.update(ret)
+        f['volume_ratio'] = _divide(volume, self.volume_sma_5.update(volume))
+
+        return np.array([f[name] for name in self.feature_cols])
+
+
+def compute_incremental_features(data, feature_cols=FEATURE_COLS):
+    """데이터 전체를 한 봉씩 엔진에 넣어 특성 DataFrame 생성 (검증용)"""
+    engine = IncrementalFeatureEngine(feature_cols)
+    rows = [engine.update(c, v) for c, v in zip(data['Close'].values, data['Volume'].values)]
+    return pd.DataFrame(rows, index=data.index, columns=feature_cols)
+
+
+class StreamingMLStrategy(bt.Strategy):
+    """증분 특성 엔진으로 봉마다 특성을 갱신해 예측하는 ML 전략 (실시간 방식)"""
+
+    params = (
+        ('model', None),
+        ('scaler', None),
+        ('feature_cols', FEATURE_COLS),
+        ('prob_threshold', 0.6),
+        ('min_bars', 200),
+    )
+
+    def __init__(self):
+        self.engine = IncrementalFeatureEngine(self.params.feature_cols)
+
+    def next(self):
+        features = self.engine.update(self.data.close[0], self.data.volume[0])
+
+        # 충분한 데이터가 쌓일 때까지 대기
+        if len(self.data) < self.params.min_bars or not np.isfinite(features).all():
+            return
+
+        prob = self.params.model.predict_proba(self.params.scaler.transform(features[None, :]))[0, 1]
+
+        # 확률 기반 거래
+        if not self.position:
+            if prob > self.params.prob_threshold:
+                self.buy()
+        else:
+            if prob < (1 - self.params.prob_threshold):
+                self.close()
+
+
+class IncrementalFeatureOnly(bt.Strategy):
+    """증분 엔진으로 특성만 계산하는 전략 (특성 계산 비용 측정용, 주문 없음)"""
+
+    def __init__(self):
+        self.engine = IncrementalFeatureEngine()
+
+    def next(self):
+        self.engine.update(self.data.close[0], self.data.volume[0])
+
+
+def feature_only_strategy(base):
+    """base 전략의 calculate_features만 호출하는 전략 클래스 (특성 계산 비용 측정용)"""
+
+    class FeatureOnly(base):
+        def next(self):
+            if len(self.data) >= 200:
+                self.calculate_features()
+
+    return FeatureOnly
+
+
+def run_backtest(data, strategy, **kwargs):
+    """전략 하나로 백테스트를 실행하고 (전략, 실행 시간) 반환"""
+    cerebro = bt.Cerebro()
+    cerebro.adddata(data)
+    cerebro.addstrategy(strategy, **kwargs)
+    cerebro.broker.setcash(100000.0)
+    cerebro.broker.setcommission(commission=0.001)
+    cerebro.addanalyzer(bt.analyzers.Transactions, _name='transactions')
+
+    t0 = time.perf_counter()
+    results = cerebro.run()
+    return results[0], time.perf_counter() - t0
+
+
+def main():
+    """메인 함수"""
+
+    print("=" * 60)
+    print("Chapter 16: Incremental Feature Engine")
+    print("=" * 60)
+
+    symbol = 'NVDA'
+    print(f"\n{symbol} 데이터 다운로드 중...")
+    data = yf.download(symbol, start='2020-01-01', end='2024-01-01', progress=False)
+
+    # yfinance multi-level columns handling
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+
+    if data.empty:
+        print("데이터 다운로드 실패")
+        return
+
+    integration = load_chapter_module('chapter16', '01_ml_backtrader_integration.py')
+    store = integration.load_feature_store()
+
+    # 1. 증분 계산 vs 학습용 일괄 계산 (특성 저장소)
+    # 거래 정지처럼 가격이 일정한 구간(밴드 폭과 변동성이 0)이 있는 시계열도 함께 비교
+    halted = data.copy()
+    halted.iloc[300:340, [halted.columns.get_loc(c) for c in ('Open', 'High', 'Low', 'Close')]] = \
+        halted['Close'].iloc[300]
+    datasets = {symbol: data, f'{symbol} (40봉 거래 정지)': halted}
+
+    batches = {}
+    for label, frame in datasets.items():
+        t0 = time.perf_counter()
+        incremental = compute_incremental_features(frame)
+        incremental_time = time.perf_counter() - t0
+        batches[label] = store.compute(frame, FEATURE_COLS)
+
+        print("\n" + "=" * 60)
+        print(f"증분 특성 vs 일괄 특성 (create_features): {label}")
+        print("=" * 60)
+        for name in FEATURE_COLS:
+            a, b = incremental[name].values, batches[label][name].values
+            same = np.allclose(a, b, rtol=FEATURE_RTOL, atol=FEATURE_ATOL, equal_nan=True)
+            diff = np.nanmax(np.abs(a - b))
+            print(f"{name:18s} 일치: {str(same):5s}  최대 오차 {diff:.1e}")
+        print(f"\n봉당 증분 계산 시간: {incremental_time / len(frame) * 1e6:.1f} µs")
+
+    # 2. 특성 계산 비용 비교 (백테스트 안에서)
+    _, list_time = run_backtest(bt.feeds.PandasData(dataname=data),
+                                feature_only_strategy(integration.MLStrategy))
+    _, ring_time = run_backtest(bt.feeds.PandasData(dataname=data), IncrementalFeatureOnly)
+    print(f"calculate_features (리스트 재생성): {list_time:.2f}초")
+    print(f"링 버퍼 증분 엔진:                 {ring_time:.2f}초")
+
+    # 3. 실시간 방식(봉마다 증분 특성 → 예측)과 학습 특성 기반 일괄 예측의 거래 비교
+    model, scaler = integration.prepare_ml_model(data, FEATURE_COLS, symbol)
+
+    print("\n" + "=" * 60)
+    print("실시간 예측 vs 학습 특성 기반 일괄 예측")
+    print("=" * 60)
+    for label, frame in datasets.items():
+        streaming, streaming_time = run_backtest(bt.feeds.PandasData(dataname=frame), StreamingMLStrategy,
+                                                 model=model, scaler=scaler, prob_threshold=0.6)
+
+        features = batches[label].copy()
+        features.iloc[:199] = np.nan
+        signal_data = frame.copy()
+        signal_data['ml_prob'] = integration.batch_predict_proba(model, scaler, features)
+        precomputed, batch_time = run_backtest(integration.MLSignalData(dataname=signal_data),
+                                               integration.PrecomputedMLStrategy, prob_threshold=0.6)
+
+        streaming_tx = dict(streaming.analyzers.transactions.get_analysis())
+        batch_tx = dict(precomputed.analyzers.transactions.get_analysis())
+
+        print(f"\n[{label}]")
+        print(f"실시간 (증분 특성): {streaming_time:.2f}초, 거래 {len(streaming_tx)}건")
+        print(f"일괄 (학습 특성):   {batch_time:.2f}초, 거래 {len(batch_tx)}건")
+        print(f"거래 내역 일치: {streaming_tx == batch_tx}")
+
+    print("\n분석 완료!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Chapter 16: 머신러닝 기반 전략 (Part 2)
+Model Registry
+
+01_ml_backtrader_integration.py의 run_ml_backtest는 호출할 때마다
+prepare_ml_model로 모델을 다시 학습합니다 (데이터와 하이퍼파라미터가 같아도).
+이 스크립트의 모델 저장소는 학습된 모델과 스케일러를
+(학습 데이터, 특성 목록, 하이퍼파라미터)의 해시로 저장하고,
+다음 실행에서는 학습 없이 파일에서 거의 즉시 불러옵니다
+(joblib의 mmap_mode로 큰 배열은 복사하지 않고 메모리 매핑).
+학습 시간과 평가 지표는 메타데이터(JSON)로 함께 기록합니다.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import joblib
+import sklearn
+import yfinance as yf
+
+# 예제 스크립트 불러오기 도우미 (codes/chapter_loader.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chapter_loader import load_chapter_module
+
+
+class ModelRegistry:
+    """학습 데이터/특성/하이퍼파라미터 해시로 모델을 저장하고 불러오는 저장소
+
+    저장 구조: {root}/{key}/model.joblib, scaler.joblib, metadata.json
+    """
+
+    def __init__(self, root=None):
+        """
+        Parameters:
+        -----------
+        root : str
+            저장 위치 (기본값: codes/data/model_registry)
+        """
+        if root is None:
+            root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'model_registry')
+        self.root = os.path.normpath(root)
+
+    @staticmethod
+    def make_key(X_train, y_train, feature_cols, params):
+        """학습 데이터, 특성 목록, 하이퍼파라미터로 모델 키(해시) 생성"""
+        digest = hashlib.sha1()
+        if isinstance(X_train, pd.DataFrame):
+            digest.update(np.asarray(X_train.index.asi8).tobytes())
+        digest.update(np.ascontiguousarray(X_train, dtype=np.float64).tobytes())
+        digest.update(np.ascontiguousarray(y_train, dtype=np.int64).tobytes())
+        digest.update(json.dumps({'features': list(feature_cols), 'params': params,
+                                  'sklearn': sklearn.__version__}, sort_keys=True).encode())
+        return digest.hexdigest()[:16]
+
+    def _model_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def exists(self, key):
+        return os.path.exists(os.path.join(self._model_dir(key), 'metadata.json'))
+
+    def save(self, key, model, scaler, metadata):
+        """모델, 스케일러, 메타데이터 저장 (임시 폴더에 쓴 뒤 교체)"""
+        os.makedirs(self.root, exist_ok=True)
+        tmp_dir = os.path.join(self.root, f'.{key}.{os.getpid()}.tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        # 압축하지 않아야 불러올 때 배열을 메모리 매핑할 수 있음
+        joblib.dump(model, os.path.join(tmp_dir, 'model.joblib'))
+        joblib.dump(scaler, os.path.join(tmp_dir, 'scaler.joblib'))
+        with open(os.path.join(tmp_dir, 'metadata.json'), 'w', encoding='utf-8') as f:
+            json.dump(dict(metadata, key=key), f, ensure_ascii=False, indent=2)
+
+        target = self._model_dir(key)
+        if os.path.exists(target):
+            shutil.rmtree(tmp_dir)
+        else:
+            os.replace(tmp_dir, target)
+
+    def load(self, key, mmap=True):
+        """(모델, 스케일러, 메타데이터) 반환 (없으면 None)"""
+        if not self.exists(key):
+            return None
+
+        # 스케일러/선형 모델의 배열은 읽기 전용 mmap으로 열림
+        # (트리 모델은 로드할 때 내부 노드 배열로 복사됨)
+        mmap_mode = 'r' if mmap else None
+        model_dir = self._model_dir(key)
+        model = joblib.load(os.path.join(model_dir, 'model.joblib'), mmap_mode=mmap_mode)
+        scaler = joblib.load(os.path.join(model_dir, 'scaler.joblib'), mmap_mode=mmap_mode)
+        with open(os.path.join(model_dir, 'metadata.json'), encoding='utf-8') as f:
+            metadata = json.load(f)
+        return model, scaler, metadata
+
+    def get_or_train(self, X_train, y_train, feature_cols, params, train_func, evaluate_func=None):
+        """저장된 모델이 있으면 불러오고, 없으면 학습 후 저장
+
+        Parameters:
+        -----------
+        train_func : callable
+            train_func(X_train, y_train) -> (model, scaler)
+        evaluate_func : callable
+            evaluate_func(model, scaler) -> 메타데이터에 기록할 지표 딕셔너리 (선택)
+
+        Returns:
+        --------
+        tuple
+            (모델, 스케일러, 메타데이터, 저장소에서 불러왔는지 여부)
+        """
+        key = self.make_key(X_train, y_train, feature_cols, params)
+        cached = self.load(key)
+        if cached is not None:
+            return (*cached, True)
+
+        t0 = time.perf_counter()
+        model, scaler = train_func(X_train, y_train)
+        train_time = time.perf_counter() - t0
+
+        metadata = {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'model_class': type(model).__name__,
+            'params': params,
+            'feature_cols': list(feature_cols),
+            'train_rows': int(len(X_train)),
+            'train_time_sec': round(train_time, 4),
+            'metrics': evaluate_func(model, scaler) if evaluate_func is not None else {},
+            'sklearn_version': sklearn.__version__,
+        }
+        self.save(key, model, scaler, metadata)
+        return model, scaler, dict(metadata, key=key), False
+
+    def list_models(self):
+        """저장된 모델의 메타데이터 목록 (DataFrame)"""
+        if not os.path.isdir(self.root):
+            return pd.DataFrame()
+
+        rows = []
+        for key in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, key, 'metadata.json')
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    metadata = json.load(f)
+                rows.append({
+                    'key': key,
+                    'created_at': metadata['created_at'],
+                    'model_class': metadata['model_class'],
+                    'train_rows': metadata['train_rows'],
+                    'train_time_sec': metadata['train_time_sec'],
+                    **metadata['metrics'],
+                })
+        return pd.DataFrame(rows)
+
+
+def main():
+    """메인 함수"""
+
+    print("=" * 60)
+    print("Chapter 16: Model Registry")
+    print("=" * 60)
+
+    symbol = 'NVDA'
+    print(f"\n{symbol} 데이터 다운로드 중...")
+    data = yf.download(symbol, start='2020-01-01', end='2024-01-01', progress=False)
+
+    # yfinance multi-level columns handling
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+
+    if data.empty:
+        print("데이터 다운로드 실패")
+        return
+
+    integration = load_chapter_module('chapter16', '01_ml_backtrader_integration.py')
+    feature_cols = ['returns', 'price_to_sma_20', 'rsi', 'macd_diff', 'bb_position',
+                    'volatility', 'volume_ratio', 'returns_lag_1', 'returns_lag_2',
+                    'returns_lag_3', 'returns_lag_5']
+
+    # 1. 저장소 없이 학습 vs 첫 실행(학습 후 저장) vs 두 번째 실행(mmap 로드)
+    t0 = time.perf_counter()
+    integration.prepare_ml_model(data, feature_cols, symbol, registry=None)
+    retrain_time = time.perf_counter() - t0
+
+    # 기본 저장소(codes/data/model_registry)를 쓰면 두 번째 실행부터 첫 호출도 로드가 되므로
+    # 실행마다 새 임시 저장소를 사용
+    root = tempfile.mkdtemp(prefix='model_registry_')
+    try:
+        registry = ModelRegistry(root)
+        timings = []
+        for _ in range(2):
+            t0 = time.perf_counter()
+            model, scaler = integration.prepare_ml_model(data, feature_cols, symbol, registry=registry)
+            timings.append(time.perf_counter() - t0)
+
+        print("\n" + "=" * 60)
+        print("모델 준비 시간")
+        print("=" * 60)
+        print(f"매번 재학습:             {retrain_time:.3f}초")
+        print(f"저장소 첫 실행 (저장):    {timings[0]:.3f}초")
+        print(f"저장소 두 번째 실행 (로드): {timings[1]:.3f}초")
+
+        # 2. 불러온 모델이 새로 학습한 모델과 같은 확률을 내는지 확인
+        fresh_model, fresh_scaler = integration.prepare_ml_model(data, feature_cols, symbol, registry=None)
+        X, _ = integration.load_feature_store().training_matrix(symbol, data, feature_cols)
+        same = np.array_equal(model.predict_proba(scaler.transform(X.values)),
+                              fresh_model.predict_proba(fresh_scaler.transform(X.values)))
+        print(f"\n불러온 모델과 새로 학습한 모델의 예측 일치: {same}")
+
+        # 3. 메타데이터
+        print("\n" + "=" * 60)
+        print("저장된 모델")
+        print("=" * 60)
+        print(registry.list_models().to_string(index=False))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print("\n분석 완료!")
+
+
+if __name__ == "__main__":
+    main()
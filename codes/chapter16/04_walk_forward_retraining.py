@@ -0,0 +1,246 @@
+"""
+Chapter 16: 머신러닝 기반 전략 (Part 2)
+Walk-Forward ML Retraining
+
+워크포워드 방식으로 ML 전략을 운용하면 재학습 시점마다
+처음부터 늘어난 전체 구간으로 모델을 다시 학습하게 됩니다 (재학습 비용이 계속 증가).
+이 스크립트는 재학습 방식 세 가지를 같은 워크포워드 구간에서 비교합니다.
+- 전체 재학습: prepare_ml_model과 같은 랜덤 포레스트를 누적 구간 전체로 다시 학습
+- 증분 학습: SGDClassifier/StandardScaler의 partial_fit으로 새 봉만 학습
+- 웜 스타트 앙상블: 랜덤 포레스트에 새 봉으로 학습한 트리만 추가 (오래된 트리는 제거)
+증분 방식의 재학습 비용은 새 봉 수에만 비례하며, 단계별 비용을 함께 출력합니다.
+예측 확률은 ml_prob 라인으로 PrecomputedMLStrategy(MLStrategy와 같은 거래 규칙)에 전달합니다.
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+import yfinance as yf
+import backtrader as bt
+from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import SGDClassifier
+
+# 예제 스크립트 불러오기 도우미 (codes/chapter_loader.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chapter_loader import load_chapter_module
+
+
+integration = load_chapter_module('chapter16', '01_ml_backtrader_integration.py')
+
+
+class FullRetrainLearner:
+    """재학습할 때마다 누적 구간 전체로 처음부터 학습 (prepare_ml_model과 같은 모델)"""
+
+    name = '전체 재학습'
+
+    def __init__(self):
+        self.model = None
+        self.scaler = None
+        self._X = []
+        self._y = []
+
+    def update(self, X_new, y_new):
+        """새 구간을 누적하고 전체 데이터로 다시 학습 (반환값: 학습에 쓴 행 수)"""
+        self._X.append(X_new)
+        self._y.append(y_new)
+        X, y = np.concatenate(self._X), np.concatenate(self._y)
+        self.model, self.scaler = integration.fit_ml_model(X, y)
+        return len(X)
+
+
+class IncrementalLearner:
+    """partial_fit으로 새 봉만 학습하는 온라인 로지스틱 회귀 (SGD)"""
+
+    name = '증분 학습 (partial_fit)'
+
+    def __init__(self, alpha=1e-3, epochs=5):
+        self.model = SGDClassifier(loss='log_loss', alpha=alpha, random_state=42)
+        self.scaler = StandardScaler()
+        self.epochs = epochs
+
+    def update(self, X_new, y_new):
+        """스케일러 통계와 모델을 새 봉으로만 갱신 (반환값: 학습에 쓴 행 수)"""
+        self.scaler.partial_fit(X_new)
+        X_scaled = self.scaler.transform(X_new)
+        for _ in range(self.epochs):
+            self.model.partial_fit(X_scaled, y_new, classes=np.array([0, 1]))
+        return len(X_new)
+
+
+class WarmStartForestLearner:
+    """새 봉으로 학습한 트리만 추가하는 웜 스타트 랜덤 포레스트
+
+    첫 학습은 prepare_ml_model과 같은 하이퍼파라미터로 하고, 이후에는 warm_start로
+    trees_per_update개의 트리를 새 구간에서만 학습해 붙입니다.
+    트리가 max_trees개를 넘으면 가장 오래된 트리부터 버립니다.
+    트리는 특성 스케일에 영향을 받지 않으므로 스케일러는 첫 학습 구간으로 고정합니다.
+    """
+
+    name = '웜 스타트 앙상블'
+
+    def __init__(self, trees_per_update=20, max_trees=200):
+        self.trees_per_update = trees_per_update
+        self.max_trees = max_trees
+        self.model = None
+        self.scaler = None
+        self._pending = ([], [])
+
+    def update(self, X_new, y_new):
+        """새 구간으로 트리 추가 (반환값: 학습에 쓴 행 수, 두 클래스가 모일 때까지는 0)"""
+        if self.model is None:
+            self.model, self.scaler = integration.fit_ml_model(X_new, y_new)
+            self.model.set_params(warm_start=True)
+            return len(X_new)
+
+        # 한 클래스만 있는 구간으로는 트리를 만들 수 없으므로 다음 구간과 합쳐서 학습
+        self._pending[0].append(X_new)
+        self._pending[1].append(y_new)
+        X, y = np.concatenate(self._pending[0]), np.concatenate(self._pending[1])
+        if len(np.unique(y)) < 2:
+            return 0
+        self._pending = ([], [])
+
+        self.model.set_params(n_estimators=len(self.model.estimators_) + self.trees_per_update)
+        self.model.fit(self.scaler.transform(X), y)
+
+        if len(self.model.estimators_) > self.max_trees:
+            self.model.estimators_ = self.model.estimators_[-self.max_trees:]
+            self.model.set_params(n_estimators=self.max_trees)
+        return len(X)
+
+
+def walk_forward_probabilities(data, learner, feature_cols, symbol='NVDA', initial_bars=504, step=21):
+    """워크포워드로 재학습하며 각 구간의 상승 확률 계산
+
+    Parameters:
+    -----------
+    initial_bars : int
+        첫 학습에 쓰는 봉 수 (약 2년)
+    step : int
+        재학습 간격 (봉 수, 약 1개월)
+
+    Returns:
+    --------
+    tuple
+        (ml_prob Series, 단계별 재학습 비용 DataFrame)
+    """
+    X, y = integration.load_feature_store().training_matrix(symbol, data, feature_cols)
+    features = integration.compute_strategy_features(data)[feature_cols]
+
+    # 학습 행의 타겟(다음 봉 수익률 부호)은 다음 봉 종가가 나와야 확정되므로,
+    # 구간 시작 봉보다 앞선 행만 학습에 사용
+    positions = data.index.get_indexer(X.index)
+    probs = pd.Series(np.nan, index=data.index, name='ml_prob')
+
+    steps = []
+    trained_until = 0
+    for start in range(initial_bars, len(data), step):
+        end = min(start + step, len(data))
+        new_rows = (positions >= trained_until) & (positions < start)
+
+        t0 = time.perf_counter()
+        train_rows = learner.update(X.values[new_rows], y.values[new_rows])
+        train_time = time.perf_counter() - t0
+        trained_until = start
+
+        probs.iloc[start:end] = integration.batch_predict_proba(
+            learner.model, learner.scaler, features.iloc[start:end]).values
+
+        steps.append({
+            'date': data.index[start],
+            'new_rows': int(new_rows.sum()),
+            'train_rows': train_rows,
+            'train_time': train_time,
+        })
+
+    return probs, pd.DataFrame(steps)
+
+
+def run_walk_forward_backtest(data, probs, prob_threshold=0.6):
+    """ml_prob 라인으로 PrecomputedMLStrategy 백테스트 (총 수익률, 거래 수)"""
+    signal_data = data.copy()
+    signal_data['ml_prob'] = probs
+
+    cerebro = bt.Cerebro()
+    cerebro.adddata(integration.MLSignalData(dataname=signal_data))
+    cerebro.addstrategy(integration.PrecomputedMLStrategy, prob_threshold=prob_threshold)
+    cerebro.broker.setcash(100000.0)
+    cerebro.broker.setcommission(commission=0.001)
+    cerebro.addanalyzer(bt.analyzers.Transactions, _name='transactions')
+
+    initial_value = cerebro.broker.getvalue()
+    strategy = cerebro.run()[0]
+    total_return = cerebro.broker.getvalue() / initial_value - 1
+    return total_return, len(strategy.analyzers.transactions.get_analysis())
+
+
+def main():
+    """메인 함수"""
+
+    print("=" * 60)
+    print("Chapter 16: Walk-Forward ML Retraining")
+    print("=" * 60)
+
+    symbol = 'NVDA'
+    print(f"\n{symbol} 데이터 다운로드 중...")
+    data = yf.download(symbol, start='2016-01-01', end='2024-01-01', progress=False)
+
+    # yfinance multi-level columns handling
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+
+    if data.empty:
+        print("데이터 다운로드 실패")
+        return
+
+    feature_cols = ['returns', 'price_to_sma_20', 'rsi', 'macd_diff', 'bb_position',
+                    'volatility', 'volume_ratio', 'returns_lag_1', 'returns_lag_2',
+                    'returns_lag_3', 'returns_lag_5']
+
+    learners = [FullRetrainLearner(), IncrementalLearner(), WarmStartForestLearner()]
+
+    summary = []
+    step_costs = {}
+    for learner in learners:
+        print(f"\n{learner.name} 워크포워드 실행 중...")
+        probs, steps = walk_forward_probabilities(data, learner, feature_cols, symbol)
+        total_return, num_trades = run_walk_forward_backtest(data, probs)
+
+        step_costs[learner.name] = steps
+        summary.append({
+            '방식': learner.name,
+            '재학습 횟수': len(steps) - 1,
+            '첫 학습 (초)': steps['train_time'].iloc[0],
+            '재학습 합계 (초)': steps['train_time'].iloc[1:].sum(),
+            '마지막 재학습 행 수': steps['train_rows'].iloc[-1],
+            '총 수익률': total_return,
+            '거래 수': num_trades,
+        })
+
+    # 단계별 재학습 비용 (첫 학습 제외, 3단계마다 출력)
+    print("\n" + "=" * 60)
+    print("단계별 재학습 비용 (ms, 학습 행 수)")
+    print("=" * 60)
+    first = step_costs[learners[0].name]
+    table = pd.DataFrame({'date': first['date'].dt.date, '새 봉': first['new_rows']})
+    for name, steps in step_costs.items():
+        table[name] = [f"{t * 1000:7.1f} ({n})" for t, n in zip(steps['train_time'], steps['train_rows'])]
+    print(table.iloc[1::3].to_string(index=False))
+
+    print("\n" + "=" * 60)
+    print("워크포워드 재학습 방식 비교")
+    print("=" * 60)
+    summary_df = pd.DataFrame(summary)
+    print(summary_df.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+
+    full_cost = summary_df['재학습 합계 (초)'].iloc[0]
+    for name, cost in zip(summary_df['방식'].iloc[1:], summary_df['재학습 합계 (초)'].iloc[1:]):
+        print(f"{name}: 전체 재학습 대비 재학습 비용 {cost / full_cost:.1%}")
+
+    print("\n분석 완료!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+예제 스크립트 불러오기 도우미
+
+각 장의 예제 스크립트는 파일명이 숫자로 시작해서 import 문으로 불러올 수 없습니다.
+다른 스크립트의 클래스와 함수를 재사용하는 예제는 이 모듈의 load_chapter_module을 사용합니다.
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from chapter_loader import load_chapter_module
+
+    portfolio = load_chapter_module('chapter11', '01_portfolio_diversification.py')
+"""
+
+import os
+import sys
+import importlib.util
+
+
+CODES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_chapter_module(chapter, filename):
+    """codes/{chapter}/{filename} 예제 스크립트를 모듈로 불러오기
+
+    모듈은 파일명(확장자 제외)으로 sys.modules에 등록됩니다
+    (backtrader와 pickle이 클래스의 모듈을 이름으로 조회함).
+    같은 파일을 이미 불러왔으면 다시 실행하지 않고 그 모듈을 반환합니다.
+    """
+    path = os.path.join(CODES_DIR, chapter, filename)
+    name = os.path.splitext(filename)[0]
+
+    module = sys.modules.get(name)
+    if module is not None and getattr(module, '__file__', None) == path:
+        return module
+
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module